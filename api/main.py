@@ -3,15 +3,23 @@ FastAPI application for PDF Mind Map Generator.
 """
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, List, Optional
+import json
 import os
 
-from pipelines.pdf_to_topics import pdf_to_topics
-from pipelines.topic_to_mindmap import topic_to_mindmap
-from utils.validation import validate_file_upload, validate_topic
+from pipelines.pdf_to_topics import apdf_to_topics
+from pipelines.topic_to_mindmap import (
+    acached_topic_to_mindmap, aexpand_mindmap_node, astream_topic_to_mindmap, atopics_to_mindmaps
+)
+from utils.validation import validate_file_upload, validate_levels, validate_mindmap, validate_topic, validate_topics
 from utils.file_manager import save_uploaded_file, cleanup_file, cleanup_old_files
 from utils.error_handler import create_error_response, log_error, ValidationError
+from utils.ai_helper import llm_flights, llm_router
+from utils.llm_cache import llm_cache
+from utils.llm_metrics import call_metrics
+from utils.mindmap_cache import mindmap_cache
+from utils.rate_limit import rate_limits
 
 
 # Create FastAPI app
@@ -45,7 +53,11 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/pdf/topics": "POST - Upload PDF and get detected topics",
-            "/pdf/mindmap": "POST - Upload PDF with topic and generate mind map"
+            "/pdf/mindmap": "POST - Upload PDF with topic and generate mind map",
+            "/pdf/mindmap/stream": "POST - Same as /pdf/mindmap, streaming nodes as NDJSON while they are generated",
+            "/pdf/mindmap/expand": "POST - Upload PDF with a mind map and node id and generate that node's subtree",
+            "/pdf/mindmaps/batch": "POST - Upload PDF with several topics and stream each topic's mind map as NDJSON",
+            "/metrics/llm": "GET - AI call tokens, latency, cost, response and mind map caches, coalescing, routing and rate limit metrics"
         }
     }
 
@@ -76,8 +88,8 @@ async def get_topics(file: UploadFile = File(...)):
         # Save uploaded file
         file_path = save_uploaded_file(file_content, file.filename)
         
-        # Run pipeline
-        result = pdf_to_topics(file_path)
+        # Run pipeline without blocking the event loop
+        result = await apdf_to_topics(file_path)
         
         # Cleanup file
         cleanup_file(file_path)
@@ -105,7 +117,8 @@ async def get_topics(file: UploadFile = File(...)):
 @app.post("/pdf/mindmap")
 async def get_mindmap(
     file: UploadFile = File(...),
-    topic: str = Form(...)
+    topic: str = Form(...),
+    levels: Optional[int] = Form(None)
 ):
     """
     Upload PDF with topic and generate mind map.
@@ -113,9 +126,12 @@ async def get_mindmap(
     Args:
         file: PDF file to analyze
         topic: Topic to generate mind map for
+        levels: Generate only the top levels (expand nodes later with
+                /pdf/mindmap/expand); default: at least 4 levels
         
     Returns:
-        JSON with mind map structure
+        JSON with mind map structure; the X-Cache header is HIT when it
+        was served from the result cache, MISS or BYPASS otherwise
     """
     file_path = None
     
@@ -125,6 +141,11 @@ async def get_mindmap(
         if not is_valid:
             raise ValidationError(error_message, {"field": "topic", "provided_value": topic})
         
+        # Validate levels
+        is_valid, error_message = validate_levels(levels)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "levels", "provided_value": levels})
+        
         # Read file content
         file_content = await file.read()
         file_size = len(file_content)
@@ -137,13 +158,13 @@ async def get_mindmap(
         # Save uploaded file
         file_path = save_uploaded_file(file_content, file.filename)
         
-        # Run pipeline
-        result = topic_to_mindmap(file_path, processed_topic)
+        # Run pipeline without blocking the event loop
+        result, cache_status = await acached_topic_to_mindmap(file_path, processed_topic, levels)
         
         # Cleanup file
         cleanup_file(file_path)
         
-        return result
+        return JSONResponse(content=result, headers={"X-Cache": cache_status})
         
     except ValidationError as e:
         log_error(e, {"endpoint": "/pdf/mindmap", "filename": file.filename, "topic": topic})
@@ -172,12 +193,255 @@ async def get_mindmap(
         )
 
 
+@app.post("/pdf/mindmap/stream")
+async def stream_mindmap(
+    file: UploadFile = File(...),
+    topic: str = Form(...),
+    levels: Optional[int] = Form(None)
+):
+    """
+    Upload PDF with topic and stream the mind map as it is generated.
+    
+    The response is newline-delimited JSON: a "topic" event, one "node"
+    event per validated node as soon as the AI has produced it, then a
+    "done" event with the complete mind map. A failure after streaming
+    has started is reported as a final "error" event.
+    
+    Args:
+        file: PDF file to analyze
+        topic: Topic to generate mind map for
+        levels: Generate only the top levels (default: at least 4 levels)
+        
+    Returns:
+        Streaming application/x-ndjson response
+    """
+    file_path = None
+    
+    try:
+        # Validate topic
+        is_valid, processed_topic, error_message = validate_topic(topic)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "topic", "provided_value": topic})
+        
+        # Validate levels
+        is_valid, error_message = validate_levels(levels)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "levels", "provided_value": levels})
+        
+        # Read file content
+        file_content = await file.read()
+        file_size = len(file_content)
+        
+        # Validate file upload
+        is_valid, error_message = validate_file_upload(file.filename, file_size)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "file", "filename": file.filename})
+        
+        # Save uploaded file
+        file_path = save_uploaded_file(file_content, file.filename)
+        
+    except ValidationError as e:
+        log_error(e, {"endpoint": "/pdf/mindmap/stream", "filename": file.filename, "topic": topic})
+        if file_path:
+            cleanup_file(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=create_error_response(e)
+        )
+    
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in astream_topic_to_mindmap(file_path, processed_topic, levels):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            log_error(e, {"endpoint": "/pdf/mindmap/stream", "filename": file.filename, "topic": topic})
+            yield json.dumps({"event": "error", **create_error_response(e)}) + "\n"
+        finally:
+            cleanup_file(file_path)
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/pdf/mindmaps/batch")
+async def batch_mindmaps(
+    file: UploadFile = File(...),
+    topics: List[str] = Form(...),
+    levels: Optional[int] = Form(None)
+):
+    """
+    Upload PDF with several topics and stream a mind map per topic.
+    
+    The PDF is saved, extracted and indexed once; topics are generated
+    concurrently by a bounded worker pool. The response is
+    newline-delimited JSON with one "mindmap" or "error" event per topic,
+    in completion order, then a "done" event with the counts.
+    
+    Args:
+        file: PDF file to analyze
+        topics: Topics to generate mind maps for (repeat the form field)
+        levels: Generate only the top levels (default: at least 4 levels)
+        
+    Returns:
+        Streaming application/x-ndjson response
+    """
+    file_path = None
+    
+    try:
+        # Validate topics
+        is_valid, processed_topics, error_message = validate_topics(topics)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "topics", "provided_value": topics})
+        
+        # Validate levels
+        is_valid, error_message = validate_levels(levels)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "levels", "provided_value": levels})
+        
+        # Read file content
+        file_content = await file.read()
+        file_size = len(file_content)
+        
+        # Validate file upload
+        is_valid, error_message = validate_file_upload(file.filename, file_size)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "file", "filename": file.filename})
+        
+        # Save uploaded file
+        file_path = save_uploaded_file(file_content, file.filename)
+        
+    except ValidationError as e:
+        log_error(e, {"endpoint": "/pdf/mindmaps/batch", "filename": file.filename, "topics": topics})
+        if file_path:
+            cleanup_file(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=create_error_response(e)
+        )
+    
+    async def events() -> AsyncIterator[str]:
+        failed = 0
+        try:
+            async for event in atopics_to_mindmaps(file_path, processed_topics, levels):
+                if event["event"] == "error":
+                    failed += 1
+                    log_error(
+                        event["error"],
+                        {"endpoint": "/pdf/mindmaps/batch", "filename": file.filename, "topic": event["topic"]}
+                    )
+                    event = {"event": "error", "topic": event["topic"], **create_error_response(event["error"])}
+                yield json.dumps(event) + "\n"
+            yield json.dumps({"event": "done", "topics": len(processed_topics), "failed": failed}) + "\n"
+        except Exception as e:
+            log_error(e, {"endpoint": "/pdf/mindmaps/batch", "filename": file.filename, "topics": topics})
+            yield json.dumps({"event": "error", **create_error_response(e)}) + "\n"
+        finally:
+            cleanup_file(file_path)
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/pdf/mindmap/expand")
+async def expand_mindmap_node(
+    file: UploadFile = File(...),
+    mindmap: str = Form(...),
+    node_id: int = Form(...),
+    levels: Optional[int] = Form(None)
+):
+    """
+    Upload PDF with a mind map and generate the subtree below one node.
+    
+    Only the passages of the PDF most relevant to the node are sent to the
+    AI, so a map generated with few levels can be deepened branch by
+    branch as users open them.
+    
+    Args:
+        file: PDF file the mind map was generated from
+        mindmap: Mind map JSON ({"topic", "nodes"})
+        node_id: Id of the node to expand
+        levels: Levels to generate below the node (default: EXPAND_LEVELS)
+        
+    Returns:
+        JSON with node_id and the new nodes, whose ids follow the mind
+        map's existing ids
+    """
+    file_path = None
+    
+    try:
+        # Validate mind map and node
+        is_valid, mindmap_data, error_message = validate_mindmap(mindmap, node_id)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "mindmap", "node_id": node_id})
+        
+        # Validate levels
+        is_valid, error_message = validate_levels(levels)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "levels", "provided_value": levels})
+        
+        # Read file content
+        file_content = await file.read()
+        file_size = len(file_content)
+        
+        # Validate file upload
+        is_valid, error_message = validate_file_upload(file.filename, file_size)
+        if not is_valid:
+            raise ValidationError(error_message, {"field": "file", "filename": file.filename})
+        
+        # Save uploaded file
+        file_path = save_uploaded_file(file_content, file.filename)
+        
+        # Run pipeline without blocking the event loop
+        result = await aexpand_mindmap_node(file_path, mindmap_data, node_id, levels)
+        
+        # Cleanup file
+        cleanup_file(file_path)
+        
+        return result
+        
+    except ValidationError as e:
+        log_error(e, {"endpoint": "/pdf/mindmap/expand", "filename": file.filename, "node_id": node_id})
+        if file_path:
+            cleanup_file(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=create_error_response(e)
+        )
+    except Exception as e:
+        log_error(e, {"endpoint": "/pdf/mindmap/expand", "filename": file.filename, "node_id": node_id})
+        if file_path:
+            cleanup_file(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=create_error_response(e)
+        )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
 
+# Plain def: cache stats query SQLite, so FastAPI runs this in its threadpool
+@app.get("/metrics/llm")
+def llm_metrics(recent: int = 0):
+    """
+    AI call metrics: per-call usage and latency, response and mind map
+    caches, coalescing, provider routing and rate limiting.
+    
+    Args:
+        recent: Number of most recent provider calls to include
+    """
+    return {
+        "calls": call_metrics.stats(),
+        "recent_calls": call_metrics.records(recent),
+        "cache": llm_cache.stats(),
+        "mindmap_cache": mindmap_cache.stats(),
+        "coalescing": llm_flights.stats(),
+        "routing": llm_router.stats(),
+        "rate_limits": rate_limits.stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,49 +1,315 @@
 """
 Topic Detection Block
-Analyzes PDF text and extracts prominent topics using AI.
+Analyzes PDF text and extracts prominent topics using AI,
+or locally with keyphrase scoring.
 """
+import asyncio
+import contextvars
 import json
-from typing import Dict, List
-from utils.ai_helper import llm, retry_on_failure, validate_json_response
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+from utils.ai_helper import (
+    InvalidResponseError, allm, chunk_text, llm, retry_on_failure, validate_json_response
+)
+from utils.error_handler import logger
+from utils.llm_metrics import llm_stage
+from utils.retry import deadline_scope
+from utils.keyphrases import extract_keyphrases, topic_agreement
 
 
-@retry_on_failure(max_retries=1)
-def detect_topics(raw_text: str) -> Dict[str, List[str]]:
+# Characters of document text sent to the AI for topic detection
+MAX_INPUT_CHARS = 6000
+
+# How pipelines pick those characters from a PDF: head, even or sections
+TOPIC_SAMPLING = os.getenv("TOPIC_SAMPLING", "even")
+
+# Topic detector: "llm", "local" (keyphrases, no AI call), "auto"
+# (AI with local fallback when the provider fails or is slow) or
+# "mapreduce" (AI over the whole document in concurrent chunks)
+TOPIC_DETECTOR = os.getenv("TOPIC_DETECTOR", "auto")
+
+# Map-reduce mode: most chunks sent to the AI, and how many at once
+TOPIC_MAP_MAX_CHUNKS = int(os.getenv("TOPIC_MAP_MAX_CHUNKS", "16"))
+TOPIC_MAP_WORKERS = int(os.getenv("TOPIC_MAP_WORKERS", "4"))
+
+# Seconds "auto" mode waits for the AI before using local topics
+TOPIC_LLM_TIMEOUT = float(os.getenv("TOPIC_LLM_TIMEOUT", "20"))
+
+# Maximum number of topics returned
+MAX_TOPICS = 10
+
+# Below this AI/local agreement the AI topics are logged as suspect
+MIN_TOPIC_AGREEMENT = 0.2
+
+# Runs AI detection in "auto" mode so it can be abandoned on timeout
+_auto_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="detect_topics")
+
+
+def detect_topics(raw_text: str, mode: Optional[str] = None) -> Dict[str, List[str]]:
     """
-    Detect topics from raw PDF text using AI.
+    Detect topics from raw PDF text.
     
     Args:
         raw_text: Raw text extracted from PDF
+        mode: "llm", "local", "auto" or "mapreduce" (default: TOPIC_DETECTOR)
         
     Returns:
         Dictionary containing list of detected topics
         
     Raises:
-        ValueError: If AI response is invalid
+        ValueError: If the mode is unknown or AI response is invalid
+        Exception: If AI processing fails after retry
+    """
+    mode = mode or TOPIC_DETECTOR
+    
+    if mode == "llm":
+        return detect_topics_llm(raw_text)
+    if mode == "local":
+        return detect_topics_local(raw_text)
+    if mode == "mapreduce":
+        return detect_topics_mapreduce(raw_text)
+    if mode != "auto":
+        raise ValueError(f"Unknown topic detection mode: {mode}")
+    
+    future = _auto_executor.submit(_detect_topics_llm_within, raw_text, TOPIC_LLM_TIMEOUT)
+    local = detect_topics_local(raw_text)
+    
+    try:
+        result = future.result(timeout=TOPIC_LLM_TIMEOUT)
+    except FutureTimeoutError:
+        logger.warning(f"Topic detection AI call exceeded {TOPIC_LLM_TIMEOUT}s, using local topics")
+        return local
+    except Exception as e:
+        if not local["topics"]:
+            raise
+        logger.warning(f"Topic detection AI call failed, using local topics: {str(e)}")
+        return local
+    
+    _cross_check(result, local)
+    return result
+
+
+async def adetect_topics(raw_text: str, mode: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Async counterpart of detect_topics(); AI calls do not block the event loop.
+    
+    Args:
+        raw_text: Raw text extracted from PDF
+        mode: "llm", "local", "auto" or "mapreduce" (default: TOPIC_DETECTOR)
+        
+    Returns:
+        Dictionary containing list of detected topics
+        
+    Raises:
+        ValueError: If the mode is unknown or AI response is invalid
         Exception: If AI processing fails after retry
     """
+    mode = mode or TOPIC_DETECTOR
+    
+    if mode == "llm":
+        return await adetect_topics_llm(raw_text)
+    if mode == "local":
+        return detect_topics_local(raw_text)
+    if mode == "mapreduce":
+        return await adetect_topics_mapreduce(raw_text)
+    if mode != "auto":
+        raise ValueError(f"Unknown topic detection mode: {mode}")
+    
+    task = asyncio.ensure_future(adetect_topics_llm(raw_text))
+    local = detect_topics_local(raw_text)
+    
+    try:
+        result = await asyncio.wait_for(task, timeout=TOPIC_LLM_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Topic detection AI call exceeded {TOPIC_LLM_TIMEOUT}s, using local topics")
+        return local
+    except Exception as e:
+        if not local["topics"]:
+            raise
+        logger.warning(f"Topic detection AI call failed, using local topics: {str(e)}")
+        return local
+    
+    _cross_check(result, local)
+    return result
+
+
+def _detect_topics_llm_within(raw_text: str, seconds: float) -> Dict[str, List[str]]:
+    """Run AI topic detection with its provider calls cut off after seconds."""
+    with deadline_scope(seconds):
+        return detect_topics_llm(raw_text)
+
+
+def _cross_check(result: Dict[str, List[str]], local: Dict[str, List[str]]):
+    """Log when AI topics barely overlap the document's own keyphrases."""
+    agreement = topic_agreement(result["topics"], local["topics"])
+    if local["topics"] and agreement < MIN_TOPIC_AGREEMENT:
+        logger.warning(f"AI topics overlap local keyphrases by only {agreement:.0%}")
+
+
+def detect_topics_mapreduce(raw_text: str, workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Detect topics across a whole document with concurrent per-chunk AI calls.
+    
+    The text is split into MAX_INPUT_CHARS chunks (at most
+    TOPIC_MAP_MAX_CHUNKS, spread evenly), each chunk's topics are detected
+    in parallel, and the lists are merged so topics found in many chunks
+    rank first.
+    
+    Args:
+        raw_text: Raw text extracted from PDF
+        workers: Concurrent AI calls (default: TOPIC_MAP_WORKERS)
+        
+    Returns:
+        Dictionary containing list of detected topics
+        
+    Raises:
+        Exception: If every chunk fails
+    """
+    chunks = _map_chunks(raw_text)
+    if len(chunks) <= 1:
+        return detect_topics_llm(raw_text)
+    
+    topic_lists = []
+    last_error = None
+    with ThreadPoolExecutor(max_workers=workers or TOPIC_MAP_WORKERS) as executor:
+        # Each worker inherits the caller's deadline and cache settings
+        futures = [executor.submit(contextvars.copy_context().run, detect_topics_llm, chunk) for chunk in chunks]
+        for future in futures:
+            try:
+                topic_lists.append(future.result()["topics"])
+            except Exception as e:
+                last_error = e
+    
+    if not topic_lists:
+        raise last_error
+    
+    return {"topics": merge_topics(topic_lists, MAX_TOPICS)}
+
+
+async def adetect_topics_mapreduce(raw_text: str, workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Async counterpart of detect_topics_mapreduce(), bounded by a semaphore.
+    
+    Args:
+        raw_text: Raw text extracted from PDF
+        workers: Concurrent AI calls (default: TOPIC_MAP_WORKERS)
+        
+    Returns:
+        Dictionary containing list of detected topics
+        
+    Raises:
+        Exception: If every chunk fails
+    """
+    chunks = _map_chunks(raw_text)
+    if len(chunks) <= 1:
+        return await adetect_topics_llm(raw_text)
+    
+    semaphore = asyncio.Semaphore(workers or TOPIC_MAP_WORKERS)
+    
+    async def detect_chunk(chunk: str) -> Dict[str, List[str]]:
+        async with semaphore:
+            return await adetect_topics_llm(chunk)
+    
+    results = await asyncio.gather(*(detect_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    topic_lists = [result["topics"] for result in results if not isinstance(result, BaseException)]
+    if not topic_lists:
+        raise results[-1]
+    
+    return {"topics": merge_topics(topic_lists, MAX_TOPICS)}
+
+
+def _map_chunks(raw_text: str) -> List[str]:
+    """Split text into detection-window chunks, spread evenly if there are too many."""
+    chunks = chunk_text(raw_text, MAX_INPUT_CHARS)
+    if len(chunks) > TOPIC_MAP_MAX_CHUNKS:
+        step = len(chunks) / TOPIC_MAP_MAX_CHUNKS
+        chunks = [chunks[int((i + 0.5) * step)] for i in range(TOPIC_MAP_MAX_CHUNKS)]
+    return chunks
+
+
+def _topic_key(topic: str) -> str:
+    """Normalize a topic for deduplication (case, numbering, punctuation, plurals)."""
+    key = topic.lower()
+    key = re.sub(r"^\s*(?:(?:chapter|section|part|unit)\s+[\divxlc]+|\d+(?:\.\d+)*)[.):\-]?\s+", "", key)
+    key = re.sub(r"[^\w\s]", " ", key)
+    words = [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+             for word in key.split()]
+    return " ".join(words)
+
+
+def merge_topics(topic_lists: List[List[str]], limit: int = MAX_TOPICS) -> List[str]:
+    """
+    Merge per-chunk topic lists into one ranked, deduplicated list.
+    
+    Topics are ranked by how many lists contain them, then by their best
+    position within a list, then by document order.
+    
+    Args:
+        topic_lists: Topic lists in document order
+        limit: Maximum number of topics
+        
+    Returns:
+        Merged topic list
+    """
+    stats = {}
+    for list_index, topics in enumerate(topic_lists):
+        seen = set()
+        for rank, topic in enumerate(topics):
+            key = _topic_key(topic)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if key not in stats:
+                stats[key] = {"topic": topic.strip(), "count": 0, "best_rank": rank, "first": (list_index, rank)}
+            entry = stats[key]
+            entry["count"] += 1
+            entry["best_rank"] = min(entry["best_rank"], rank)
+    
+    ranked = sorted(stats.values(), key=lambda entry: (-entry["count"], entry["best_rank"], entry["first"]))
+    return [entry["topic"] for entry in ranked[:limit]]
+
+
+def detect_topics_local(raw_text: str) -> Dict[str, List[str]]:
+    """
+    Detect topics locally by keyphrase scoring, without an AI call.
+    
+    Args:
+        raw_text: Raw text extracted from PDF
+        
+    Returns:
+        Dictionary containing list of detected topics
+    """
+    return {"topics": extract_keyphrases(raw_text, limit=MAX_TOPICS)}
+
+
+def _build_prompt(raw_text: str) -> str:
+    """Build the topic detection prompt."""
     # Truncate text to prevent token overflow (~6000 characters)
-    truncated_text = raw_text[:6000] if len(raw_text) > 6000 else raw_text
+    truncated_text = raw_text[:MAX_INPUT_CHARS]
     
-    # Construct prompt for AI
-    prompt = f"""Extract the main topics and headings from this text.
+    return f"""Extract the main topics and headings from this text.
 
-IMPORTANT: Return ONLY a JSON array, no explanations or markdown.
+IMPORTANT: Return ONLY a JSON object, no explanations or markdown.
 
-Format: ["Topic 1", "Topic 2", "Topic 3"]
+Format: {{"topics": ["Topic 1", "Topic 2", "Topic 3"]}}
 
 Text to analyze:
 {truncated_text}
 
-Return only the JSON array:"""
-    
-    # Call AI
-    response = llm(prompt)
-    
-    # Validate and parse JSON response
+Return only the JSON object:"""
+
+
+def _parse_topics(response: str) -> Dict[str, List[str]]:
+    """Validate the AI response and return the topic dictionary."""
     try:
         topics = validate_json_response(response)
         
+        # JSON mode answers {"topics": [...]}; a bare array is accepted too
+        if isinstance(topics, dict):
+            topics = topics.get("topics")
+        
         # Ensure it's a list
         if not isinstance(topics, list):
             raise ValueError("AI response is not a list")
@@ -53,7 +319,45 @@ Return only the JSON array:"""
             raise ValueError("AI response contains non-string topics")
         
         # Return at least top 10 topics if available
-        return {"topics": topics[:10] if len(topics) > 10 else topics}
+        return {"topics": topics[:MAX_TOPICS]}
         
     except (json.JSONDecodeError, ValueError) as e:
-        raise ValueError(f"Failed to parse AI response: {str(e)}")
+        raise InvalidResponseError(f"Failed to parse AI response: {str(e)}")
+
+
+@llm_stage("detect_topics")
+@retry_on_failure(max_retries=1)
+def detect_topics_llm(raw_text: str) -> Dict[str, List[str]]:
+    """
+    Detect topics from raw PDF text using AI.
+    
+    Args:
+        raw_text: Raw text extracted from PDF
+        
+    Returns:
+        Dictionary containing list of detected topics
+        
+    Raises:
+        ValueError: If AI response is invalid
+        Exception: If AI processing fails after retry
+    """
+    return _parse_topics(llm(_build_prompt(raw_text), json_mode=True))
+
+
+@llm_stage("detect_topics")
+@retry_on_failure(max_retries=1)
+async def adetect_topics_llm(raw_text: str) -> Dict[str, List[str]]:
+    """
+    Async counterpart of detect_topics_llm().
+    
+    Args:
+        raw_text: Raw text extracted from PDF
+        
+    Returns:
+        Dictionary containing list of detected topics
+        
+    Raises:
+        ValueError: If AI response is invalid
+        Exception: If AI processing fails after retry
+    """
+    return _parse_topics(await allm(_build_prompt(raw_text), json_mode=True))
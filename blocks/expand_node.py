@@ -0,0 +1,182 @@
+"""
+Node Expansion Block
+Generates the subtree below one node of an existing mind map, on demand,
+from the document passages most relevant to that node.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from blocks.filter_topic_text import select_topic_passages
+from blocks.generate_mindmap import check_node
+from utils.ai_helper import InvalidResponseError, allm, llm, retry_on_failure, validate_json_response
+from utils.llm_metrics import llm_stage
+from utils.mindmap import ROOT, MindMap
+
+
+# Levels generated below an expanded node
+EXPAND_LEVELS = int(os.getenv("EXPAND_LEVELS", "2"))
+
+# Characters of retrieved passages sent with an expansion request
+EXPAND_CONTEXT_CHARS = int(os.getenv("EXPAND_CONTEXT_CHARS", "4000"))
+
+
+@llm_stage("expand_node")
+@retry_on_failure(max_retries=1)
+def expand_node(raw_text: str, mindmap: Dict[str, Any], node_id: int, levels: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generate the children (and their descendants) of one mind map node.
+    
+    Only the passages of the document most relevant to the node are sent,
+    so expanding a branch costs a small, bounded prompt.
+    
+    Args:
+        raw_text: Full text from PDF
+        mindmap: Existing mind map ({"topic", "nodes"})
+        node_id: Id of the node to expand
+        levels: Levels generated below the node (default: EXPAND_LEVELS)
+        
+    Returns:
+        Dictionary with the expanded node_id and the new "nodes", numbered
+        after the mind map's existing ids so they can be appended to it
+        
+    Raises:
+        ValueError: If the mind map is invalid, the node does not exist or
+                    the document holds nothing relevant to it
+        Exception: If AI processing fails after retry
+    """
+    levels = levels or EXPAND_LEVELS
+    structure, prompt = _prepare(raw_text, mindmap, node_id, levels)
+    
+    # Call AI
+    response = llm(prompt, json_mode=True)
+    
+    return _parse_expansion(response, structure, node_id, levels)
+
+
+@llm_stage("expand_node")
+@retry_on_failure(max_retries=1)
+async def aexpand_node(
+    raw_text: str, mindmap: Dict[str, Any], node_id: int, levels: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Async counterpart of expand_node(); retrieval runs in a worker thread.
+    
+    Args:
+        raw_text: Full text from PDF
+        mindmap: Existing mind map ({"topic", "nodes"})
+        node_id: Id of the node to expand
+        levels: Levels generated below the node (default: EXPAND_LEVELS)
+        
+    Returns:
+        Dictionary with the expanded node_id and the new "nodes"
+        
+    Raises:
+        ValueError: If the mind map is invalid, the node does not exist or
+                    the document holds nothing relevant to it
+        Exception: If AI processing fails after retry
+    """
+    levels = levels or EXPAND_LEVELS
+    # Index building and retrieval are CPU work; keep them off the loop
+    structure, prompt = await asyncio.to_thread(_prepare, raw_text, mindmap, node_id, levels)
+    
+    response = await allm(prompt, json_mode=True)
+    
+    return _parse_expansion(response, structure, node_id, levels)
+
+
+def _prepare(raw_text: str, mindmap: Dict[str, Any], node_id: int, levels: int) -> Tuple[MindMap, str]:
+    """Locate the node, retrieve its passages and build the expansion prompt."""
+    if not raw_text or not raw_text.strip():
+        raise ValueError("Document text cannot be empty")
+    
+    if levels < 1:
+        raise ValueError("Levels must be at least 1")
+    
+    structure = MindMap.from_dict(mindmap)
+    position = structure.position(node_id)
+    if position is None:
+        raise ValueError(f"Node {node_id} not found in mind map")
+    
+    path = [structure.texts[p] for p in structure.path(position)]
+    node_text = path[-1]
+    
+    # Passages about the node itself, else about its whole branch
+    passages = select_topic_passages(raw_text, node_text, max_chars=EXPAND_CONTEXT_CHARS)
+    if passages is None:
+        branch = " ".join([structure.topic] + path)
+        passages = select_topic_passages(raw_text, branch, max_chars=EXPAND_CONTEXT_CHARS)
+    if passages is None:
+        raise ValueError(f"No relevant content found for node: {node_text}")
+    
+    children = [structure.texts[child] for child in structure.children(position)]
+    return structure, _build_prompt(structure.topic, path, children, passages, levels)
+
+
+def _build_prompt(topic: str, path: List[str], children: List[str], passages: str, levels: int) -> str:
+    """Build the node expansion prompt."""
+    existing = "; ".join(children) if children else "none"
+    
+    return f"""Expand one node of a mind map in JSON format, using the following text.
+
+IMPORTANT: Return ONLY valid JSON, no explanations or markdown.
+
+Mind map topic: {topic}
+Node to expand: {" > ".join(path)}
+Existing children of the node (do not repeat them): {existing}
+
+Required format:
+{{
+  "nodes": [
+    {{"id": 1, "parent": 0, "text": "Subtopic of the node"}},
+    {{"id": 2, "parent": 1, "text": "Details"}}
+  ]
+}}
+
+Rules:
+- Return ONLY the JSON object, nothing else
+- Each node: "id" (unique integer), "parent" (integer, 0 for a direct child of the node to expand), "text" (string)
+- Create exactly {levels} level{'s' if levels != 1 else ''} below the node to expand, no deeper
+- All parent IDs must reference valid node IDs or be 0
+
+Text to analyze:
+{passages}
+
+Return only the JSON:"""
+
+
+def _parse_expansion(response: str, structure: MindMap, node_id: int, levels: int) -> Dict[str, Any]:
+    """Validate the AI response and attach its nodes below the expanded node."""
+    try:
+        data = validate_json_response(response)
+        
+        if not isinstance(data, dict) or not isinstance(data.get("nodes"), list):
+            raise ValueError("Expansion must have a 'nodes' list")
+        
+        if len(data["nodes"]) == 0:
+            raise ValueError("Expansion must have at least one node")
+        
+        for node in data["nodes"]:
+            check_node(node)
+        
+        subtree = MindMap("", data["nodes"])
+        
+    except (json.JSONDecodeError, ValueError) as e:
+        response_preview = response[:500] if response else "No response"
+        raise InvalidResponseError(f"Failed to expand node: {str(e)}. AI response preview: {response_preview}")
+    
+    # Renumber after the existing ids, dropping levels beyond the request
+    kept = [position for position in range(len(subtree)) if subtree.depths[position] < levels]
+    offset = max(structure.ids)
+    new_ids = {position: offset + rank for rank, position in enumerate(kept, 1)}
+    
+    nodes = []
+    for position in kept:
+        parent = subtree.parents[position]
+        nodes.append({
+            "id": new_ids[position],
+            "parent": node_id if parent == ROOT else new_ids[parent],
+            "text": subtree.texts[position]
+        })
+    
+    return {"node_id": node_id, "nodes": nodes}
@@ -0,0 +1,217 @@
+"""
+Outline Extraction Block
+Builds a heading tree from PDF bookmarks, or from font metrics when a PDF
+has no bookmarks, so well-structured documents yield topics without AI.
+"""
+import os
+import pdfplumber
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from pdfminer.pdfdocument import PDFNoOutlines
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+
+
+# Maximum pages scanned for font metrics (spread across the document)
+OUTLINE_MAX_SCAN_PAGES = int(os.getenv("OUTLINE_MAX_SCAN_PAGES", "200"))
+
+# A line is a heading candidate if its font is this much larger than body text
+HEADING_SIZE_RATIO = 1.12
+
+# Font-derived heading levels kept (larger sizes first)
+MAX_FONT_LEVELS = 3
+
+# Heading lines longer than this are treated as body text
+MAX_HEADING_CHARS = 120
+
+
+def _resolve_dest_page(doc, dest, action, page_index: Dict[int, int]) -> Optional[int]:
+    """Resolve an outline destination (or GoTo action) to a 0-based page index."""
+    if dest is None and action is not None:
+        action = resolve1(action)
+        if isinstance(action, dict):
+            dest = action.get("D")
+
+    dest = resolve1(dest)
+    if isinstance(dest, (str, bytes, PSLiteral)):
+        # Named destination
+        name = dest.name if isinstance(dest, PSLiteral) else dest
+        dest = resolve1(doc.get_dest(name))
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get("D"))
+
+    if isinstance(dest, list) and dest:
+        return page_index.get(getattr(dest[0], "objid", None))
+    return None
+
+
+def read_bookmarks(pdf) -> List[Tuple[int, str, Optional[int]]]:
+    """
+    Read the bookmark tree of an open pdfplumber document.
+
+    Args:
+        pdf: Open pdfplumber PDF
+
+    Returns:
+        List of (level, title, page_index) in document order; page_index
+        is 0-based, or None when the destination cannot be resolved
+    """
+    page_index = {page.page_obj.pageid: index for index, page in enumerate(pdf.pages)}
+    entries = []
+    try:
+        for level, title, dest, action, _ in pdf.doc.get_outlines():
+            try:
+                page = _resolve_dest_page(pdf.doc, dest, action, page_index)
+            except Exception:
+                page = None
+            entries.append((level, title, page))
+    except PDFNoOutlines:
+        pass
+    except Exception:
+        # Malformed outline trees are common; treat them as absent
+        pass
+    return entries
+
+
+def _font_headings(pdf) -> List[Dict]:
+    """Cluster line font sizes and weights into heading levels."""
+    page_count = len(pdf.pages)
+    if page_count > OUTLINE_MAX_SCAN_PAGES:
+        step = page_count / OUTLINE_MAX_SCAN_PAGES
+        indices = [int(i * step) for i in range(OUTLINE_MAX_SCAN_PAGES)]
+    else:
+        indices = range(page_count)
+
+    lines = []
+    body_sizes = Counter()
+    for index in indices:
+        page = pdf.pages[index]
+        for line in page.extract_text_lines(return_chars=True):
+            chars = line["chars"]
+            if not chars:
+                continue
+            size = round(sorted(char["size"] for char in chars)[len(chars) // 2], 1)
+            bold = sum("bold" in char["fontname"].lower() for char in chars) * 2 > len(chars)
+            text = line["text"].strip()
+            body_sizes[size] += len(text)
+            lines.append((index, text, size, bold))
+        page.flush_cache()
+
+    if not lines:
+        return []
+
+    body_size = body_sizes.most_common(1)[0][0]
+
+    candidates = []
+    for index, text, size, bold in lines:
+        if len(text) < 3 or len(text) > MAX_HEADING_CHARS:
+            continue
+        if not any(ch.isalpha() for ch in text):
+            continue
+        if size >= body_size * HEADING_SIZE_RATIO or (bold and size >= body_size):
+            candidates.append((index, text, size, bold))
+
+    # Drop running headers/footers that repeat on many pages
+    page_total = len(indices)
+    repeats = Counter(text for _, text, _, _ in candidates)
+    candidates = [
+        candidate for candidate in candidates
+        if repeats[candidate[1]] < 3 or repeats[candidate[1]] <= page_total * 0.3
+    ]
+
+    large_sizes = sorted({size for _, _, size, _ in candidates if size >= body_size * HEADING_SIZE_RATIO}, reverse=True)
+    levels = {size: level for level, size in enumerate(large_sizes[:MAX_FONT_LEVELS])}
+    bold_level = len(levels)
+
+    headings = []
+    for index, text, size, bold in candidates:
+        if size in levels:
+            level = levels[size]
+        elif size < body_size * HEADING_SIZE_RATIO:
+            level = bold_level
+        else:
+            # Smaller than the kept large sizes: fold into the deepest level
+            level = bold_level - 1
+        headings.append({"title": text, "level": level, "page": index + 1})
+    return headings
+
+
+def extract_outline(file_path: str, use_fonts: bool = True) -> Dict[str, object]:
+    """
+    Extract a document outline (heading tree) from a PDF.
+
+    Bookmarks are used when present; otherwise headings are inferred by
+    clustering line font sizes and weights against the body text size.
+
+    Args:
+        file_path: Path to the PDF file
+        use_fonts: Fall back to font metrics when there are no bookmarks
+
+    Returns:
+        Dictionary with "outline" - a list of {"title", "level", "page"}
+        headings in document order (level 0 = top, page 1-based or None) -
+        and "source" - "bookmarks", "fonts" or "none"
+
+    Raises:
+        FileNotFoundError: If the PDF file doesn't exist
+        Exception: If the PDF is corrupted or unreadable
+    """
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            bookmarks = read_bookmarks(pdf)
+            if bookmarks:
+                outline = [
+                    {"title": title.strip(), "level": level, "page": page + 1 if page is not None else None}
+                    for level, title, page in bookmarks
+                    if title and title.strip()
+                ]
+                if outline:
+                    return {"outline": outline, "source": "bookmarks"}
+
+            if use_fonts:
+                outline = _font_headings(pdf)
+                if outline:
+                    return {"outline": outline, "source": "fonts"}
+
+        return {"outline": [], "source": "none"}
+
+    except FileNotFoundError:
+        raise FileNotFoundError(f"PDF file not found: {file_path}")
+    except Exception as e:
+        raise Exception(f"Failed to extract outline from PDF: {str(e)}")
+
+
+def outline_topics(outline: List[Dict], limit: int = 10) -> List[str]:
+    """
+    Turn an outline into a topic list.
+    Uses the shallowest heading level, adding the next level down when
+    the top level alone is too sparse.
+
+    Args:
+        outline: Headings from extract_outline()
+        limit: Maximum number of topics
+
+    Returns:
+        Unique heading titles in document order
+    """
+    if not outline:
+        return []
+
+    top_level = min(heading["level"] for heading in outline)
+    max_level = top_level
+    if sum(heading["level"] == top_level for heading in outline) < 3:
+        max_level += 1
+
+    topics = []
+    seen = set()
+    for heading in outline:
+        if heading["level"] > max_level:
+            continue
+        key = heading["title"].lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        topics.append(heading["title"])
+        if len(topics) >= limit:
+            break
+    return topics
@@ -2,37 +2,288 @@
 PDF Extraction Block
 Extracts text content from PDF files using pdfplumber.
 """
+import os
 import pdfplumber
-from typing import Dict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from blocks.extract_outline import read_bookmarks
+from utils.file_manager import file_sha256
+from utils.text_cache import TEXT_CACHE_ENABLED, text_cache
 
 
-def extract_pdf(file_path: str) -> Dict[str, str]:
+# Number of worker processes for page extraction (1 = serial)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+
+# Documents shorter than this are always extracted serially; process start-up
+# costs more than it saves on a handful of pages
+MIN_PAGES_PER_WORKER = 16
+
+# Bump whenever extraction output changes so cached text is invalidated
+EXTRACTOR_VERSION = "1"
+
+# Page sampling strategies for budgeted extraction
+SAMPLING_STRATEGIES = ("head", "even", "sections")
+
+# Smallest slice of a page worth sampling; caps how many pages a budget spreads over
+MIN_SAMPLE_CHARS = 600
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """
+    Extract text from pages [start, end) of a PDF.
+    Runs inside a worker process, so it opens its own pdfplumber handle.
+
+    Args:
+        file_path: Path to the PDF file
+        start: Index of the first page (0-based, inclusive)
+        end: Index of the last page (0-based, exclusive)
+
+    Returns:
+        List of page texts in page order ("" for pages without text)
+    """
+    texts = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages[start:end]:
+            texts.append(page.extract_text() or "")
+            # Release cached layout objects so memory stays flat per worker
+            page.flush_cache()
+    return texts
+
+
+def _page_ranges(page_count: int, workers: int) -> List[tuple]:
+    """Split page_count pages into contiguous ranges, a few per worker."""
+    # Several shards per worker keeps cores busy when page cost is uneven
+    shard_count = min(page_count, workers * 4)
+    shard_size = -(-page_count // shard_count)
+    return [
+        (start, min(start + shard_size, page_count))
+        for start in range(0, page_count, shard_size)
+    ]
+
+
+def _spread(candidates: List[int], count: int) -> List[int]:
+    """Pick count items evenly spread across candidates (centred in each stride)."""
+    if count >= len(candidates):
+        return list(candidates)
+    return [candidates[int((i + 0.5) * len(candidates) / count)] for i in range(count)]
+
+
+def sample_pages(
+    file_path: str,
+    max_chars: int,
+    strategy: str = "even"
+) -> Iterator[Tuple[int, str]]:
+    """
+    Sample page text from across a document within a character budget.
+
+    Rather than reading the first max_chars characters (which for a book is
+    mostly front matter), the budget is split over pages spread through the
+    whole document. Only the chosen pages are parsed.
+
+    Args:
+        file_path: Path to the PDF file
+        max_chars: Total characters to return
+        strategy: "head" (leading pages), "even" (evenly spaced pages) or
+                  "sections" (pages where bookmarked sections start,
+                  falling back to "even" without bookmarks)
+
+    Yields:
+        Tuples of (page_number, text) in page order, each trimmed to its
+        share of the budget
+
+    Raises:
+        ValueError: If the strategy is unknown
+        FileNotFoundError: If the PDF file doesn't exist
+    """
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+
+    if strategy == "head":
+        remaining = max_chars
+        for page_number, text in iter_pages(file_path):
+            if remaining <= 0:
+                break
+            if text:
+                yield page_number, text[:remaining]
+                remaining -= len(text) + 1
+        return
+
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        sample_count = max(1, min(page_count, max_chars // MIN_SAMPLE_CHARS))
+
+        candidates = list(range(page_count))
+        if strategy == "sections":
+            starts = sorted({page for _, _, page in read_bookmarks(pdf) if page is not None})
+            if len(starts) >= 2:
+                candidates = starts
+
+        chosen = _spread(candidates, sample_count)
+        quota = max_chars // len(chosen)
+        carry = 0
+        for index in chosen:
+            page = pdf.pages[index]
+            text = (page.extract_text() or "").strip()
+            page.flush_cache()
+            if not text:
+                # Give an empty page's share to the next one
+                carry += quota
+                continue
+            yield index + 1, text[:quota + carry]
+            carry = max(0, quota + carry - len(text))
+
+
+def join_pages(pages: Iterable[Tuple[int, str]], max_chars: Optional[int] = None) -> str:
+    """
+    Join (page_number, text) pairs into one newline-separated string.
+    Pages without text are skipped; the string is built once, not by
+    repeated concatenation.
+
+    Args:
+        pages: Iterable of (page_number, text)
+        max_chars: Stop consuming pages once this many characters are
+                   collected, and trim the result to it (default: no limit)
+
+    Returns:
+        Joined text
+    """
+    parts = []
+    total = 0
+    for _, text in pages:
+        if not text:
+            continue
+        parts.append(text + "\n")
+        total += len(text) + 1
+        if max_chars is not None and total >= max_chars:
+            break
+
+    # Stop the extractor now rather than when it is garbage collected
+    if hasattr(pages, "close"):
+        pages.close()
+
+    text = "".join(parts)
+    return text if max_chars is None else text[:max_chars]
+
+
+def iter_pages(
+    file_path: str,
+    workers: Optional[int] = None,
+    use_cache: Optional[bool] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Stream page texts from a PDF as they are extracted.
+
+    Only one page (or, in parallel mode, a bounded window of shards) is held
+    in memory at a time, so callers can start work before extraction ends.
+    Documents seen before are replayed from the extracted-text cache.
+
+    Args:
+        file_path: Path to the PDF file
+        workers: Number of worker processes to shard pages across
+                 (default: PDF_EXTRACT_WORKERS, 1 = serial)
+        use_cache: Read/write the extracted-text cache keyed by the PDF's
+                   SHA-256 (default: TEXT_CACHE_ENABLED)
+
+    Yields:
+        Tuples of (page_number, text), 1-based and in page order;
+        text is "" for pages without extractable text
+
+    Raises:
+        FileNotFoundError: If the PDF file doesn't exist
+    """
+    if use_cache is None:
+        use_cache = TEXT_CACHE_ENABLED
+
+    if not use_cache:
+        yield from _extract_pages(file_path, workers)
+        return
+
+    key = text_cache.make_key(file_sha256(file_path), EXTRACTOR_VERSION)
+    cached = text_cache.iter_pages(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    yield from text_cache.write_pages(key, _extract_pages(file_path, workers))
+
+
+def _extract_pages(file_path: str, workers: Optional[int]) -> Iterator[Tuple[int, str]]:
+    """Extract (page_number, text) pairs, serially or across worker processes."""
+    if workers is None:
+        workers = PDF_EXTRACT_WORKERS
+
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        workers = max(1, min(workers, page_count // MIN_PAGES_PER_WORKER))
+
+        if workers == 1:
+            for index, page in enumerate(pdf.pages):
+                text = page.extract_text() or ""
+                page.flush_cache()
+                yield index + 1, text
+            return
+
+    ranges = _page_ranges(page_count, workers)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    # Keep at most two shards per worker in flight to bound memory
+    window = workers * 2
+    pending = deque()
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append((start, executor.submit(_extract_page_range, file_path, start, end)))
+                next_range += 1
+
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+    finally:
+        # If the caller stopped early (or a shard failed), drop queued shards
+        # instead of waiting for pages nobody will read
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pdf(
+    file_path: str,
+    workers: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    max_chars: Optional[int] = None,
+    sampling: str = "head"
+) -> Dict[str, str]:
     """
     Extract text content from a PDF file.
-    
+
     Args:
         file_path: Path to the PDF file
-        
+        workers: Number of worker processes to shard pages across
+                 (default: PDF_EXTRACT_WORKERS, 1 = serial)
+        use_cache: Use the extracted-text cache (default: TEXT_CACHE_ENABLED)
+        max_chars: Stop extracting once this many characters are available
+                   (default: extract every page)
+        sampling: How to spend max_chars: "head" reads leading pages,
+                  "even" or "sections" sample across the document
+
     Returns:
         Dictionary containing the extracted raw text
-        
+
     Raises:
         FileNotFoundError: If the PDF file doesn't exist
         Exception: If the PDF is corrupted or unreadable
     """
     try:
-        text = ""
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted + "\n"
-        
+        if max_chars is not None and sampling != "head":
+            text = join_pages(sample_pages(file_path, max_chars, sampling))
+        else:
+            text = join_pages(iter_pages(file_path, workers, use_cache), max_chars)
+
         if not text.strip():
             raise ValueError("No extractable text found in PDF")
-            
+
         return {"raw_text": text}
-        
+
     except FileNotFoundError:
         raise FileNotFoundError(f"PDF file not found: {file_path}")
     except Exception as e:
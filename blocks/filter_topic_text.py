@@ -2,45 +2,215 @@
 Topic Filtering Block
 Filters PDF text to extract only content relevant to a specified topic.
 """
-from typing import Dict
-from utils.ai_helper import llm, retry_on_failure, truncate_text
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from utils.ai_helper import allm, chunk_text, llm, retry_on_failure, truncate_text
+from utils.bm25 import get_document_index
+from utils.llm_metrics import llm_stage
+
+
+# How document text is narrowed before the AI call:
+# "retrieval" sends the BM25 top passages for the topic from the whole
+# document, "chunked" filters every 10000-token chunk concurrently,
+# "truncate" sends the first 10000 tokens
+FILTER_MODE = os.getenv("FILTER_MODE", "retrieval")
+
+# Input tokens per AI call when truncating or chunking
+FILTER_MAX_TOKENS = 10000
+
+# Chunked mode: concurrent AI calls and cap on the merged result
+FILTER_WORKERS = int(os.getenv("FILTER_WORKERS", "4"))
+FILTER_MAX_OUTPUT_CHARS = int(os.getenv("FILTER_MAX_OUTPUT_CHARS", "12000"))
+
+# Reply a chunk gives when it holds nothing about the topic
+NO_CONTENT_MARKER = "NONE"
+
+# Characters of retrieved passages sent to the AI in retrieval mode
+FILTER_CONTEXT_CHARS = int(os.getenv("FILTER_CONTEXT_CHARS", "6000"))
+
+# Passages considered per topic in retrieval mode
+FILTER_TOP_K = int(os.getenv("FILTER_TOP_K", "12"))
+
+
+def _build_prompt(text: str, topic: str) -> str:
+    """Build the topic filtering prompt."""
+    return f"""
+    From this text, extract ONLY the content related to the topic: "{topic}".
+    Keep it clean and structured.
+
+    Text:
+    {text}
+    """
+
+
+def _build_chunk_prompt(chunk: str, topic: str) -> str:
+    """Build the filtering prompt for one chunk of a larger document."""
+    return _build_prompt(chunk, topic) + f"""
+    If the text contains nothing about the topic, reply with exactly: {NO_CONTENT_MARKER}
+    """
+
+
+def _clean_chunk_result(result: Optional[str]) -> str:
+    """Normalize a chunk reply; "" when it holds nothing relevant."""
+    result = (result or "").strip()
+    if result.strip(" .").upper() == NO_CONTENT_MARKER:
+        return ""
+    return result
+
+
+@retry_on_failure(max_retries=1)
+def _filter_chunk(chunk: str, topic: str) -> str:
+    """Filter one chunk of a document; returns "" when it holds nothing relevant."""
+    return _clean_chunk_result(llm(_build_chunk_prompt(chunk, topic)))
 
 
 @retry_on_failure(max_retries=1)
-def filter_topic_text(raw_text: str, topic: str) -> Dict[str, str]:
+async def _afilter_chunk(chunk: str, topic: str) -> str:
+    """Async counterpart of _filter_chunk()."""
+    return _clean_chunk_result(await allm(_build_chunk_prompt(chunk, topic)))
+
+
+def _merge_chunk_results(results: List[str]) -> str:
+    """Join non-empty chunk results in order, capped at FILTER_MAX_OUTPUT_CHARS."""
+    merged = []
+    total = 0
+    for result in results:
+        if not result:
+            continue
+        # total counts the separator before each further result
+        remaining = FILTER_MAX_OUTPUT_CHARS - total
+        if remaining <= 0:
+            break
+        if len(result) > remaining:
+            merged.append(result[:max(0, remaining)])
+            break
+        merged.append(result)
+        total += len(result) + 2
+    return "\n\n".join(merged)
+
+
+def filter_chunks_concurrently(raw_text: str, topic: str, workers: Optional[int] = None) -> str:
     """
-    Filter PDF text to extract content related to a specific topic.
+    Filter a whole document in FILTER_MAX_TOKENS chunks with parallel AI calls.
+    Each chunk is retried under its own deadline, so a long document is not
+    cut short by one time budget shared by every chunk.
     
     Args:
         raw_text: Full text from PDF
-        topic: User-specified topic to filter by
+        topic: Topic to filter by
+        workers: Concurrent AI calls (default: FILTER_WORKERS)
         
     Returns:
-        Dictionary containing filtered text related to the topic
+        Non-empty chunk results merged in document order, capped at
+        FILTER_MAX_OUTPUT_CHARS
         
     Raises:
-        ValueError: If topic is empty or filtering fails
-        Exception: If AI processing fails after retry
+        Exception: If any chunk fails after retry (a partial merge would
+                   silently drop part of the document)
     """
-    # Validate topic
-    if not topic or not topic.strip():
-        raise ValueError("Topic cannot be empty")
+    chunks = chunk_text(raw_text, FILTER_MAX_TOKENS * 4)
     
-    # Truncate input text to 10000 tokens maximum
-    truncated_text = truncate_text(raw_text, max_tokens=10000)
+    with ThreadPoolExecutor(max_workers=workers or FILTER_WORKERS) as executor:
+        # Each worker inherits the caller's stage and cache settings
+        futures = [executor.submit(contextvars.copy_context().run, _filter_chunk, chunk, topic) for chunk in chunks]
+        try:
+            # Collect in submission order so the merge follows the document
+            results = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
     
-    # Construct prompt for AI
-    prompt = f"""
-    From this text, extract ONLY the content related to the topic: "{topic}".
-    Keep it clean and structured.
+    return _merge_chunk_results(results)
 
-    Text:
-    {truncated_text}
+
+async def afilter_chunks_concurrently(raw_text: str, topic: str, workers: Optional[int] = None) -> str:
+    """
+    Async counterpart of filter_chunks_concurrently(), bounded by a semaphore.
+    
+    Args:
+        raw_text: Full text from PDF
+        topic: Topic to filter by
+        workers: Concurrent AI calls (default: FILTER_WORKERS)
+        
+    Returns:
+        Non-empty chunk results merged in document order
+        
+    Raises:
+        Exception: If any chunk fails after retry
+    """
+    chunks = chunk_text(raw_text, FILTER_MAX_TOKENS * 4)
+    semaphore = asyncio.Semaphore(workers or FILTER_WORKERS)
+    
+    async def filter_chunk(chunk: str) -> str:
+        async with semaphore:
+            return await _afilter_chunk(chunk, topic)
+    
+    tasks = [asyncio.ensure_future(filter_chunk(chunk)) for chunk in chunks]
+    try:
+        # gather() keeps results in chunk order
+        results = await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    return _merge_chunk_results(results)
+
+
+def select_topic_passages(raw_text: str, topic: str, max_chars: int = FILTER_CONTEXT_CHARS) -> Optional[str]:
+    """
+    Retrieve the passages of a document most relevant to a topic.
+    
+    Args:
+        raw_text: Full text from PDF
+        topic: Topic to retrieve passages for
+        max_chars: Maximum characters of passages to return
+        
+    Returns:
+        The best-scoring passages in document order, the whole text if it
+        already fits, or None if no passage mentions the topic's terms
     """
+    if len(raw_text) <= max_chars:
+        return raw_text
     
-    # Call AI
-    topic_text = llm(prompt)
+    index = get_document_index(raw_text)
+    hits = index.search(topic, top_k=FILTER_TOP_K)
+    if not hits:
+        return None
     
+    selected = []
+    total = 0
+    for passage_index, _ in hits:
+        passage = index.passages[passage_index]
+        if selected and total + len(passage) > max_chars:
+            break
+        selected.append(passage_index)
+        total += len(passage) + 2
+    
+    # Restore reading order so the AI sees passages as the document does
+    return "\n\n".join(index.passages[i] for i in sorted(selected))[:max_chars]
+
+
+def _select_source_text(raw_text: str, topic: str, mode: str) -> str:
+    """Narrow the document to the text sent in a single filtering call."""
+    source_text = None
+    if mode == "retrieval":
+        source_text = select_topic_passages(raw_text, topic)
+    elif mode != "truncate":
+        raise ValueError(f"Unknown filter mode: {mode}")
+    
+    if source_text is None:
+        # Truncate input text to 10000 tokens maximum
+        source_text = truncate_text(raw_text, max_tokens=FILTER_MAX_TOKENS)
+    return source_text
+
+
+def _topic_text_result(topic_text: Optional[str], topic: str) -> Dict[str, str]:
+    """Validate filtered text and build the block result."""
     # Validate result
     if not topic_text or not topic_text.strip():
         return {
@@ -56,3 +226,80 @@ def filter_topic_text(raw_text: str, topic: str) -> Dict[str, str]:
         }
     
     return {"topic_text": topic_text}
+
+
+@retry_on_failure(max_retries=1)
+def _filter_source_text(raw_text: str, topic: str, mode: str) -> str:
+    """Filter the retrieved or truncated text in a single AI call."""
+    return llm(_build_prompt(_select_source_text(raw_text, topic, mode), topic))
+
+
+@retry_on_failure(max_retries=1)
+async def _afilter_source_text(raw_text: str, topic: str, mode: str) -> str:
+    """Async counterpart of _filter_source_text()."""
+    # Index building and retrieval are CPU work; keep them off the loop
+    source_text = await asyncio.to_thread(_select_source_text, raw_text, topic, mode)
+    return await allm(_build_prompt(source_text, topic))
+
+
+@llm_stage("filter_topic_text")
+def filter_topic_text(raw_text: str, topic: str, mode: Optional[str] = None) -> Dict[str, str]:
+    """
+    Filter PDF text to extract content related to a specific topic.
+    
+    Args:
+        raw_text: Full text from PDF
+        topic: User-specified topic to filter by
+        mode: "retrieval", "chunked" or "truncate" (default: FILTER_MODE)
+        
+    Returns:
+        Dictionary containing filtered text related to the topic
+        
+    Raises:
+        ValueError: If topic is empty or filtering fails
+        Exception: If AI processing fails after retry
+    """
+    # Validate topic
+    if not topic or not topic.strip():
+        raise ValueError("Topic cannot be empty")
+    
+    mode = mode or FILTER_MODE
+    
+    if mode == "chunked":
+        # Chunks are retried one by one rather than under a single deadline
+        topic_text = filter_chunks_concurrently(raw_text, topic)
+    else:
+        # Call AI
+        topic_text = _filter_source_text(raw_text, topic, mode)
+    
+    return _topic_text_result(topic_text, topic)
+
+
+@llm_stage("filter_topic_text")
+async def afilter_topic_text(raw_text: str, topic: str, mode: Optional[str] = None) -> Dict[str, str]:
+    """
+    Async counterpart of filter_topic_text(); AI calls do not block the event loop.
+    
+    Args:
+        raw_text: Full text from PDF
+        topic: User-specified topic to filter by
+        mode: "retrieval", "chunked" or "truncate" (default: FILTER_MODE)
+        
+    Returns:
+        Dictionary containing filtered text related to the topic
+        
+    Raises:
+        ValueError: If topic is empty or filtering fails
+        Exception: If AI processing fails after retry
+    """
+    if not topic or not topic.strip():
+        raise ValueError("Topic cannot be empty")
+    
+    mode = mode or FILTER_MODE
+    
+    if mode == "chunked":
+        topic_text = await afilter_chunks_concurrently(raw_text, topic)
+    else:
+        topic_text = await _afilter_source_text(raw_text, topic, mode)
+    
+    return _topic_text_result(topic_text, topic)
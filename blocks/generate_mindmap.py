@@ -2,18 +2,31 @@
 Mind Map Generation Block
 Generates hierarchical mind map JSON from filtered text.
 """
+import asyncio
 import json
-from typing import Dict
-from utils.ai_helper import llm, retry_on_failure, validate_json_response
+import time
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from utils.ai_helper import (
+    TEMPERATURE, InvalidResponseError, allm, allm_stream, llm, llm_stream, retry_on_failure, validate_json_response
+)
+from utils.json_stream import StreamingJSONObjectParser
+from utils.llm_cache import refresh
+from utils.llm_metrics import llm_stage
+from utils.mindmap import MindMap
+from utils.retry import RetryPolicy
 
 
+@llm_stage("generate_mindmap")
 @retry_on_failure(max_retries=1)
-def generate_mindmap(topic_text: str) -> Dict[str, dict]:
+def generate_mindmap(topic_text: str, levels: Optional[int] = None) -> Dict[str, dict]:
     """
     Generate a hierarchical mind map from filtered text.
     
     Args:
         topic_text: Filtered text content related to a topic
+        levels: Generate only this many levels (deeper branches can be
+                filled in later with blocks.expand_node); default: at least 4
         
     Returns:
         Dictionary containing the mind map structure
@@ -22,12 +35,47 @@ def generate_mindmap(topic_text: str) -> Dict[str, dict]:
         ValueError: If topic_text is empty or mind map generation fails
         Exception: If AI processing fails after retry
     """
+    # Call AI
+    response = llm(_build_prompt(topic_text, levels), json_mode=True)
+    
+    return _parse_mindmap(response, levels)
+
+
+@llm_stage("generate_mindmap")
+@retry_on_failure(max_retries=1)
+async def agenerate_mindmap(topic_text: str, levels: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Async counterpart of generate_mindmap(); the AI call does not block the event loop.
+    
+    Args:
+        topic_text: Filtered text content related to a topic
+        levels: Generate only this many levels (default: at least 4)
+        
+    Returns:
+        Dictionary containing the mind map structure
+        
+    Raises:
+        ValueError: If topic_text is empty or mind map generation fails
+        Exception: If AI processing fails after retry
+    """
+    response = await allm(_build_prompt(topic_text, levels), json_mode=True)
+    
+    return _parse_mindmap(response, levels)
+
+
+def _build_prompt(topic_text: str, levels: Optional[int] = None) -> str:
+    """Validate input and build the mind map prompt."""
     # Validate input
     if not topic_text or not topic_text.strip():
         raise ValueError("Topic text cannot be empty")
     
+    if levels is None:
+        depth_rule = "Create at least 4 levels of hierarchy"
+    else:
+        depth_rule = f"Create exactly {levels} level{'s' if levels != 1 else ''} of hierarchy (parent 0 nodes are level 1), no deeper"
+    
     # Construct detailed prompt with expected JSON format
-    prompt = f"""Create a mind map in JSON format from the following text.
+    return f"""Create a mind map in JSON format from the following text.
 
 IMPORTANT: Return ONLY valid JSON, no explanations or markdown.
 
@@ -45,17 +93,17 @@ Rules:
 - "topic" field: main topic as string
 - "nodes" field: array of node objects
 - Each node: "id" (unique integer), "parent" (integer, 0 for root), "text" (string)
-- Create at least 4 levels of hierarchy
+- {depth_rule}
 - All parent IDs must reference valid node IDs or be 0
 
 Text to analyze:
 {topic_text}
 
 Return only the JSON:"""
-    
-    # Call AI
-    response = llm(prompt)
-    
+
+
+def _parse_mindmap(response: str, levels: Optional[int] = None) -> Dict[str, dict]:
+    """Parse and validate the AI response into the mind map result, keeping at most `levels` levels."""
     # Validate and parse JSON response
     try:
         mindmap = validate_json_response(response)
@@ -77,33 +125,233 @@ Return only the JSON:"""
             raise ValueError("Mind map must have at least one node")
         
         # Validate each node
-        node_ids = set()
-        for node in mindmap["nodes"]:
-            if not isinstance(node, dict):
-                raise ValueError("Each node must be a dictionary")
-            
-            if "id" not in node or "parent" not in node or "text" not in node:
-                raise ValueError("Each node must have 'id', 'parent', and 'text' fields")
-            
-            if not isinstance(node["id"], int):
-                raise ValueError("Node ID must be an integer")
-            
-            if not isinstance(node["parent"], int):
-                raise ValueError("Node parent must be an integer")
-            
-            if not isinstance(node["text"], str):
-                raise ValueError("Node text must be a string")
-            
-            node_ids.add(node["id"])
-        
-        # Validate parent references
         for node in mindmap["nodes"]:
-            if node["parent"] != 0 and node["parent"] not in node_ids:
-                raise ValueError(f"Node {node['id']} has invalid parent reference: {node['parent']}")
+            check_node(node)
+        
+        # Validate ids and parent references (no orphans or cycles)
+        structure = MindMap.from_dict(mindmap)
+        
+        # Drop levels the model added beyond the requested depth
+        if levels is not None and structure.max_depth >= levels:
+            mindmap["nodes"] = [node for node, depth in zip(mindmap["nodes"], structure.depths) if depth < levels]
         
         return {"mindmap": mindmap}
         
     except (json.JSONDecodeError, ValueError) as e:
         # Include response preview in error for debugging
         response_preview = response[:500] if response else "No response"
-        raise ValueError(f"Failed to generate valid mind map: {str(e)}. AI response preview: {response_preview}")
+        raise InvalidResponseError(f"Failed to generate valid mind map: {str(e)}. AI response preview: {response_preview}")
+
+
+def check_node(node: Any):
+    """Validate one node's fields (parent references are checked separately)."""
+    if not isinstance(node, dict):
+        raise ValueError("Each node must be a dictionary")
+    
+    if "id" not in node or "parent" not in node or "text" not in node:
+        raise ValueError("Each node must have 'id', 'parent', and 'text' fields")
+    
+    if not isinstance(node["id"], int):
+        raise ValueError("Node ID must be an integer")
+    
+    if not isinstance(node["parent"], int):
+        raise ValueError("Node parent must be an integer")
+    
+    if not isinstance(node["text"], str):
+        raise ValueError("Node text must be a string")
+
+
+class _NodeStream:
+    """
+    Turns streamed response text into mind map events.
+    A node is released once it is complete and its parent (0 or an earlier
+    node) is known, so clients can attach every node as it arrives. Nodes
+    deeper than `levels` are dropped.
+    """
+    
+    def __init__(self, levels: Optional[int] = None):
+        self.parser = StreamingJSONObjectParser("nodes")
+        self.levels = levels
+        self.topic = None
+        self.nodes: List[dict] = []
+        # Depth of every node seen so far (the root is 0, top-level nodes 1)
+        self.depths = {0: 0}
+        self.waiting: Dict[int, List[dict]] = {}
+        self.text: List[str] = []
+    
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a response chunk and return the events it completes."""
+        self.text.append(chunk)
+        try:
+            events = []
+            for node in self.parser.feed(chunk):
+                check_node(node)
+                events.extend(self._release(node))
+        except (json.JSONDecodeError, ValueError) as e:
+            raise self._error(e)
+        if self.topic is None and "topic" in self.parser.fields:
+            self.topic = self.parser.fields["topic"]
+            events.insert(0, {"event": "topic", "topic": self.topic})
+        return events
+    
+    def finish(self) -> Dict[str, Any]:
+        """Check the complete response and return the final event."""
+        try:
+            self.parser.close()
+            if self.topic is None:
+                raise ValueError("Mind map must have a 'topic' field")
+            if not self.nodes:
+                raise ValueError("Mind map must have at least one node")
+            if self.waiting:
+                node = next(iter(self.waiting.values()))[0]
+                raise ValueError(f"Node {node['id']} has invalid parent reference: {node['parent']}")
+            MindMap(self.topic, self.nodes)
+        except ValueError as e:
+            raise self._error(e)
+        return {"event": "done", "mindmap": {"topic": self.topic, "nodes": self.nodes}}
+    
+    def _release(self, node: dict) -> List[Dict[str, Any]]:
+        if node["parent"] not in self.depths:
+            self.waiting.setdefault(node["parent"], []).append(node)
+            return []
+        events = []
+        ready = [node]
+        while ready:
+            node = ready.pop(0)
+            depth = self.depths[node["parent"]] + 1
+            self.depths[node["id"]] = depth
+            ready.extend(self.waiting.pop(node["id"], []))
+            if self.levels is not None and depth > self.levels:
+                continue
+            self.nodes.append(node)
+            events.append({"event": "node", "node": node})
+        return events
+    
+    def _error(self, e: Exception) -> InvalidResponseError:
+        response = "".join(self.text)
+        response_preview = response[:500] if response else "No response"
+        return InvalidResponseError(f"Failed to generate valid mind map: {str(e)}. AI response preview: {response_preview}")
+
+
+def _fetch(chunks: Iterator[str], fresh: bool) -> Iterator[str]:
+    """
+    Pull provider chunks with the metrics stage (and, on retries, the cache
+    refresh) set only while fetching. Context variables are never left set
+    across a yield, so each next() may run in a different context (as
+    Starlette does when iterating in a thread pool).
+    """
+    while True:
+        with llm_stage("generate_mindmap"), refresh() if fresh else nullcontext():
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+async def _afetch(chunks: AsyncIterator[str], fresh: bool) -> AsyncIterator[str]:
+    """Async counterpart of _fetch()."""
+    while True:
+        with llm_stage("generate_mindmap"), refresh() if fresh else nullcontext():
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def stream_mindmap(topic_text: str, levels: Optional[int] = None, max_retries: int = 1) -> Iterator[Dict[str, Any]]:
+    """
+    Generate a mind map, yielding each validated node as soon as it is complete.
+    
+    Events, in order:
+        {"event": "topic", "topic": str}
+        {"event": "node", "node": {"id", "parent", "text"}}  (repeated)
+        {"event": "done", "mindmap": {"topic", "nodes"}}
+    
+    A retryable failure before any node was yielded is retried up to
+    max_retries times with a fresh (uncached) response; once nodes have
+    been yielded, failures are raised.
+    
+    Args:
+        topic_text: Filtered text content related to a topic
+        levels: Generate only this many levels (default: at least 4)
+        max_retries: Retries for failures before the first node
+        
+    Yields:
+        Mind map events
+        
+    Raises:
+        ValueError: If topic_text is empty
+        InvalidResponseError: If the response is not a valid mind map
+    """
+    prompt = _build_prompt(topic_text, levels)
+    policy = RetryPolicy(max_retries, retry_invalid_output=TEMPERATURE > 0)
+    topic = None
+    for attempt in range(max_retries + 1):
+        stream = _NodeStream(levels)
+        yielded = False
+        try:
+            for chunk in _fetch(llm_stream(prompt, json_mode=True), fresh=attempt > 0):
+                for event in stream.feed(chunk):
+                    if event["event"] == "topic":
+                        # A retry does not repeat an unchanged topic
+                        if event["topic"] == topic:
+                            continue
+                        topic = event["topic"]
+                    else:
+                        yielded = True
+                    yield event
+            done = stream.finish()
+        except Exception as e:
+            if yielded or attempt == max_retries or not policy.is_retryable(e):
+                raise
+            time.sleep(policy.backoff(attempt, e))
+        else:
+            yield done
+            return
+
+
+async def astream_mindmap(
+    topic_text: str, levels: Optional[int] = None, max_retries: int = 1
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async counterpart of stream_mindmap().
+    
+    Args:
+        topic_text: Filtered text content related to a topic
+        levels: Generate only this many levels (default: at least 4)
+        max_retries: Retries for failures before the first node
+        
+    Yields:
+        Mind map events
+        
+    Raises:
+        ValueError: If topic_text is empty
+        InvalidResponseError: If the response is not a valid mind map
+    """
+    prompt = _build_prompt(topic_text, levels)
+    policy = RetryPolicy(max_retries, retry_invalid_output=TEMPERATURE > 0)
+    topic = None
+    for attempt in range(max_retries + 1):
+        stream = _NodeStream(levels)
+        yielded = False
+        try:
+            async for chunk in _afetch(allm_stream(prompt, json_mode=True), fresh=attempt > 0):
+                for event in stream.feed(chunk):
+                    if event["event"] == "topic":
+                        # A retry does not repeat an unchanged topic
+                        if event["topic"] == topic:
+                            continue
+                        topic = event["topic"]
+                    else:
+                        yielded = True
+                    yield event
+            done = stream.finish()
+        except Exception as e:
+            if yielded or attempt == max_retries or not policy.is_retryable(e):
+                raise
+            await asyncio.sleep(policy.backoff(attempt, e))
+        else:
+            yield done
+            return
@@ -2,17 +2,77 @@
 PDF to Topics Pipeline
 Extracts and detects topics from a PDF file.
 """
-from typing import Dict, List
-from blocks.extract_pdf import extract_pdf
-from blocks.detect_topics import detect_topics
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+from blocks.extract_outline import extract_outline, outline_topics
+from blocks.extract_pdf import sample_pages, join_pages
+from blocks.detect_topics import (
+    MAX_INPUT_CHARS, TOPIC_DETECTOR, TOPIC_MAP_MAX_CHUNKS, TOPIC_SAMPLING, adetect_topics, detect_topics
+)
 
 
-def pdf_to_topics(file_path: str) -> Dict[str, List[str]]:
+# Use document headings as topics when the PDF is well structured
+USE_OUTLINE_TOPICS = os.getenv("USE_OUTLINE_TOPICS", "1") != "0"
+
+# Also detect headings from font sizes when a PDF has no bookmarks; off by
+# default because it reads up to OUTLINE_MAX_SCAN_PAGES pages before sampling
+OUTLINE_USE_FONTS = os.getenv("OUTLINE_USE_FONTS", "0") != "0"
+
+# Fewest headings for an outline to be trusted over AI detection
+MIN_OUTLINE_TOPICS = 3
+
+
+def _read_topic_source(
+    file_path: str,
+    sampling: Optional[str],
+    use_outline: Optional[bool],
+    mode: str
+) -> Tuple[Optional[List[str]], str]:
+    """
+    Run the local (non-AI) steps: outline fast path, then text sampling.
+    
+    Returns:
+        (outline topics or None, sampled text)
+    """
+    if use_outline is None:
+        use_outline = USE_OUTLINE_TOPICS
+    
+    # Fast path: well-structured PDFs already list their topics; reading
+    # bookmarks costs no page parsing, so latency stays independent of length
+    if use_outline:
+        topics = outline_topics(extract_outline(file_path, use_fonts=OUTLINE_USE_FONTS)["outline"])
+        if len(topics) >= MIN_OUTLINE_TOPICS:
+            return topics, ""
+    
+    # Map-reduce reads one detection window per chunk; other modes read one
+    budget = MAX_INPUT_CHARS * (TOPIC_MAP_MAX_CHUNKS if mode == "mapreduce" else 1)
+    
+    # Sample only as much text as topic detection reads,
+    # spread across the document
+    raw_text = join_pages(sample_pages(file_path, budget, sampling or TOPIC_SAMPLING))
+    if not raw_text.strip():
+        raise ValueError("No extractable text found in PDF")
+    return None, raw_text
+
+
+def pdf_to_topics(
+    file_path: str,
+    sampling: Optional[str] = None,
+    use_outline: Optional[bool] = None,
+    mode: Optional[str] = None
+) -> Dict[str, List[str]]:
     """
     Pipeline to extract topics from a PDF file.
     
     Args:
         file_path: Path to the uploaded PDF
+        sampling: Page sampling strategy - "head", "even" or "sections"
+                  (default: TOPIC_SAMPLING)
+        use_outline: Return headings from the PDF outline without calling
+                     the AI when enough are found (default: USE_OUTLINE_TOPICS)
+        mode: Topic detection mode passed to detect_topics
+              (default: TOPIC_DETECTOR)
         
     Returns:
         Dictionary containing list of detected topics
@@ -20,16 +80,56 @@ def pdf_to_topics(file_path: str) -> Dict[str, List[str]]:
     Raises:
         Exception: If any step in the pipeline fails
     """
+    mode = mode or TOPIC_DETECTOR
+    
     try:
-        # Step 1: Extract text from PDF
-        pdf_data = extract_pdf(file_path)
-        raw_text = pdf_data["raw_text"]
+        # Step 1: Outline topics, or sampled text
+        topics, raw_text = _read_topic_source(file_path, sampling, use_outline, mode)
+        if topics is not None:
+            return {"topics": topics}
         
         # Step 2: Detect topics from text
-        topics_data = detect_topics(raw_text)
+        topics_data = detect_topics(raw_text, mode)
         
         return topics_data
         
     except Exception as e:
         # Propagate the first error encountered
         raise Exception(f"Pipeline failed: {str(e)}")
+
+
+async def apdf_to_topics(
+    file_path: str,
+    sampling: Optional[str] = None,
+    use_outline: Optional[bool] = None,
+    mode: Optional[str] = None
+) -> Dict[str, List[str]]:
+    """
+    Async counterpart of pdf_to_topics().
+    PDF parsing runs in a worker thread and AI calls are awaited, so the
+    event loop stays free for other requests.
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        sampling: Page sampling strategy (default: TOPIC_SAMPLING)
+        use_outline: Use PDF outline headings when available
+                     (default: USE_OUTLINE_TOPICS)
+        mode: Topic detection mode (default: TOPIC_DETECTOR)
+        
+    Returns:
+        Dictionary containing list of detected topics
+        
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    mode = mode or TOPIC_DETECTOR
+    
+    try:
+        topics, raw_text = await asyncio.to_thread(_read_topic_source, file_path, sampling, use_outline, mode)
+        if topics is not None:
+            return {"topics": topics}
+        
+        return await adetect_topics(raw_text, mode)
+        
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
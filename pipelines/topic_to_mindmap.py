@@ -2,45 +2,474 @@
 Topic to Mind Map Pipeline
 Generates a mind map for a specific topic from a PDF.
 """
-from typing import Dict
-from blocks.extract_pdf import extract_pdf
-from blocks.filter_topic_text import filter_topic_text
-from blocks.generate_mindmap import generate_mindmap
+import asyncio
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from blocks.expand_node import aexpand_node, expand_node
+from blocks.extract_pdf import iter_pages, join_pages
+from blocks.filter_topic_text import FILTER_CONTEXT_CHARS, FILTER_MODE, afilter_topic_text, filter_topic_text
+from blocks.generate_mindmap import agenerate_mindmap, astream_mindmap, generate_mindmap, stream_mindmap
+from utils.bm25 import get_document_index
+from utils.file_manager import file_sha256
+from utils.mindmap import MindMap
+from utils.mindmap_cache import mindmap_cache, mindmap_key
 
 
-def topic_to_mindmap(file_path: str, topic: str) -> Dict[str, dict]:
+# Topics filtered and generated concurrently in a batch request
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Bump whenever the filtering or mind map prompts change, so mind maps
+# cached from the old prompts are no longer served
+PROMPT_VERSION = "1"
+
+
+def _read_text(file_path: str) -> str:
+    """Stream text from a PDF page by page."""
+    raw_text = join_pages(iter_pages(file_path))
+    if not raw_text.strip():
+        raise ValueError("No extractable text found in PDF")
+    return raw_text
+
+
+def _lookup(
+    digest: Optional[str], topic: str, levels: Optional[int]
+) -> Tuple[Optional[str], Optional[Dict[str, dict]]]:
+    """Result cache key and cached mind map for a topic; the key is None when caching is off."""
+    if digest is None:
+        return None, None
+    key = mindmap_key(digest, topic, prompt_version=PROMPT_VERSION, filter_mode=FILTER_MODE, levels=levels)
+    cached = mindmap_cache.get(key)
+    return key, None if cached is None else json.loads(cached)
+
+
+def _document_digest(file_path: str) -> Optional[str]:
+    """SHA-256 of the PDF when the result cache is on, else None."""
+    return file_sha256(file_path) if mindmap_cache.should_use() else None
+
+
+def _store(key: Optional[str], result: Dict[str, dict]) -> str:
+    """Cache a freshly generated mind map; returns its cache status ("MISS" or "BYPASS")."""
+    if key is None:
+        return "BYPASS"
+    mindmap_cache.put(key, json.dumps(result))
+    return "MISS"
+
+
+def topic_to_mindmap(file_path: str, topic: str, levels: Optional[int] = None) -> Dict[str, dict]:
     """
     Pipeline to generate a mind map for a specific topic from a PDF.
+    A mind map already generated for the same PDF bytes and topic is
+    served from the result cache.
     
     Args:
         file_path: Path to the uploaded PDF
         topic: User-specified topic
+        levels: Generate only this many levels (default: at least 4);
+                deeper branches can be added with expand_mindmap_node()
         
     Returns:
         Dictionary containing the mind map structure
         
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    result, _ = cached_topic_to_mindmap(file_path, topic, levels)
+    return result
+
+
+def cached_topic_to_mindmap(
+    file_path: str, topic: str, levels: Optional[int] = None
+) -> Tuple[Dict[str, dict], str]:
+    """
+    topic_to_mindmap() that also reports how the result cache answered.
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topic: User-specified topic
+        levels: Generate only this many levels (default: at least 4)
+        
+    Returns:
+        Tuple of (mind map result, cache status): "HIT", "MISS" or
+        "BYPASS" when the cache is disabled
+        
     Raises:
         Exception: If any step in the pipeline fails
     """
     try:
-        # Step 1: Extract text from PDF
-        pdf_data = extract_pdf(file_path)
-        raw_text = pdf_data["raw_text"]
+        # Step 1: Serve a mind map generated earlier for the same PDF and topic
+        key, cached = _lookup(_document_digest(file_path), topic, levels)
+        if cached is not None:
+            return cached, "HIT"
+        
+        # Step 2: Stream text from PDF page by page
+        raw_text = _read_text(file_path)
+        
+        # Steps 3-4: Filter text by topic and generate the mind map
+        result = _text_to_mindmap(raw_text, topic, levels)
+        
+        return result, _store(key, result)
+        
+    except Exception as e:
+        # Propagate the first error encountered
+        raise Exception(f"Pipeline failed: {str(e)}")
+
+
+def _text_to_mindmap(raw_text: str, topic: str, levels: Optional[int] = None) -> Dict[str, dict]:
+    """Filter extracted text by topic and generate its mind map."""
+    # Filter text by topic
+    filtered_data = filter_topic_text(raw_text, topic)
+    
+    # Check if content was found
+    if not filtered_data.get("topic_text"):
+        raise ValueError(filtered_data.get("message", "No content found for topic"))
+    
+    topic_text = filtered_data["topic_text"]
+    
+    # Generate mind map
+    return generate_mindmap(topic_text, levels)
+
+
+async def _atext_to_mindmap(raw_text: str, topic: str, levels: Optional[int] = None) -> Dict[str, dict]:
+    """Async counterpart of _text_to_mindmap()."""
+    filtered_data = await afilter_topic_text(raw_text, topic)
+    if not filtered_data.get("topic_text"):
+        raise ValueError(filtered_data.get("message", "No content found for topic"))
+    
+    return await agenerate_mindmap(filtered_data["topic_text"], levels)
+
+
+async def atopic_to_mindmap(file_path: str, topic: str, levels: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Async counterpart of topic_to_mindmap().
+    PDF parsing runs in a worker thread and AI calls are awaited, so the
+    event loop stays free for other requests.
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topic: User-specified topic
+        levels: Generate only this many levels (default: at least 4);
+                deeper branches can be added with expand_mindmap_node()
+        
+    Returns:
+        Dictionary containing the mind map structure
+        
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    result, _ = await acached_topic_to_mindmap(file_path, topic, levels)
+    return result
+
+
+async def acached_topic_to_mindmap(
+    file_path: str, topic: str, levels: Optional[int] = None
+) -> Tuple[Dict[str, dict], str]:
+    """
+    Async counterpart of cached_topic_to_mindmap().
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topic: User-specified topic
+        levels: Generate only this many levels (default: at least 4)
+        
+    Returns:
+        Tuple of (mind map result, cache status): "HIT", "MISS" or "BYPASS"
+        
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    try:
+        # Hashing the PDF and SQLite reads and writes are blocking I/O
+        digest = await asyncio.to_thread(_document_digest, file_path)
+        key, cached = await asyncio.to_thread(_lookup, digest, topic, levels)
+        if cached is not None:
+            return cached, "HIT"
+        
+        raw_text = await asyncio.to_thread(_read_text, file_path)
+        
+        result = await _atext_to_mindmap(raw_text, topic, levels)
+        
+        return result, await asyncio.to_thread(_store, key, result)
+        
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
+
+
+def _replay(mindmap: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Stream events for a cached mind map, each node after its parent."""
+    structure = MindMap.from_dict(mindmap, strict=False)
+    events = [{"event": "topic", "topic": mindmap["topic"]}]
+    events.extend({"event": "node", "node": structure.node(position)} for position, _ in structure.walk())
+    events.append({"event": "done", "mindmap": mindmap})
+    return events
+
+
+def stream_topic_to_mindmap(file_path: str, topic: str, levels: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of topic_to_mindmap().
+    Yields the mind map's topic and then each node as soon as the AI has
+    produced it, followed by the complete mind map (see stream_mindmap()).
+    A cached mind map is replayed as the same events.
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topic: User-specified topic
+        levels: Generate only this many levels (default: at least 4);
+                deeper branches can be added with expand_mindmap_node()
+        
+    Yields:
+        Mind map events
+        
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    try:
+        key, cached = _lookup(_document_digest(file_path), topic, levels)
+        if cached is not None:
+            yield from _replay(cached["mindmap"])
+            return
+        
+        raw_text = _read_text(file_path)
         
-        # Step 2: Filter text by topic
         filtered_data = filter_topic_text(raw_text, topic)
+        if not filtered_data.get("topic_text"):
+            raise ValueError(filtered_data.get("message", "No content found for topic"))
         
-        # Check if content was found
+        for event in stream_mindmap(filtered_data["topic_text"], levels):
+            if event["event"] == "done":
+                _store(key, {"mindmap": event["mindmap"]})
+            yield event
+        
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
+
+
+async def astream_topic_to_mindmap(
+    file_path: str, topic: str, levels: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async counterpart of stream_topic_to_mindmap().
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topic: User-specified topic
+        levels: Generate only this many levels (default: at least 4);
+                deeper branches can be added with expand_mindmap_node()
+        
+    Yields:
+        Mind map events
+        
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    try:
+        digest = await asyncio.to_thread(_document_digest, file_path)
+        key, cached = await asyncio.to_thread(_lookup, digest, topic, levels)
+        if cached is not None:
+            for event in _replay(cached["mindmap"]):
+                yield event
+            return
+        
+        raw_text = await asyncio.to_thread(_read_text, file_path)
+        
+        filtered_data = await afilter_topic_text(raw_text, topic)
         if not filtered_data.get("topic_text"):
             raise ValueError(filtered_data.get("message", "No content found for topic"))
         
-        topic_text = filtered_data["topic_text"]
+        async for event in astream_mindmap(filtered_data["topic_text"], levels):
+            if event["event"] == "done":
+                await asyncio.to_thread(_store, key, {"mindmap": event["mindmap"]})
+            yield event
+        
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
+
+
+def expand_mindmap_node(
+    file_path: str, mindmap: Dict[str, Any], node_id: int, levels: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Pipeline to generate the subtree below one node of a mind map.
+    Re-reading the PDF is cheap once its text is in the extracted-text cache.
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        mindmap: Mind map previously generated for the PDF
+        node_id: Id of the node to expand
+        levels: Levels generated below the node (default: EXPAND_LEVELS)
+        
+    Returns:
+        Dictionary with the expanded node_id and the new nodes
         
-        # Step 3: Generate mind map
-        mindmap_data = generate_mindmap(topic_text)
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    try:
+        raw_text = _read_text(file_path)
         
-        return mindmap_data
+        return expand_node(raw_text, mindmap, node_id, levels)
         
     except Exception as e:
-        # Propagate the first error encountered
         raise Exception(f"Pipeline failed: {str(e)}")
+
+
+async def aexpand_mindmap_node(
+    file_path: str, mindmap: Dict[str, Any], node_id: int, levels: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Async counterpart of expand_mindmap_node().
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        mindmap: Mind map previously generated for the PDF
+        node_id: Id of the node to expand
+        levels: Levels generated below the node (default: EXPAND_LEVELS)
+        
+    Returns:
+        Dictionary with the expanded node_id and the new nodes
+        
+    Raises:
+        Exception: If any step in the pipeline fails
+    """
+    try:
+        raw_text = await asyncio.to_thread(_read_text, file_path)
+        
+        return await aexpand_node(raw_text, mindmap, node_id, levels)
+        
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
+
+
+def _warm_index(raw_text: str):
+    """Build the document's retrieval index once, before concurrent topics share it."""
+    if FILTER_MODE == "retrieval" and len(raw_text) > FILTER_CONTEXT_CHARS:
+        get_document_index(raw_text)
+
+
+def _batch_lookup(
+    digest: Optional[str], topics: List[str], levels: Optional[int]
+) -> Tuple[Dict[str, Optional[str]], List[Dict[str, Any]]]:
+    """Cache keys of the topics still to generate, and events for the cached ones."""
+    keys = {}
+    hits = []
+    for topic in topics:
+        key, cached = _lookup(digest, topic, levels)
+        if cached is None:
+            keys[topic] = key
+        else:
+            hits.append({"event": "mindmap", "topic": topic, "cache": "HIT", **cached})
+    return keys, hits
+
+
+def topics_to_mindmaps(
+    file_path: str, topics: List[str], levels: Optional[int] = None, workers: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Pipeline to generate mind maps for several topics of one PDF.
+    Cached topics are yielded first; the PDF is then read and indexed
+    once, the other topics are filtered and generated concurrently, and
+    each result is yielded as it completes.
+    
+    Events, in completion order:
+        {"event": "mindmap", "topic": str, "cache": str, "mindmap": {"topic", "nodes"}}
+        {"event": "error", "topic": str, "error": Exception}
+    
+    "cache" is "HIT", "MISS" or "BYPASS" (result cache disabled).
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topics: User-specified topics
+        levels: Generate only this many levels (default: at least 4)
+        workers: Topics processed concurrently (default: BATCH_WORKERS)
+        
+    Yields:
+        One event per topic; a failed topic does not stop the others
+        
+    Raises:
+        Exception: If the PDF cannot be read
+    """
+    try:
+        keys, hits = _batch_lookup(_document_digest(file_path), topics, levels)
+        if keys:
+            raw_text = _read_text(file_path)
+            _warm_index(raw_text)
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
+    
+    yield from hits
+    if not keys:
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=workers or BATCH_WORKERS)
+    try:
+        # Each worker inherits the caller's deadline and cache settings
+        futures = {
+            executor.submit(contextvars.copy_context().run, _text_to_mindmap, raw_text, topic, levels): topic
+            for topic in keys
+        }
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                yield {"event": "error", "topic": topic, "error": e}
+            else:
+                yield {"event": "mindmap", "topic": topic, "cache": _store(keys[topic], result), **result}
+    finally:
+        # A consumer that stops early does not wait for topics not yet started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def atopics_to_mindmaps(
+    file_path: str, topics: List[str], levels: Optional[int] = None, workers: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async counterpart of topics_to_mindmaps(), bounded by a semaphore.
+    
+    Args:
+        file_path: Path to the uploaded PDF
+        topics: User-specified topics
+        levels: Generate only this many levels (default: at least 4)
+        workers: Topics processed concurrently (default: BATCH_WORKERS)
+        
+    Yields:
+        One event per topic, in completion order
+        
+    Raises:
+        Exception: If the PDF cannot be read
+    """
+    try:
+        digest = await asyncio.to_thread(_document_digest, file_path)
+        keys, hits = await asyncio.to_thread(_batch_lookup, digest, topics, levels)
+        if keys:
+            raw_text = await asyncio.to_thread(_read_text, file_path)
+            await asyncio.to_thread(_warm_index, raw_text)
+    except Exception as e:
+        raise Exception(f"Pipeline failed: {str(e)}")
+    
+    for event in hits:
+        yield event
+    if not keys:
+        return
+    
+    semaphore = asyncio.Semaphore(workers or BATCH_WORKERS)
+    
+    async def run(topic: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await _atext_to_mindmap(raw_text, topic, levels)
+            except Exception as e:
+                return {"event": "error", "topic": topic, "error": e}
+            status = await asyncio.to_thread(_store, keys[topic], result)
+            return {"event": "mindmap", "topic": topic, "cache": status, **result}
+    
+    tasks = [asyncio.ensure_future(run(topic)) for topic in keys]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # A client that disconnects cancels the topics still running
+        for task in tasks:
+            task.cancel()
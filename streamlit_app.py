@@ -10,9 +10,10 @@ import os
 
 # Import our blocks directly
 from blocks.extract_pdf import extract_pdf
-from blocks.detect_topics import detect_topics
+from blocks.detect_topics import MAX_INPUT_CHARS, TOPIC_SAMPLING, detect_topics
 from blocks.filter_topic_text import filter_topic_text
 from blocks.generate_mindmap import generate_mindmap
+from utils.mindmap import MindMap
 
 # Page configuration
 st.set_page_config(
@@ -131,8 +132,12 @@ if uploaded_file:
         if st.button("🔍 Detect Topics", key="detect", use_container_width=True):
             with st.spinner("🔄 Analyzing your PDF..."):
                 try:
-                    # Extract text from PDF
-                    pdf_data = extract_pdf(st.session_state.pdf_path)
+                    # Sample only as much text as topic detection reads
+                    pdf_data = extract_pdf(
+                        st.session_state.pdf_path,
+                        max_chars=MAX_INPUT_CHARS,
+                        sampling=TOPIC_SAMPLING
+                    )
                     
                     # Detect topics
                     topics_data = detect_topics(pdf_data["raw_text"])
@@ -213,30 +218,14 @@ if st.session_state.mindmap:
     
     # Display nodes in a structured way (as fallback or additional view)
     with st.expander("📊 View Text Structure", expanded=False):
-        # Group nodes by parent
-        nodes_by_parent = {}
-        for node in mindmap.get("nodes", []):
-            parent = node["parent"]
-            if parent not in nodes_by_parent:
-                nodes_by_parent[parent] = []
-            nodes_by_parent[parent].append(node)
-        
-        # Display root nodes (parent = 0)
-        if 0 in nodes_by_parent:
-            for node in nodes_by_parent[0]:
-                st.markdown(f"### 🔹 {node['text']}")
-                # Display children
-                if node["id"] in nodes_by_parent:
-                    for child in nodes_by_parent[node["id"]]:
-                        st.markdown(f"  - {child['text']}")
-                        # Display grandchildren
-                        if child["id"] in nodes_by_parent:
-                            for grandchild in nodes_by_parent[child["id"]]:
-                                st.markdown(f"    - {grandchild['text']}")
-                                # Display great-grandchildren
-                                if grandchild["id"] in nodes_by_parent:
-                                    for ggchild in nodes_by_parent[grandchild["id"]]:
-                                        st.markdown(f"      - {ggchild['text']}")
+        # Display the first four levels: top-level nodes as headings, then nested bullets
+        structure = MindMap.from_dict(mindmap, strict=False)
+        for position, depth in structure.walk(max_depth=3):
+            text = structure.texts[position]
+            if depth == 0:
+                st.markdown(f"### 🔹 {text}")
+            else:
+                st.markdown(f"{'  ' * depth}- {text}")
     
     # Download buttons
     st.markdown("## 📥 Download Your Mind Map")
@@ -0,0 +1,13 @@
+"""
+Shared test configuration.
+Tests run against the local stub provider unless AI_PROVIDER is set,
+so the pipelines can be exercised offline and reproducibly. Persistent
+caches are off by default; tests that need one point it at tmp_path.
+"""
+import os
+
+
+os.environ.setdefault("AI_PROVIDER", "stub")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("MINDMAP_CACHE_ENABLED", "0")
+os.environ.setdefault("TEXT_CACHE_ENABLED", "0")
@@ -0,0 +1,215 @@
+"""
+Unit tests for the AI helper layer (no network access required).
+"""
+import asyncio
+import os
+import threading
+import time
+import pytest
+from utils import ai_helper, file_manager
+from utils import llm_cache as llm_cache_module
+from utils.llm_cache import LLMCache
+from utils.llm_clients import ClientRegistry
+from utils.singleflight import SingleFlight
+
+
+def test_registry_reuses_one_client_across_threads(monkeypatch):
+    """Test that concurrent callers share a single pooled client."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    registry = ClientRegistry(max_connections=7, max_keepalive=3)
+    clients = []
+
+    threads = [threading.Thread(target=lambda: clients.append(registry.get("openai"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+    assert registry._limits().max_connections == 7
+    assert registry._limits().max_keepalive_connections == 3
+    registry.reset()
+
+
+def test_registry_reads_environment_once(monkeypatch):
+    """Test that settings are cached until reset()."""
+    monkeypatch.setenv("OPENAI_MODEL", "first-model")
+    registry = ClientRegistry()
+    assert registry.config("openai").model == "first-model"
+
+    monkeypatch.setenv("OPENAI_MODEL", "second-model")
+    assert registry.config("openai").model == "first-model"
+
+    registry.reset()
+    assert registry.config("openai").model == "second-model"
+
+
+def test_registry_requires_api_key(monkeypatch):
+    """Test that a missing API key is reported by name."""
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    registry = ClientRegistry()
+
+    with pytest.raises(ValueError, match="GROQ_API_KEY"):
+        registry.get("groq")
+
+
+@pytest.fixture
+def isolated_llm_cache(tmp_path, monkeypatch):
+    """Point the shared response cache at a temporary database."""
+    cache = LLMCache(path=str(tmp_path / "llm.sqlite3"), enabled=True)
+    monkeypatch.setattr(ai_helper, "llm_cache", cache)
+    monkeypatch.setenv("AI_PROVIDER", "openai")
+    yield cache
+    cache.close()
+
+
+def test_llm_cache_serves_repeated_prompts(isolated_llm_cache, monkeypatch):
+    """Test that a repeated prompt is answered from the cache."""
+    calls = []
+    monkeypatch.setattr(ai_helper, "_call_openai", lambda prompt, json_mode=False: calls.append(prompt) or f"answer to {prompt}")
+
+    assert ai_helper.llm("same prompt") == "answer to same prompt"
+    assert ai_helper.llm("same prompt") == "answer to same prompt"
+    assert ai_helper.llm("same prompt", use_cache=False) == "answer to same prompt"
+    assert ai_helper.llm("other prompt") == "answer to other prompt"
+
+    assert calls == ["same prompt", "same prompt", "other prompt"]
+    assert isolated_llm_cache.stats()["hits"] == 1
+
+
+def test_llm_cache_retry_replaces_bad_response(isolated_llm_cache, monkeypatch):
+    """Test that a retry bypasses a cached response that failed to parse."""
+    responses = iter(["not json", '{"ok": true}'])
+    monkeypatch.setattr(ai_helper, "_call_openai", lambda prompt, json_mode=False: next(responses))
+    monkeypatch.setattr(ai_helper.time, "sleep", lambda seconds: None)
+
+    @ai_helper.retry_on_failure(max_retries=1)
+    def parse():
+        return ai_helper.validate_json_response(ai_helper.llm("prompt"))
+
+    assert parse() == {"ok": True}
+    assert ai_helper.llm("prompt") == '{"ok": true}'
+
+
+def test_llm_cache_evicts_expired_and_least_recent(tmp_path, monkeypatch):
+    """Test TTL expiry and LRU eviction by total size."""
+    cache = LLMCache(path=str(tmp_path / "llm.sqlite3"), ttl=60, max_bytes=10)
+    clock = [1000.0]
+    monkeypatch.setattr("utils.llm_cache.time.time", lambda: clock[0])
+
+    cache.put("a", "aaaa")
+    clock[0] += 1
+    cache.put("b", "bbbb")
+    clock[0] += 1
+    assert cache.get("a") == "aaaa"
+    clock[0] += 1
+    cache.put("c", "cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+
+    clock[0] += 120
+    assert cache.get("c") is None
+    cache.close()
+
+
+def test_llm_cache_survives_temp_cleanup(tmp_path, monkeypatch):
+    """Test that the startup cleanup of old uploads keeps the default cache database."""
+    relative_path = os.path.relpath(llm_cache_module.LLM_CACHE_PATH, file_manager.TEMP_DIR)
+    monkeypatch.setattr(file_manager, "TEMP_DIR", str(tmp_path))
+    cache = LLMCache(path=str(tmp_path / relative_path), enabled=True)
+    cache.put("key", "response")
+    cache.close()
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(b"%PDF")
+    os.utime(upload, (0, 0))
+
+    file_manager.cleanup_old_files(max_age_seconds=-1)
+
+    assert not upload.exists()
+    assert LLMCache(path=cache.path).get("key") == "response"
+
+
+def test_concurrent_identical_calls_are_coalesced(monkeypatch):
+    """Test that threads sending the same prompt share one provider call."""
+    flights = SingleFlight()
+    monkeypatch.setattr(ai_helper, "llm_flights", flights)
+    monkeypatch.setattr(ai_helper.llm_cache, "enabled", False)
+    monkeypatch.setenv("AI_PROVIDER", "openai")
+    release = threading.Event()
+    calls = []
+
+    def slow_call(provider, prompt, json_mode=False):
+        calls.append(prompt)
+        release.wait(5)
+        return "shared answer"
+
+    monkeypatch.setattr(ai_helper, "_call_provider", slow_call)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ai_helper.llm("same prompt"))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()["calls"] < 6:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["same prompt"]
+    assert results == ["shared answer"] * 6
+    assert flights.stats() == {"calls": 6, "executions": 1, "collapsed": 5, "in_flight": 0}
+
+
+def test_async_coalescing_shares_result_and_errors(monkeypatch):
+    """Test that concurrent coroutines share one call, including its failure."""
+    flights = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def run():
+        return await asyncio.gather(*(flights.ado("key", failing) for _ in range(4)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()["collapsed"] == 3
+
+
+@pytest.mark.parametrize("response, expected", [
+    ('{"topics": ["A"]}', {"topics": ["A"]}),
+    ('Sure! ```json\n{"topic": "T", "nodes": []}\n``` Hope this helps.', {"topic": "T", "nodes": []}),
+    ('See [1]. Result: {"a": "brace } and [bracket] in a string", "b": [1, 2]} done', {"a": "brace } and [bracket] in a string", "b": [1, 2]}),
+    ('Topics: ["Cells", "Energy"] (from [the text)', ["Cells", "Energy"]),
+    ('{"broken": } then {"ok": true}', {"ok": True}),
+])
+def test_validate_json_response_salvages_embedded_json(response, expected):
+    """Test single-pass extraction of JSON surrounded by prose."""
+    assert ai_helper.validate_json_response(response) == expected
+
+
+def test_extract_json_is_linear_on_unbalanced_input():
+    """Test that pathological unbalanced input is rejected quickly."""
+    text = "{" * 200000 + "no json here"
+    started = time.monotonic()
+    with pytest.raises(ValueError):
+        ai_helper.validate_json_response(text)
+    assert time.monotonic() - started < 2
+
+
+def test_json_mode_sets_provider_format(monkeypatch):
+    """Test that json_mode requests a JSON object and restores Anthropic's prefill."""
+    assert ai_helper._json_format(True) == {"response_format": {"type": "json_object"}}
+    assert ai_helper._json_format(False) == {}
+    assert ai_helper._anthropic_messages("p", True)[-1] == {"role": "assistant", "content": "{"}
+
+    monkeypatch.setenv("AI_PROVIDER", "openai")
+    monkeypatch.setattr(ai_helper.llm_cache, "enabled", False)
+    seen = []
+    monkeypatch.setattr(ai_helper, "_call_openai", lambda prompt, json_mode=False: seen.append(json_mode) or "{}")
+    ai_helper.llm("prompt", json_mode=True)
+    assert seen == [True]
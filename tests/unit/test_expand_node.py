@@ -0,0 +1,105 @@
+"""
+Unit tests for shallow mind map generation and on-demand node expansion.
+"""
+import asyncio
+import json
+import pytest
+from blocks import expand_node as expand_block
+from blocks import generate_mindmap as mindmap_block
+from utils.mindmap import MindMap
+from utils.validation import validate_mindmap
+
+
+DEEP = {"topic": "T", "nodes": [
+    {"id": 1, "parent": 0, "text": "a"},
+    {"id": 2, "parent": 1, "text": "a.1"},
+    {"id": 3, "parent": 2, "text": "a.1.x"},
+    {"id": 4, "parent": 0, "text": "b"},
+]}
+
+MINDMAP = {"topic": "Astronomy", "nodes": [
+    {"id": 1, "parent": 0, "text": "Planets"},
+    {"id": 2, "parent": 0, "text": "Comets"},
+    {"id": 5, "parent": 1, "text": "Gas giants"},
+]}
+
+DOCUMENT = "\n\n".join(
+    [f"Comets are icy bodies with long tails, note {i}." for i in range(30)]
+    + [f"Gas giants such as Jupiter have deep atmospheres and many moons, note {i}." for i in range(30)]
+)
+
+
+def test_generation_keeps_requested_levels(monkeypatch):
+    """Test that levels beyond the request are dropped, in full and streamed responses."""
+    response = json.dumps(DEEP)
+    assert len(mindmap_block._parse_mindmap(response, levels=2)["mindmap"]["nodes"]) == 3
+    assert "exactly 2 levels" in mindmap_block._build_prompt("text", 2)
+
+    monkeypatch.setattr(mindmap_block, "llm_stream", lambda prompt, use_cache=None, json_mode=False: iter([response]))
+    events = list(mindmap_block.stream_mindmap("text", levels=1))
+    assert [event["node"]["id"] for event in events if event["event"] == "node"] == [1, 4]
+    assert events[-1]["mindmap"]["nodes"] == [DEEP["nodes"][0], DEEP["nodes"][3]]
+
+
+def test_expand_node_sends_the_node_passages(monkeypatch):
+    """Test that only passages about the node are sent, with its branch as context."""
+    prompts = []
+
+    def fake_llm(prompt, use_cache=None, json_mode=False):
+        prompts.append(prompt)
+        return json.dumps({"nodes": [
+            {"id": 7, "parent": 0, "text": "Jupiter"},
+            {"id": 8, "parent": 7, "text": "Moons"},
+            {"id": 9, "parent": 8, "text": "Too deep"},
+        ]})
+
+    monkeypatch.setattr(expand_block, "llm", fake_llm)
+    monkeypatch.setattr(expand_block, "EXPAND_CONTEXT_CHARS", 1000)
+
+    result = expand_block.expand_node(DOCUMENT, MINDMAP, node_id=5, levels=2)
+
+    assert "Node to expand: Planets > Gas giants" in prompts[0]
+    assert "Jupiter have deep atmospheres" in prompts[0]
+    assert "icy bodies" not in prompts[0]
+    assert result == {"node_id": 5, "nodes": [
+        {"id": 6, "parent": 5, "text": "Jupiter"},
+        {"id": 7, "parent": 6, "text": "Moons"},
+    ]}
+
+
+def test_expanded_nodes_merge_into_mindmap():
+    """Test sync and async expansion through the stub provider."""
+    result = expand_block.expand_node(DOCUMENT, MINDMAP, node_id=2)
+    async_result = asyncio.run(expand_block.aexpand_node(DOCUMENT, MINDMAP, node_id=2))
+    assert async_result == result
+
+    merged = MindMap("Astronomy", MINDMAP["nodes"] + result["nodes"])
+    added = [merged.position(node["id"]) for node in result["nodes"]]
+    assert all(1 <= merged.depths[position] <= expand_block.EXPAND_LEVELS for position in added)
+    assert any(merged.parents[position] == merged.position(2) for position in added)
+
+
+def test_expand_node_rejects_unknown_nodes():
+    """Test the errors for missing nodes and malformed client mind maps."""
+    with pytest.raises(Exception, match="Node 42 not found"):
+        expand_block.expand_node(DOCUMENT, MINDMAP, node_id=42)
+
+    assert validate_mindmap(json.dumps(MINDMAP), 5)[0]
+    assert validate_mindmap(json.dumps(MINDMAP), 42)[2] == "Node 42 not found in mind map"
+    assert not validate_mindmap("{not json", 1)[0]
+    assert "invalid parent" in validate_mindmap(json.dumps({"nodes": [{"id": 1, "parent": 3, "text": "a"}]}), 1)[2]
+
+
+@pytest.mark.parametrize("nodes, message", [
+    ([{"id": 99999999999999999999, "parent": 0, "text": "a"}], "64 bits"),
+    ([{"id": 1, "parent": 0, "text": 5}], "text must be a string"),
+    ([{"id": 1.5, "parent": 0, "text": "a"}], "ID must be an integer"),
+    ([{"id": 1, "text": "a"}], "must have 'id', 'parent', and 'text'"),
+    (["node"], "must be a dictionary"),
+])
+def test_validate_mindmap_rejects_malformed_nodes(nodes, message):
+    """Test that malformed client nodes fail validation instead of raising."""
+    is_valid, mindmap, error_message = validate_mindmap(json.dumps({"topic": "T", "nodes": nodes}), 1)
+
+    assert not is_valid
+    assert message in error_message
@@ -0,0 +1,90 @@
+"""
+Unit tests for outline extraction.
+"""
+import os
+import tempfile
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from blocks import extract_outline as outline_block
+from blocks.extract_outline import extract_outline, outline_topics
+from pipelines import pdf_to_topics as topics_pipeline
+from pipelines.pdf_to_topics import pdf_to_topics
+
+
+CHAPTERS = ["Cell Structure", "Photosynthesis", "Respiration", "Genetics"]
+
+
+def create_structured_pdf(with_bookmarks: bool) -> str:
+    """Helper function to create a PDF with large chapter headings."""
+    tmp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    tmp_path = tmp_file.name
+    tmp_file.close()
+
+    c = canvas.Canvas(tmp_path, pagesize=letter)
+    for number, chapter in enumerate(CHAPTERS, start=1):
+        if with_bookmarks:
+            c.bookmarkPage(f"ch{number}")
+            c.addOutlineEntry(chapter, f"ch{number}", level=0)
+        c.setFont("Helvetica-Bold", 20)
+        c.drawString(72, 720, chapter)
+        c.setFont("Helvetica", 11)
+        for line in range(10):
+            c.drawString(72, 690 - line * 14, f"Body text line {line} about {chapter.lower()} in detail.")
+        c.showPage()
+    c.save()
+
+    return tmp_path
+
+
+def test_outline_from_bookmarks():
+    """Test that bookmarks become level-0 headings with page numbers."""
+    pdf_path = create_structured_pdf(with_bookmarks=True)
+
+    try:
+        result = extract_outline(pdf_path)
+
+        assert result["source"] == "bookmarks"
+        assert [heading["title"] for heading in result["outline"]] == CHAPTERS
+        assert [heading["page"] for heading in result["outline"]] == [1, 2, 3, 4]
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_outline_from_font_sizes(monkeypatch):
+    """Test that large bold lines are detected as headings without bookmarks."""
+    pdf_path = create_structured_pdf(with_bookmarks=False)
+
+    try:
+        result = extract_outline(pdf_path)
+
+        assert result["source"] == "fonts"
+        assert outline_topics(result["outline"]) == CHAPTERS
+        # With font headings enabled, the outline answers without an AI call
+        monkeypatch.setattr(topics_pipeline, "OUTLINE_USE_FONTS", True)
+        assert pdf_to_topics(pdf_path)["topics"] == CHAPTERS
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_pipeline_skips_font_scan_by_default(monkeypatch):
+    """Test that topic detection does not scan page fonts unless enabled."""
+    pdf_path = create_structured_pdf(with_bookmarks=False)
+
+    def fail(pdf):
+        raise AssertionError("font headings scanned")
+
+    monkeypatch.setattr(outline_block, "_font_headings", fail)
+
+    try:
+        topics = pdf_to_topics(pdf_path)["topics"]
+
+        # Sampled text goes to topic detection instead of the outline
+        assert topics
+        assert topics != CHAPTERS
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
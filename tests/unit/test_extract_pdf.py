@@ -0,0 +1,159 @@
+"""
+Unit tests for PDF extraction.
+"""
+import os
+import tempfile
+import pytest
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+import blocks.extract_pdf as extract_module
+from blocks.extract_pdf import extract_pdf, iter_pages, join_pages, sample_pages
+from utils.text_cache import TextCache
+
+
+def create_multipage_pdf(page_count: int) -> str:
+    """Helper function to create a PDF with one numbered line per page."""
+    tmp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    tmp_path = tmp_file.name
+    tmp_file.close()
+
+    c = canvas.Canvas(tmp_path, pagesize=letter)
+    for page_number in range(1, page_count + 1):
+        c.drawString(100, 750, f"Page {page_number} content")
+        c.showPage()
+    c.save()
+
+    return tmp_path
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    """Point the extraction block at an empty text cache."""
+    cache = TextCache(cache_dir=str(tmp_path / "text_cache"))
+    monkeypatch.setattr(extract_module, "text_cache", cache)
+    return cache
+
+
+def test_parallel_extraction_matches_serial():
+    """Test that sharding pages across processes preserves page order."""
+    pdf_path = create_multipage_pdf(40)
+
+    try:
+        serial = extract_pdf(pdf_path, workers=1, use_cache=False)["raw_text"]
+        parallel = extract_pdf(pdf_path, workers=2, use_cache=False)["raw_text"]
+
+        assert parallel == serial
+        lines = serial.splitlines()
+        assert lines[0] == "Page 1 content"
+        assert lines[-1] == "Page 40 content"
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_iter_pages_yields_pages_in_order():
+    """Test that iter_pages streams numbered pages in order."""
+    pdf_path = create_multipage_pdf(3)
+
+    try:
+        pages = list(iter_pages(pdf_path, use_cache=False))
+
+        assert [page_number for page_number, _ in pages] == [1, 2, 3]
+        assert pages[1][1] == "Page 2 content"
+        assert join_pages(pages) == extract_pdf(pdf_path, use_cache=False)["raw_text"]
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_text_cache_hits_on_same_bytes(isolated_cache):
+    """Test that a document is parsed once and then served from the cache."""
+    pdf_path = create_multipage_pdf(2)
+
+    try:
+        first = extract_pdf(pdf_path, use_cache=True)["raw_text"]
+        second = extract_pdf(pdf_path, use_cache=True)["raw_text"]
+
+        assert first == second
+        stats = isolated_cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["entries"] == 1
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_text_cache_evicts_least_recently_used(tmp_path):
+    """Test that size-based eviction drops the oldest entries first."""
+    cache = TextCache(cache_dir=str(tmp_path), max_bytes=150)
+
+    for index in range(3):
+        list(cache.write_pages(f"doc{index}", [(1, "x" * 60)]))
+        os.utime(cache.path_for(f"doc{index}"), (index, index))
+
+    cache.evict()
+
+    assert not cache.contains("doc0")
+    assert cache.contains("doc2")
+
+
+def test_join_pages_stops_at_budget():
+    """Test that a character budget stops page consumption early."""
+    consumed = []
+
+    def pages():
+        for page_number in range(1, 101):
+            consumed.append(page_number)
+            yield page_number, "x" * 99
+
+    text = join_pages(pages(), max_chars=250)
+
+    assert len(text) == 250
+    assert consumed == [1, 2, 3]
+
+
+def test_even_sampling_spreads_across_document():
+    """Test that even sampling covers the whole document within budget."""
+    pdf_path = create_multipage_pdf(100)
+
+    try:
+        pages = list(sample_pages(pdf_path, max_chars=1200, strategy="even"))
+        page_numbers = [page_number for page_number, _ in pages]
+
+        assert page_numbers == sorted(page_numbers)
+        assert page_numbers[0] <= 50 < page_numbers[-1]
+        assert sum(len(text) for _, text in pages) <= 1200
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_section_sampling_uses_bookmarks():
+    """Test that section sampling picks bookmarked section start pages."""
+    tmp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    pdf_path = tmp_file.name
+    tmp_file.close()
+
+    c = canvas.Canvas(pdf_path, pagesize=letter)
+    for page_number in range(1, 31):
+        if page_number in (4, 17):
+            key = f"chapter{page_number}"
+            c.bookmarkPage(key)
+            c.addOutlineEntry(f"Chapter at {page_number}", key, level=0)
+        c.drawString(100, 750, f"Page {page_number} content")
+        c.showPage()
+    c.save()
+
+    try:
+        pages = list(sample_pages(pdf_path, max_chars=6000, strategy="sections"))
+
+        assert [page_number for page_number, _ in pages] == [4, 17]
+
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
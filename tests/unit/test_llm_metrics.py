@@ -0,0 +1,97 @@
+"""
+Unit tests for per-call AI metrics.
+"""
+import asyncio
+import pytest
+from utils import ai_helper
+from utils.llm_metrics import LLMMetrics, llm_stage, mark_first_byte, note_usage, price_for
+from utils.routing import HedgedRouter
+from utils.stub_provider import StubProvider
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """Route llm() to the stub provider with a fresh aggregator."""
+    metrics = LLMMetrics()
+    monkeypatch.setattr(ai_helper, "call_metrics", metrics)
+    monkeypatch.setattr(ai_helper, "stub_provider", StubProvider())
+    monkeypatch.setattr(ai_helper.llm_cache, "enabled", False)
+    monkeypatch.setenv("AI_PROVIDER", "stub")
+    monkeypatch.setenv("AI_ROUTING", "single")
+    return metrics
+
+
+def test_calls_are_grouped_by_stage_and_provider(metrics):
+    """Test that each provider call is attributed to the stage that made it."""
+    with llm_stage("filter_topic_text"):
+        ai_helper.llm("first prompt")
+        ai_helper.llm("second prompt")
+
+    @llm_stage("generate_mindmap")
+    async def generate():
+        return await ai_helper.allm("third prompt")
+
+    asyncio.run(generate())
+
+    stats = metrics.stats()
+    assert stats["totals"]["calls"] == 3
+    assert stats["by_stage"]["filter_topic_text"]["calls"] == 2
+    assert stats["by_stage"]["generate_mindmap"]["calls"] == 1
+    assert stats["by_provider"]["stub/stub-1"]["prompt_tokens"] > 0
+    assert stats["by_provider"]["stub/stub-1"]["cost"] == 0
+
+
+def test_reported_usage_timings_and_cost(monkeypatch):
+    """Test provider-reported usage, first byte timing and price overrides."""
+    monkeypatch.setenv("OPENAI_PRICE_PER_MTOK", "1,2")
+    metrics = LLMMetrics()
+
+    with metrics.track("openai", "gpt-4o") as call:
+        call.admit()
+        mark_first_byte()
+        note_usage(1000, 500)
+
+    record = metrics.records()[-1]
+    assert price_for("openai", "gpt-4o") == (1.0, 2.0)
+    assert record["cost"] == pytest.approx(0.002)
+    assert record["ttfb"] <= record["latency"]
+    assert record["ok"]
+
+
+def test_errors_and_cancelled_hedges_are_counted_separately():
+    """Test that failures count as errors but cancelled hedges do not."""
+    metrics = LLMMetrics()
+
+    with pytest.raises(ConnectionError):
+        with metrics.track("groq", "llama"):
+            raise ConnectionError("down")
+
+    async def cancelled():
+        with metrics.track("groq", "llama"):
+            await asyncio.sleep(5)
+
+    async def run():
+        task = asyncio.ensure_future(cancelled())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    totals = metrics.stats()["totals"]
+    assert totals["calls"] == 2
+    assert totals["errors"] == 1
+    assert totals["cancelled"] == 1
+    assert totals["latency_p50"] is None
+
+
+def test_failed_provider_call_is_recorded(metrics, monkeypatch):
+    """Test that an injected provider error is recorded against the provider."""
+    monkeypatch.setattr(ai_helper, "stub_provider", StubProvider(error_rate=1))
+    monkeypatch.setattr(ai_helper, "llm_router", HedgedRouter())
+
+    with pytest.raises(Exception, match="Stub API error"):
+        ai_helper.llm("prompt")
+
+    assert metrics.stats()["by_provider"]["stub/stub-1"]["errors"] == 1
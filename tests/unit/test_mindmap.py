@@ -0,0 +1,100 @@
+"""
+Unit tests for the indexed MindMap structure.
+"""
+import pytest
+from blocks.expand_node import _parse_expansion
+from blocks.generate_mindmap import _parse_mindmap
+from utils.ai_helper import InvalidResponseError
+from utils.mindmap import ROOT, MindMap, MindMapError
+
+
+NODES = [
+    {"id": 10, "parent": 0, "text": "A"},
+    {"id": 20, "parent": 10, "text": "A.1"},
+    {"id": 30, "parent": 0, "text": "B"},
+    {"id": 40, "parent": 20, "text": "A.1.a"},
+    {"id": 50, "parent": 10, "text": "A.2"},
+]
+
+
+def test_index_and_traversal():
+    """Test parents, depths, children and both traversal orders."""
+    mindmap = MindMap("Topic", NODES)
+
+    assert list(mindmap.parents) == [ROOT, 0, ROOT, 1, 0]
+    assert list(mindmap.depths) == [0, 1, 0, 2, 1]
+    assert list(mindmap.children(mindmap.position(10))) == [1, 4]
+    assert list(mindmap.children(ROOT)) == [0, 2]
+    assert mindmap.max_depth == 2
+
+    assert [mindmap.texts[p] for p, _ in mindmap.walk()] == ["A", "A.1", "A.1.a", "A.2", "B"]
+    assert [mindmap.texts[p] for p, _ in mindmap.walk(max_depth=1)] == ["A", "A.1", "A.2", "B"]
+    assert [[mindmap.texts[p] for p in level] for level in mindmap.levels()] == [["A", "B"], ["A.1", "A.2"], ["A.1.a"]]
+
+
+def test_json_round_trip_keeps_node_order():
+    """Test that to_json/from_json reproduce the original mind map."""
+    mindmap = MindMap("Topic", NODES)
+    assert MindMap.from_json(mindmap.to_json()).to_dict() == {"topic": "Topic", "nodes": NODES}
+    assert mindmap.node(3) == NODES[3]
+
+
+@pytest.mark.parametrize("nodes, message", [
+    ([{"id": 1, "parent": 0, "text": "a"}, {"id": 1, "parent": 0, "text": "b"}], "Duplicate node id: 1"),
+    ([{"id": 1, "parent": 7, "text": "a"}], "invalid parent reference: 7"),
+    ([{"id": 1, "parent": 0, "text": "a"}, {"id": 2, "parent": 3, "text": "b"}, {"id": 3, "parent": 2, "text": "c"}], "cycle"),
+    ([{"id": 1, "parent": 1, "text": "a"}], "cycle"),
+])
+def test_structural_problems(nodes, message):
+    """Test that strict mode rejects bad structures and lenient mode repairs them."""
+    with pytest.raises(MindMapError, match=message):
+        MindMap("Topic", nodes)
+
+    lenient = MindMap("Topic", nodes, strict=False)
+    assert message.split(":")[0] in lenient.problems[0]
+    assert sorted(p for p, _ in lenient.walk()) == list(range(len(nodes)))
+
+
+def test_deep_chain_does_not_recurse():
+    """Test that very deep mind maps are indexed and walked iteratively."""
+    count = 50_000
+    nodes = [{"id": i, "parent": i - 1, "text": str(i)} for i in range(1, count + 1)]
+    mindmap = MindMap("Chain", nodes)
+
+    assert mindmap.max_depth == count - 1
+    assert [p for p, _ in mindmap.walk()] == list(range(count))
+
+
+def test_parse_mindmap_rejects_cycles():
+    """Test that generated mind maps with parent cycles fail validation."""
+    response = '{"topic": "T", "nodes": [{"id": 1, "parent": 2, "text": "a"}, {"id": 2, "parent": 1, "text": "b"}]}'
+    with pytest.raises(InvalidResponseError, match="cycle"):
+        _parse_mindmap(response)
+
+
+def test_oversized_ids_are_invalid_responses():
+    """Test that ids beyond 64 bits are rejected as bad output rather than overflowing."""
+    node = '{"id": 99999999999999999999, "parent": 0, "text": "a"}'
+    with pytest.raises(MindMapError, match="64 bits"):
+        MindMap("Topic", [{"id": 2 ** 63, "parent": 0, "text": "a"}], strict=False)
+    with pytest.raises(InvalidResponseError, match="64 bits"):
+        _parse_mindmap('{"topic": "T", "nodes": [' + node + ']}')
+    with pytest.raises(InvalidResponseError, match="64 bits"):
+        _parse_expansion('{"nodes": [' + node + ']}', MindMap("T", [{"id": 1, "parent": 0, "text": "root"}]), 1, 2)
+
+
+def test_visualizations_cover_every_node():
+    """Test that deep and orphaned nodes are drawn rather than dropped."""
+    pytest.importorskip("plotly")
+    from utils.mindmap_visualizer import create_mindmap_visualization, create_simple_tree_visualization
+
+    nodes = [{"id": i, "parent": i - 1, "text": f"Level {i}"} for i in range(1, 8)]
+    nodes.append({"id": 99, "parent": 404, "text": "Orphan"})
+    data = {"topic": "Deep", "nodes": nodes}
+
+    figure = create_mindmap_visualization(data)
+    drawn = sum(len(trace.x) for trace in figure.data if trace.mode == "markers+text")
+    assert drawn == len(nodes)
+
+    html = create_simple_tree_visualization(data)
+    assert html.count("<div style=\"margin-left") == len(nodes)
@@ -0,0 +1,106 @@
+"""
+Unit tests for the mind map result cache.
+"""
+import asyncio
+import os
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from pipelines import topic_to_mindmap as mindmap_pipeline
+from utils import file_manager
+from utils import mindmap_cache as mindmap_cache_module
+from utils.llm_cache import LLMCache
+from utils.mindmap_cache import mindmap_key, normalize_topic
+from tests.unit.test_pipelines import create_sample_pdf
+
+
+@pytest.fixture
+def result_cache(tmp_path, monkeypatch):
+    """Enable a private result cache and count the pipeline's generation steps."""
+    cache = LLMCache(path=str(tmp_path / "mindmaps.sqlite3"), enabled=True)
+    monkeypatch.setattr(mindmap_pipeline, "mindmap_cache", cache)
+
+    generated = []
+    text_to_mindmap = mindmap_pipeline._text_to_mindmap
+
+    def counting(raw_text, topic, levels=None):
+        generated.append(topic)
+        return text_to_mindmap(raw_text, topic, levels)
+
+    monkeypatch.setattr(mindmap_pipeline, "_text_to_mindmap", counting)
+    pdf_path = create_sample_pdf("Machine Learning is a field of AI. It includes supervised and unsupervised learning.")
+    yield cache, generated, pdf_path
+    cache.close()
+    os.unlink(pdf_path)
+
+
+def test_key_normalizes_topic_only():
+    """Test that case and whitespace share a key while other settings do not."""
+    assert normalize_topic("  Machine\tLEARNING ") == "machine learning"
+    key = mindmap_key("abc", "Machine Learning", prompt_version="1")
+    assert mindmap_key("abc", " machine  learning", prompt_version="1") == key
+    assert mindmap_key("abd", "Machine Learning", prompt_version="1") != key
+    assert mindmap_key("abc", "Machine Learning", prompt_version="2") != key
+
+
+def test_pipeline_serves_repeated_topics_from_cache(result_cache):
+    """Test that a repeated PDF and topic skips generation in every pipeline variant."""
+    cache, generated, pdf_path = result_cache
+
+    result, status = mindmap_pipeline.cached_topic_to_mindmap(pdf_path, "Machine Learning")
+    assert status == "MISS"
+    assert mindmap_pipeline.cached_topic_to_mindmap(pdf_path, "machine  learning") == (result, "HIT")
+    assert asyncio.run(mindmap_pipeline.acached_topic_to_mindmap(pdf_path, "MACHINE LEARNING")) == (result, "HIT")
+    assert mindmap_pipeline.cached_topic_to_mindmap(pdf_path, "Machine Learning", levels=2)[1] == "MISS"
+    assert generated == ["Machine Learning", "Machine Learning"]
+
+    events = list(mindmap_pipeline.stream_topic_to_mindmap(pdf_path, "Machine Learning"))
+    assert events[-1] == {"event": "done", "mindmap": result["mindmap"]}
+    assert len([event for event in events if event["event"] == "node"]) == len(result["mindmap"]["nodes"])
+
+    batch = list(mindmap_pipeline.topics_to_mindmaps(pdf_path, ["machine learning", "Supervised learning"]))
+    assert [(event["topic"], event["cache"]) for event in batch] == [("machine learning", "HIT"), ("Supervised learning", "MISS")]
+    assert generated[-1] == "Supervised learning"
+    assert cache.stats()["entries"] == 3
+
+
+def test_disabled_cache_bypasses(result_cache, monkeypatch):
+    """Test that a disabled cache neither serves nor stores results."""
+    cache, generated, pdf_path = result_cache
+    cache.enabled = False
+
+    assert mindmap_pipeline.cached_topic_to_mindmap(pdf_path, "Machine Learning")[1] == "BYPASS"
+    assert mindmap_pipeline.cached_topic_to_mindmap(pdf_path, "Machine Learning")[1] == "BYPASS"
+    assert len(generated) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_survives_temp_cleanup(tmp_path, monkeypatch):
+    """Test that the startup cleanup of old uploads keeps the default cache database."""
+    relative_path = os.path.relpath(mindmap_cache_module.MINDMAP_CACHE_PATH, file_manager.TEMP_DIR)
+    monkeypatch.setattr(file_manager, "TEMP_DIR", str(tmp_path))
+    cache = LLMCache(path=str(tmp_path / relative_path), enabled=True)
+    cache.put("key", "mind map")
+    cache.close()
+
+    file_manager.cleanup_old_files(max_age_seconds=-1)
+
+    assert LLMCache(path=cache.path).get("key") == "mind map"
+
+
+def test_mindmap_endpoint_reports_cache_status(result_cache):
+    """Test that /pdf/mindmap answers a repeated request from the cache with X-Cache: HIT."""
+    cache, generated, pdf_path = result_cache
+    client = TestClient(app)
+    with open(pdf_path, "rb") as f:
+        pdf = f.read()
+
+    responses = [
+        client.post("/pdf/mindmap", files={"file": ("notes.pdf", pdf, "application/pdf")}, data={"topic": topic})
+        for topic in ("Machine Learning", "  machine learning ")
+    ]
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert [response.headers["X-Cache"] for response in responses] == ["MISS", "HIT"]
+    assert responses[1].json() == responses[0].json()
+    assert cache.stats()["entries"] == 1
@@ -1,13 +1,17 @@
 """
 Unit tests for pipelines.
 """
+import asyncio
 import pytest
 import os
 import tempfile
+import threading
+import time
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from pipelines.pdf_to_topics import pdf_to_topics
-from pipelines.topic_to_mindmap import topic_to_mindmap
+from pipelines import topic_to_mindmap as mindmap_pipeline
+from pipelines.topic_to_mindmap import atopics_to_mindmaps, topic_to_mindmap, topics_to_mindmaps
 
 
 def create_sample_pdf(text_content: str) -> str:
@@ -83,3 +87,54 @@ def test_pipeline_error_handling():
     finally:
         if os.path.exists(pdf_path):
             os.unlink(pdf_path)
+
+
+def test_batch_pipeline_reports_each_topic():
+    """Test that a batch yields one result per topic and isolates failures."""
+    pdf_path = create_sample_pdf("Machine Learning is a field of AI. It includes supervised and unsupervised learning.")
+    
+    async def collect():
+        return [event async for event in atopics_to_mindmaps(pdf_path, ["Machine Learning", ""])]
+    
+    try:
+        for events in (list(topics_to_mindmaps(pdf_path, ["Machine Learning", ""])), asyncio.run(collect())):
+            by_topic = {event["topic"]: event for event in events}
+            assert len(events) == 2
+            assert by_topic["Machine Learning"]["event"] == "mindmap"
+            assert by_topic["Machine Learning"]["mindmap"]["nodes"]
+            assert by_topic[""]["event"] == "error"
+            assert isinstance(by_topic[""]["error"], Exception)
+    finally:
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+
+def test_batch_pipeline_bounds_concurrency(monkeypatch):
+    """Test that at most `workers` topics run at once and the PDF is read once."""
+    reads = []
+    running = []
+    peak = []
+    lock = threading.Lock()
+    
+    def fake_read(file_path):
+        reads.append(file_path)
+        return "text"
+    
+    def fake_mindmap(raw_text, topic, levels=None):
+        with lock:
+            running.append(topic)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(topic)
+        return {"mindmap": {"topic": topic, "nodes": []}}
+    
+    monkeypatch.setattr(mindmap_pipeline, "_read_text", fake_read)
+    monkeypatch.setattr(mindmap_pipeline, "_text_to_mindmap", fake_mindmap)
+    
+    topics = [f"Topic {i}" for i in range(8)]
+    events = list(topics_to_mindmaps("doc.pdf", topics, workers=3))
+    
+    assert reads == ["doc.pdf"]
+    assert sorted(event["topic"] for event in events) == sorted(topics)
+    assert max(peak) <= 3
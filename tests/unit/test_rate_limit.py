@@ -0,0 +1,101 @@
+"""
+Unit tests for client-side provider rate limiting.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from utils.rate_limit import FairSemaphore, ProviderLimiter, RateLimitTimeout, TokenBucket
+from utils.retry import deadline_scope
+
+
+def test_token_bucket_queues_reservations_in_order():
+    """Test that reservations beyond capacity wait for refill, in call order."""
+    bucket = TokenBucket(60, capacity=2)
+
+    assert bucket.reserve(1, now=bucket.updated) == 0
+    assert bucket.reserve(1, now=bucket.updated) == 0
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(1.0)
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(2.0)
+
+    bucket.refund(2)
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(1.0)
+
+
+def test_fair_semaphore_admits_in_arrival_order():
+    """Test that queued threads get slots first come, first served."""
+    semaphore = FairSemaphore(1)
+    semaphore.acquire()
+    admitted = []
+
+    def worker(index):
+        semaphore.acquire()
+        admitted.append(index)
+        semaphore.release()
+
+    threads = []
+    for index in range(5):
+        thread = threading.Thread(target=worker, args=(index,))
+        thread.start()
+        threads.append(thread)
+        while semaphore.waiting < index + 1:
+            time.sleep(0.001)
+
+    semaphore.release()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == [0, 1, 2, 3, 4]
+    assert semaphore.in_use == 0
+
+
+def test_cancelled_async_waiter_does_not_leak_slot():
+    """Test that a cancelled coroutine leaves the queue without holding a slot."""
+    semaphore = FairSemaphore(1)
+
+    async def run():
+        await semaphore.aacquire()
+        waiter = asyncio.ensure_future(semaphore.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        semaphore.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.wait_for(semaphore.aacquire(), 1)
+        semaphore.release()
+
+    asyncio.run(run())
+    assert semaphore.in_use == 0
+    assert semaphore.waiting == 0
+
+
+def test_limiter_refuses_waits_past_the_deadline():
+    """Test that a call that would wait beyond its deadline fails fast and refunds."""
+    limiter = ProviderLimiter(requests_per_minute=1, max_concurrency=2)
+
+    with limiter.acquire(tokens=10):
+        pass
+    with deadline_scope(0.1):
+        with pytest.raises(RateLimitTimeout):
+            with limiter.acquire(tokens=10):
+                pass
+
+    assert limiter.stats()["calls"] == 1
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_limiter_paces_requests_and_refunds_unused_tokens():
+    """Test that calls are spaced by the requests/min rate and unused tokens return."""
+    limiter = ProviderLimiter(requests_per_minute=600, tokens_per_minute=1000)
+    limiter.requests.tokens = 1
+    limiter.tokens.tokens = 1000
+
+    started = time.monotonic()
+    for _ in range(3):
+        with limiter.acquire(tokens=500) as slot:
+            slot.settle(500, 100)
+    elapsed = time.monotonic() - started
+
+    assert 0.15 <= elapsed < 1
+    assert limiter.stats()["throttled"] == 2
+    assert limiter.tokens.tokens == pytest.approx(1000 - 300, abs=5)
@@ -0,0 +1,142 @@
+"""
+Unit tests for BM25 retrieval and retrieval-based and chunked topic filtering.
+"""
+import asyncio
+import re
+import time
+import pytest
+from blocks import filter_topic_text as filter_block
+from blocks.filter_topic_text import filter_topic_text
+from utils import retry
+from utils.bm25 import BM25Index, split_passages
+
+
+FILLER = "General course information about deadlines, grading and office hours.\n" * 12
+
+
+def build_document() -> str:
+    """Helper building a long document with one topic buried past 40,000 characters."""
+    sections = [FILLER + "\n"] * 60
+    sections.append(
+        "Mitochondria produce ATP through oxidative phosphorylation.\n"
+        "The mitochondria contain their own DNA and ribosomes.\n\n"
+    )
+    sections.extend([FILLER + "\n"] * 10)
+    return "".join(sections)
+
+
+def build_parts_document() -> str:
+    """Helper building a document of four labelled parts, one per filtering chunk."""
+    return "".join(f"Part {number}\n" + "x" * 39000 + "\n\n" for number in range(1, 5))
+
+
+def test_bm25_ranks_relevant_passage_first():
+    """Test that the passage mentioning the query terms ranks first."""
+    index = BM25Index(split_passages(build_document()))
+
+    hits = index.search("Mitochondria", top_k=3)
+
+    assert hits
+    assert "Mitochondria produce ATP" in index.passages[hits[0][0]]
+    assert index.search("quantum chromodynamics") == []
+
+
+def test_bm25_round_trip():
+    """Test that a serialized index returns identical results."""
+    index = BM25Index(split_passages(build_document()))
+
+    restored = BM25Index.from_dict(index.to_dict())
+
+    assert restored.search("mitochondria dna") == index.search("mitochondria dna")
+
+
+def test_retrieval_filter_sends_relevant_passages(monkeypatch):
+    """Test that the filter prompt holds the retrieved passage, not the document head."""
+    prompts = []
+
+    def fake_llm(prompt):
+        prompts.append(prompt)
+        return "Mitochondria produce ATP and contain their own DNA and ribosomes."
+
+    monkeypatch.setattr("blocks.filter_topic_text.llm", fake_llm)
+    monkeypatch.setattr("utils.bm25.TEXT_CACHE_ENABLED", False)
+    document = build_document()
+    assert document.index("Mitochondria") > 40000
+
+    result = filter_topic_text(document, "mitochondria", mode="retrieval")
+
+    assert result["topic_text"]
+    assert "oxidative phosphorylation" in prompts[0]
+    assert len(prompts[0]) < len(document) / 10
+
+
+def test_chunked_filter_merges_in_document_order(monkeypatch):
+    """Test that chunk results are merged in document order, skipping empty chunks."""
+    def fake_llm(prompt):
+        number = int(re.search(r"Part (\d+)", prompt).group(1))
+        # Later chunks finish first
+        time.sleep(0.01 * (5 - number))
+        if number == 2:
+            return "NONE"
+        return f"Relevant content from part {number} about the requested topic, kept verbatim."
+
+    monkeypatch.setattr("blocks.filter_topic_text.llm", fake_llm)
+    document = build_parts_document()
+
+    result = filter_topic_text(document, "anything", mode="chunked")
+
+    parts = [int(number) for number in re.findall(r"part (\d+)", result["topic_text"])]
+    assert parts == [1, 3, 4]
+
+
+def test_chunked_filter_gives_each_chunk_its_own_deadline(monkeypatch):
+    """Test that chunks are not all bound by one deadline for the whole document."""
+    deadlines = []
+
+    def fake_llm(prompt):
+        deadlines.append(retry._deadline.get())
+        time.sleep(0.01)
+        return "Relevant content about the requested topic, kept verbatim from the chunk."
+
+    monkeypatch.setattr("blocks.filter_topic_text.llm", fake_llm)
+    monkeypatch.setattr(filter_block, "FILTER_WORKERS", 1)
+    document = build_parts_document()
+
+    filter_topic_text(document, "anything", mode="chunked")
+
+    assert len(deadlines) == 4
+    assert deadlines == sorted(set(deadlines))
+
+
+def test_chunked_filter_raises_when_a_chunk_fails(monkeypatch):
+    """Test that a failed chunk fails the filter instead of being dropped from the merge."""
+    def fake_llm(prompt):
+        if "Part 3" in prompt:
+            raise ConnectionError("provider unavailable")
+        return "Relevant content about the requested topic, kept verbatim from the chunk."
+
+    monkeypatch.setattr("blocks.filter_topic_text.llm", fake_llm)
+    monkeypatch.setattr("blocks.filter_topic_text.allm", lambda prompt: asyncio.to_thread(fake_llm, prompt))
+    monkeypatch.setattr("utils.ai_helper._retry_delay", lambda policy, attempt, error, started: None)
+    document = build_parts_document()
+
+    with pytest.raises(Exception, match="provider unavailable"):
+        filter_topic_text(document, "anything", mode="chunked")
+    with pytest.raises(Exception, match="provider unavailable"):
+        asyncio.run(filter_block.afilter_topic_text(document, "anything", mode="chunked"))
+
+
+@pytest.mark.parametrize("results", [
+    ["a" * 99, "b" * 5000],
+    ["a" * 98, "b" * 5000],
+    ["a" * 50, "", "b" * 5000],
+    ["a" * 100, "b"],
+])
+def test_chunk_merge_respects_output_cap(monkeypatch, results):
+    """Test that merged chunk results never exceed the cap, separators included."""
+    monkeypatch.setattr(filter_block, "FILTER_MAX_OUTPUT_CHARS", 100)
+
+    merged = filter_block._merge_chunk_results(results)
+
+    assert len(merged) <= 100
+    assert merged.startswith(results[0])
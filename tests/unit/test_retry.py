@@ -0,0 +1,118 @@
+"""
+Unit tests for the AI retry policy (no network access required).
+"""
+import asyncio
+import time
+import pytest
+from utils import ai_helper
+from utils.retry import (
+    ConfigurationError, InvalidResponseError, RetryPolicy, deadline_scope, remaining_time, retry_after
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.response = FakeResponse(status_code, headers)
+        self.status_code = status_code
+
+
+def _wrapped_provider_error(error):
+    """Raise error the way ai_helper's provider callers wrap it."""
+    try:
+        raise error
+    except Exception as e:
+        try:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        except Exception as wrapped:
+            return wrapped
+
+
+def test_classifies_retryable_and_fatal_errors():
+    """Test that errors are classified through the provider wrapper."""
+    policy = RetryPolicy(retry_invalid_output=False)
+
+    assert policy.is_retryable(_wrapped_provider_error(FakeAPIError(429)))
+    assert policy.is_retryable(_wrapped_provider_error(FakeAPIError(503)))
+    assert policy.is_retryable(_wrapped_provider_error(TimeoutError()))
+    assert not policy.is_retryable(_wrapped_provider_error(FakeAPIError(401)))
+    assert not policy.is_retryable(ConfigurationError("OPENAI_API_KEY environment variable not set"))
+    assert not policy.is_retryable(InvalidResponseError("bad JSON"))
+    assert RetryPolicy(retry_invalid_output=True).is_retryable(InvalidResponseError("bad JSON"))
+    assert not policy.is_retryable(ValueError("Topic cannot be empty"))
+
+
+def test_fatal_error_is_not_retried(monkeypatch):
+    """Test that a missing API key fails after a single attempt."""
+    calls = []
+    monkeypatch.setattr(ai_helper.time, "sleep", lambda seconds: calls.append(("sleep", seconds)))
+
+    @ai_helper.retry_on_failure(max_retries=3)
+    def operation():
+        calls.append("call")
+        raise ConfigurationError("GROQ_API_KEY environment variable not set")
+
+    with pytest.raises(Exception, match="after 1 attempts: GROQ_API_KEY"):
+        operation()
+    assert calls == ["call"]
+
+
+def test_backoff_honors_retry_after(monkeypatch):
+    """Test that a rate-limit Retry-After hint lengthens the backoff."""
+    sleeps = []
+    monkeypatch.setattr(ai_helper.time, "sleep", sleeps.append)
+    attempts = iter([FakeAPIError(429, {"retry-after": "3"}), None])
+
+    @ai_helper.retry_on_failure(policy=RetryPolicy(max_retries=2, base_delay=0.1, deadline=30))
+    def operation():
+        error = next(attempts)
+        if error:
+            raise _wrapped_provider_error(error)
+        return "ok"
+
+    assert operation() == "ok"
+    assert sleeps == [3.0]
+    assert retry_after(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+
+
+def test_deadline_stops_retries_and_reaches_provider_calls(monkeypatch):
+    """Test that attempts see the deadline and no retry starts past it."""
+    seen = []
+    monkeypatch.setattr(ai_helper.time, "sleep", lambda seconds: None)
+
+    @ai_helper.retry_on_failure(policy=RetryPolicy(max_retries=5, attempt_timeout=10, deadline=0.5, base_delay=1))
+    def operation():
+        seen.append(remaining_time())
+        raise TimeoutError("slow provider")
+
+    with pytest.raises(Exception, match="after 1 attempts"):
+        operation()
+    assert len(seen) == 1 and 0 < seen[0] <= 0.5
+    assert remaining_time() is None
+
+    with deadline_scope(5):
+        with deadline_scope(60):
+            assert remaining_time() <= 5
+
+
+def test_async_attempt_timeout_is_enforced():
+    """Test that a hung async attempt is cancelled and retried."""
+    calls = []
+
+    @ai_helper.retry_on_failure(policy=RetryPolicy(max_retries=1, attempt_timeout=0.05, base_delay=0.01))
+    async def operation():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+        return "ok"
+
+    started = time.monotonic()
+    assert asyncio.run(operation()) == "ok"
+    assert len(calls) == 2
+    assert time.monotonic() - started < 1
@@ -0,0 +1,125 @@
+"""
+Unit tests for hedged provider routing, using local stub providers.
+"""
+import asyncio
+import time
+import pytest
+from utils import ai_helper
+from utils.routing import HedgedRouter, LatencyTracker
+
+
+def stub_providers(latencies, failing=()):
+    """Build a provider function with fixed per-provider latency and failures."""
+    calls = []
+
+    def call(provider, prompt, json_mode=False):
+        calls.append(provider)
+        time.sleep(latencies[provider])
+        if provider in failing:
+            raise ConnectionError(f"{provider} unavailable")
+        return f"{provider}: {prompt}"
+
+    return call, calls
+
+
+def test_hedges_to_secondary_when_primary_is_slow():
+    """Test that a slow primary is hedged and the faster answer wins."""
+    router = HedgedRouter(default_delay=0.05)
+    call, calls = stub_providers({"primary": 1.0, "secondary": 0.01})
+
+    started = time.monotonic()
+    assert router.call(call, "hi", ["primary", "secondary"]) == "secondary: hi"
+
+    assert time.monotonic() - started < 0.5
+    assert calls == ["primary", "secondary"]
+    assert router.stats()["hedges"] == 1
+    assert router.stats()["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    """Test that no hedge fires when the primary answers within its delay."""
+    router = HedgedRouter(default_delay=0.5)
+    call, calls = stub_providers({"primary": 0.01, "secondary": 0.01})
+
+    assert router.call(call, "hi", ["primary", "secondary"]) == "primary: hi"
+    assert calls == ["primary"]
+    assert router.stats()["hedges"] == 0
+
+
+def test_error_fails_over_and_trips_circuit():
+    """Test failover on error, then skipping the failing provider for a cooldown."""
+    router = HedgedRouter(default_delay=5, min_samples=3, error_rate=0.5, cooldown=60)
+    call, calls = stub_providers({"primary": 0, "secondary": 0}, failing={"primary"})
+
+    for _ in range(3):
+        assert router.call(call, "hi", ["primary", "secondary"]) == "secondary: hi"
+    assert calls == ["primary", "secondary"] * 3
+    assert router.stats()["failovers"] == 3
+
+    calls.clear()
+    assert router.order(["primary", "secondary"]) == ["secondary", "primary"]
+    assert router.call(call, "hi", ["primary", "secondary"]) == "secondary: hi"
+    assert calls == ["secondary"]
+    assert router.stats()["providers"]["primary"]["tripped"]
+
+    # After the cooldown the provider gets a fresh window
+    router._tripped["primary"] = time.monotonic() - 1
+    assert router.order(["primary", "secondary"]) == ["primary", "secondary"]
+
+
+def test_every_provider_failing_raises_last_error():
+    """Test that the last provider error is raised when all fail."""
+    router = HedgedRouter(default_delay=5)
+    call, _ = stub_providers({"primary": 0, "secondary": 0}, failing={"primary", "secondary"})
+
+    with pytest.raises(ConnectionError, match="secondary"):
+        router.call(call, "hi", ["primary", "secondary"])
+
+
+def test_hedge_delay_tracks_latency_percentile():
+    """Test that the hedge delay follows the primary's recent latencies."""
+    tracker = LatencyTracker()
+    router = HedgedRouter(tracker=tracker, hedge_percentile=90, min_delay=0.1, default_delay=7)
+    assert router.hedge_delay("primary") == 7
+
+    for latency in [0.2] * 9 + [3.0]:
+        tracker.record("primary", latency, ok=True)
+    assert router.hedge_delay("primary") == pytest.approx(0.2)
+    assert tracker.percentile("primary", 100) == 3.0
+
+
+def test_async_hedge_cancels_loser():
+    """Test that the losing async call is cancelled."""
+    router = HedgedRouter(default_delay=0.05)
+    cancelled = []
+
+    async def call(provider, prompt):
+        try:
+            await asyncio.sleep(5 if provider == "primary" else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(provider)
+            raise
+        return provider
+
+    async def run():
+        result = await router.acall(call, "hi", ["primary", "secondary"])
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "secondary"
+    assert cancelled == ["primary"]
+    assert router.stats()["providers"].get("primary") is None
+
+
+def test_llm_routes_to_fallback_provider(monkeypatch):
+    """Test that AI_ROUTING=hedged falls back from AI_PROVIDER to AI_FALLBACK_PROVIDER."""
+    monkeypatch.setenv("AI_PROVIDER", "openai")
+    monkeypatch.setenv("AI_ROUTING", "hedged")
+    monkeypatch.setenv("AI_FALLBACK_PROVIDER", "groq")
+    monkeypatch.setattr(ai_helper.llm_cache, "enabled", False)
+    monkeypatch.setattr(ai_helper, "llm_router", HedgedRouter(default_delay=5))
+    call, calls = stub_providers({"openai": 0, "groq": 0}, failing={"openai"})
+    monkeypatch.setattr(ai_helper, "_call_provider", call)
+
+    assert ai_helper.llm("prompt") == "groq: prompt"
+    assert calls == ["openai", "groq"]
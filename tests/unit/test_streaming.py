@@ -0,0 +1,130 @@
+"""
+Unit tests for streaming AI responses and incremental mind map parsing.
+"""
+import asyncio
+import contextvars
+import json
+import pytest
+from blocks import generate_mindmap as mindmap_block
+from utils import ai_helper
+from utils.json_stream import StreamingJSONObjectParser, parse_stream
+from utils.llm_cache import LLMCache
+from utils.stub_provider import StubProvider
+
+
+MINDMAP = {
+    "topic": "Machine \"Learning\" {ML}",
+    "nodes": [
+        {"id": 1, "parent": 0, "text": "Supervised, [labelled]"},
+        {"id": 2, "parent": 1, "text": "Regression \\u00e9"},
+        {"id": 3, "parent": 0, "text": "Unsupervised", "extra": {"tags": [1, 2]}},
+    ],
+    "count": 3,
+}
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64, 10000])
+def test_parser_is_independent_of_chunk_boundaries(size):
+    """Test that every chunking of the stream yields the same values."""
+    text = "```json\n" + json.dumps(MINDMAP, indent=2) + "\n```"
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+    fields, nodes = parse_stream(chunks, "nodes")
+
+    assert nodes == MINDMAP["nodes"]
+    assert fields == {"topic": MINDMAP["topic"], "count": 3}
+
+
+def test_parser_releases_each_node_when_it_closes():
+    """Test that a node is returned by the chunk that completes it."""
+    parser = StreamingJSONObjectParser("nodes")
+
+    assert parser.feed('{"topic": "T", "nodes": [{"id": 1, "parent": 0, "text": "a"}') == [
+        {"id": 1, "parent": 0, "text": "a"}
+    ]
+    assert parser.fields == {"topic": "T"}
+    assert parser.feed(', {"id": 2, "parent"') == []
+    assert parser.feed(': 1, "text": "b"}]}') == [{"id": 2, "parent": 1, "text": "b"}]
+    parser.close()
+
+    truncated = StreamingJSONObjectParser("nodes")
+    truncated.feed('{"topic": "T", "nodes": [')
+    with pytest.raises(ValueError):
+        truncated.close()
+
+
+@pytest.fixture
+def streamed_responses(monkeypatch):
+    """Serve llm_stream() from a list of canned responses, one per call."""
+    responses = []
+
+    def fake_stream(prompt, use_cache=None, json_mode=False):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        for i in range(0, len(response), 7):
+            yield response[i:i + 7]
+
+    monkeypatch.setattr(mindmap_block, "llm_stream", fake_stream)
+    monkeypatch.setattr(mindmap_block.time, "sleep", lambda seconds: None)
+    return responses
+
+
+def test_stream_mindmap_waits_for_parents(streamed_responses):
+    """Test that a node arriving before its parent is released right after it."""
+    streamed_responses.append(json.dumps({"topic": "T", "nodes": [
+        {"id": 2, "parent": 1, "text": "child"},
+        {"id": 1, "parent": 0, "text": "root"},
+    ]}))
+
+    events = list(mindmap_block.stream_mindmap("Some text about T."))
+
+    assert [event["event"] for event in events] == ["topic", "node", "node", "done"]
+    assert [event["node"]["id"] for event in events[1:3]] == [1, 2]
+    assert events[-1]["mindmap"]["topic"] == "T"
+
+
+def test_stream_mindmap_retries_only_before_first_node(streamed_responses):
+    """Test that a bad response is retried until nodes have been streamed."""
+    good = json.dumps({"topic": "T", "nodes": [{"id": 1, "parent": 0, "text": "a"}]})
+    streamed_responses.extend(["not json at all", good])
+    events = list(mindmap_block.stream_mindmap("Some text about T."))
+    assert events[-1]["event"] == "done"
+
+    streamed_responses.extend(['{"topic": "T", "nodes": [{"id": 1, "parent": 0, "text": "a"}, {"id": 2, "parent": 9'])
+    with pytest.raises(mindmap_block.InvalidResponseError):
+        list(mindmap_block.stream_mindmap("Some text about T."))
+    assert streamed_responses == []
+
+
+def test_stream_mindmap_leaves_no_context_across_yields(streamed_responses):
+    """Test that each event can be pulled in a fresh context, as thread-pool iteration does."""
+    good = json.dumps({"topic": "T", "nodes": [{"id": 1, "parent": 0, "text": "a"}]})
+    streamed_responses.extend(["not json at all", good])
+    stream = mindmap_block.stream_mindmap("Some text about T.")
+
+    events = []
+    while True:
+        try:
+            events.append(contextvars.copy_context().run(next, stream))
+        except StopIteration:
+            break
+
+    assert [event["event"] for event in events] == ["topic", "node", "done"]
+
+
+def test_llm_stream_uses_stub_and_cache(tmp_path, monkeypatch):
+    """Test sync and async streaming through the stub provider and response cache."""
+    monkeypatch.setenv("AI_PROVIDER", "stub")
+    monkeypatch.setenv("AI_ROUTING", "single")
+    monkeypatch.setattr(ai_helper, "llm_cache", LLMCache(path=str(tmp_path / "llm.sqlite3"), enabled=True))
+    monkeypatch.setattr(ai_helper, "stub_provider", StubProvider(chunk_chars=4))
+
+    chunks = list(ai_helper.llm_stream("hello"))
+    assert len(chunks) > 1
+    assert list(ai_helper.llm_stream("hello")) == ["".join(chunks)]
+
+    async def collect():
+        return [chunk async for chunk in ai_helper.allm_stream("hello", use_cache=False)]
+
+    assert asyncio.run(collect()) == chunks
@@ -0,0 +1,87 @@
+"""
+Unit tests for the local stub AI provider.
+"""
+import json
+import threading
+import pytest
+from utils import ai_helper
+from utils.stub_provider import StubProvider, StubProviderError, make_server
+from blocks.detect_topics import _build_prompt as build_topic_prompt
+from blocks.generate_mindmap import _build_prompt as build_mindmap_prompt
+
+
+TEXT = (
+    "Machine learning builds models from data. Supervised learning uses labelled examples. "
+    "Neural networks stack layers of weighted units. Gradient descent tunes the weights. "
+    "Reinforcement learning optimises rewards through trial and error."
+)
+
+
+def test_responses_are_deterministic_and_schema_valid():
+    """Test that topics and mind maps are valid and depend only on the prompt."""
+    stub = StubProvider(topics=6, nodes=12)
+
+    topics = json.loads(stub.complete(build_topic_prompt(TEXT), json_mode=True))["topics"]
+    assert len(topics) == 6
+    assert topics == json.loads(StubProvider(topics=6, seed=99).respond(build_topic_prompt(TEXT), True))["topics"]
+
+    mindmap = json.loads(stub.complete(build_mindmap_prompt(TEXT), json_mode=True))
+    ids = {node["id"] for node in mindmap["nodes"]}
+    assert mindmap["topic"]
+    assert len(mindmap["nodes"]) == 12
+    assert all(node["parent"] == 0 or node["parent"] in ids for node in mindmap["nodes"])
+    assert all(node["parent"] < node["id"] for node in mindmap["nodes"])
+
+
+def test_error_rate_and_latency_are_seeded():
+    """Test that injected failures repeat for the same seed and carry retry hints."""
+    def outcomes(seed):
+        stub = StubProvider(error_rate=0.5, error_status=429, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                stub.complete("hello")
+                results.append(True)
+            except StubProviderError as e:
+                assert e.status_code == 429
+                assert e.response.headers["retry-after"] == "1"
+                results.append(False)
+        return results
+
+    assert outcomes(7) == outcomes(7)
+    assert 0 < outcomes(7).count(False) < 20
+
+    stub = StubProvider(latency_ms=100, latency_dist="uniform", latency_spread=0.5, seed=1)
+    assert all(0.05 <= stub._draw()[0] <= 0.15 for _ in range(50))
+    with pytest.raises(ValueError):
+        StubProvider(latency_dist="pareto")
+
+
+def test_llm_uses_stub_provider(monkeypatch):
+    """Test that AI_PROVIDER=stub answers through the normal llm() path."""
+    monkeypatch.setenv("AI_PROVIDER", "stub")
+    monkeypatch.setenv("AI_ROUTING", "single")
+    monkeypatch.setattr(ai_helper.llm_cache, "enabled", False)
+
+    response = ai_helper.llm(build_topic_prompt(TEXT), json_mode=True)
+    assert json.loads(response)["topics"]
+
+
+def test_http_server_speaks_openai_chat_format():
+    """Test a round trip through the OpenAI SDK against the local server."""
+    openai = pytest.importorskip("openai")
+    server = make_server(port=0, stub=StubProvider(topics=4))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+        response = client.chat.completions.create(
+            model="stub-1",
+            messages=[{"role": "user", "content": build_topic_prompt(TEXT)}],
+            response_format={"type": "json_object"},
+        )
+        assert len(json.loads(response.choices[0].message.content)["topics"]) == 4
+        assert response.usage.total_tokens > 0
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,112 @@
+"""
+Unit tests for topic detection modes that run without an AI provider.
+"""
+import asyncio
+import pytest
+from blocks.detect_topics import adetect_topics, detect_topics
+from utils.keyphrases import extract_keyphrases, topic_agreement
+
+
+SAMPLE_TEXT = """
+Photosynthesis is the process used by plants to convert light energy into chemical energy. During photosynthesis, chlorophyll absorbs light in the thylakoid membrane. The light reactions produce ATP and NADPH, which power the Calvin cycle.
+
+The Calvin cycle takes place in the stroma of the chloroplast. Carbon dioxide is fixed by the enzyme rubisco, and the Calvin cycle regenerates its starting molecule. Without ATP from the light reactions the Calvin cycle stops.
+
+Cellular respiration is the reverse process: glucose is broken down to release chemical energy. Glycolysis occurs in the cytoplasm and yields pyruvate. Pyruvate enters the mitochondria where the Krebs cycle oxidizes it.
+
+The Krebs cycle produces NADH and FADH2, which feed the electron transport chain. The electron transport chain pumps protons across the inner membrane, and ATP synthase uses this gradient. Most ATP in cellular respiration comes from the electron transport chain.
+
+Fermentation allows glycolysis to continue without oxygen. In muscle cells fermentation produces lactic acid, while yeast fermentation produces ethanol. Fermentation yields far less ATP than cellular respiration.
+"""
+
+
+def test_extract_keyphrases_ranks_recurring_terms():
+    """Test that recurring domain phrases are returned without duplicates."""
+    topics = extract_keyphrases(SAMPLE_TEXT, limit=10)
+
+    assert 0 < len(topics) <= 10
+    lowered = [topic.lower() for topic in topics]
+    assert len(set(lowered)) == len(lowered)
+    assert "calvin cycle" in lowered
+    assert "electron transport chain" in lowered
+
+
+def test_local_mode_needs_no_provider(monkeypatch):
+    """Test that local detection never calls the AI."""
+    def fail(*args, **kwargs):
+        raise AssertionError("AI should not be called in local mode")
+
+    monkeypatch.setattr("blocks.detect_topics.llm", fail)
+
+    result = detect_topics(SAMPLE_TEXT, mode="local")
+
+    assert result["topics"]
+    assert all(isinstance(topic, str) for topic in result["topics"])
+
+
+def test_auto_mode_falls_back_to_local(monkeypatch):
+    """Test that auto mode returns local topics when the AI fails."""
+    def fail(*args, **kwargs):
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    monkeypatch.setattr("blocks.detect_topics.llm", fail)
+    monkeypatch.setattr("utils.ai_helper.time.sleep", lambda seconds: None)
+
+    result = detect_topics(SAMPLE_TEXT, mode="auto")
+
+    assert result == detect_topics(SAMPLE_TEXT, mode="local")
+    assert topic_agreement(result["topics"], result["topics"]) == 1.0
+
+
+def test_unknown_mode_rejected():
+    """Test that an unknown detection mode raises ValueError."""
+    with pytest.raises(ValueError):
+        detect_topics(SAMPLE_TEXT, mode="magic")
+
+
+def test_mapreduce_mode_merges_chunk_topics(monkeypatch):
+    """Test that chunk topics are detected concurrently and merged by frequency."""
+    chunk_topics = {
+        "chunk one": ["Calvin Cycle", "1. Photosynthesis"],
+        "chunk two": ["photosynthesis", "Krebs Cycles"],
+        "chunk three": ["Krebs cycle", "Photosynthesis", "Fermentation"],
+    }
+    monkeypatch.setattr(
+        "blocks.detect_topics.chunk_text",
+        lambda text, max_chars: list(chunk_topics)
+    )
+    monkeypatch.setattr(
+        "blocks.detect_topics.detect_topics_llm",
+        lambda chunk: {"topics": chunk_topics[chunk]}
+    )
+
+    result = detect_topics(SAMPLE_TEXT, mode="mapreduce")
+
+    assert result["topics"][:2] == ["1. Photosynthesis", "Krebs Cycles"]
+    assert set(result["topics"]) == {"1. Photosynthesis", "Krebs Cycles", "Calvin Cycle", "Fermentation"}
+
+
+def test_async_mapreduce_matches_sync(monkeypatch):
+    """Test that the async mapreduce path awaits allm and merges like the sync path."""
+    chunk_topics = {
+        "chunk one": '["Calvin Cycle", "Photosynthesis"]',
+        "chunk two": '["Photosynthesis", "Krebs Cycle"]',
+    }
+    calls = []
+
+    async def fake_allm(prompt, json_mode=False):
+        calls.append(prompt)
+        await asyncio.sleep(0)
+        return next(topics for chunk, topics in chunk_topics.items() if chunk in prompt)
+
+    monkeypatch.setattr(
+        "blocks.detect_topics.chunk_text",
+        lambda text, max_chars: list(chunk_topics)
+    )
+    monkeypatch.setattr("blocks.detect_topics.allm", fake_allm)
+
+    result = asyncio.run(adetect_topics(SAMPLE_TEXT, mode="mapreduce"))
+
+    assert len(calls) == 2
+    assert result["topics"][0] == "Photosynthesis"
+    assert set(result["topics"]) == {"Photosynthesis", "Calvin Cycle", "Krebs Cycle"}
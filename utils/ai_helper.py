@@ -2,159 +2,760 @@
 AI Helper utilities for interacting with AI models.
 Supports OpenAI, Groq, and other providers.
 """
+import asyncio
+import inspect
 import json
 import time
 import os
-import re
-from typing import Any, Callable
-from functools import wraps
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+from functools import partial, wraps
+from utils.llm_cache import llm_cache, refresh
+from utils.llm_clients import client_registry
+from utils.llm_metrics import CallRecord, call_metrics, mark_first_byte, note_usage
+from utils.rate_limit import rate_limits
+from utils.retry import (
+    ConfigurationError, InvalidResponseError, RetryPolicy, deadline_scope, remaining_time
+)
+from utils.routing import HedgedRouter
+from utils.singleflight import SingleFlight
+from utils.stub_provider import stub_provider
 
 
-def llm(prompt: str) -> str:
+# Generation settings shared by all providers
+SYSTEM_PROMPT = "You are a helpful assistant that analyzes documents and creates structured outputs. Always respond with valid JSON when requested."
+TEMPERATURE = 0.7
+MAX_TOKENS = 2000
+
+# Supported values of AI_PROVIDER
+PROVIDERS = ("openai", "groq", "anthropic", "stub")
+
+# Coalesces concurrent identical AI calls into one provider request
+llm_flights = SingleFlight()
+
+# Tracks provider latency/errors; hedges and fails over when AI_ROUTING=hedged
+llm_router = HedgedRouter()
+
+
+def llm(prompt: str, use_cache: Optional[bool] = None, json_mode: bool = False) -> str:
     """
     Call AI model to generate response.
     Supports multiple providers via environment variables.
+    Responses are served from the persistent cache when the same prompt
+    was already sent to the same model, and concurrent identical calls
+    share one provider request. With AI_ROUTING=hedged, a slow or failing
+    AI_PROVIDER is backed up by AI_FALLBACK_PROVIDER.
+    
+    Args:
+        prompt: The prompt to send to the AI
+        use_cache: Read/write the response cache (default: LLM_CACHE_ENABLED)
+        json_mode: Ask the provider for a single JSON object (the prompt
+                   must request one); constrains output where supported
+        
+    Returns:
+        AI-generated response as a string
+    """
+    # Check which AI provider(s) to use
+    route = _route()
+    
+    key = _request_key(route, prompt, json_mode)
+    use_cache = llm_cache.should_use(use_cache)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    def fetch() -> str:
+        response = llm_router.call(partial(_call_provider, json_mode=json_mode), prompt, route)
+        if use_cache and response:
+            llm_cache.put(key, response)
+        return response
+    
+    return llm_flights.do(key, fetch)
+
+
+async def allm(prompt: str, use_cache: Optional[bool] = None, json_mode: bool = False) -> str:
+    """
+    Async counterpart of llm() built on the providers' async clients.
+    Awaiting it yields to the event loop for the whole provider call.
     
     Args:
         prompt: The prompt to send to the AI
+        use_cache: Read/write the response cache (default: LLM_CACHE_ENABLED)
+        json_mode: Ask the provider for a single JSON object (the prompt
+                   must request one); constrains output where supported
         
     Returns:
         AI-generated response as a string
     """
-    # Check which AI provider to use
+    route = _route()
+    
+    key = _request_key(route, prompt, json_mode)
+    use_cache = llm_cache.should_use(use_cache)
+    if use_cache:
+        # SQLite reads and writes are blocking I/O; keep them off the event loop
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            return cached
+    
+    async def fetch() -> str:
+        response = await llm_router.acall(partial(_acall_provider, json_mode=json_mode), prompt, route)
+        if use_cache and response:
+            await asyncio.to_thread(llm_cache.put, key, response)
+        return response
+    
+    return await llm_flights.ado(key, fetch)
+
+
+def llm_stream(prompt: str, use_cache: Optional[bool] = None, json_mode: bool = False) -> Iterator[str]:
+    """
+    Stream an AI response, yielding text chunks as the provider produces them.
+    
+    A cached response is yielded as one chunk. Streams are not coalesced or
+    hedged: the first healthy provider is used, and the next one only if
+    it fails before producing any output.
+    
+    Args:
+        prompt: The prompt to send to the AI
+        use_cache: Read/write the response cache (default: LLM_CACHE_ENABLED)
+        json_mode: Ask the provider for a single JSON object
+        
+    Yields:
+        Response text chunks
+    """
+    route = _route()
+    
+    key = _request_key(route, prompt, json_mode)
+    use_cache = llm_cache.should_use(use_cache)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    last_error = None
+    for provider in llm_router.order(route):
+        parts = []
+        started = time.monotonic()
+        try:
+            for chunk in _stream_provider(provider, prompt, json_mode):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            llm_router.tracker.record(provider, time.monotonic() - started, ok=False)
+            if parts:
+                raise
+            last_error = e
+            continue
+        llm_router.tracker.record(provider, time.monotonic() - started, ok=True)
+        
+        response = "".join(parts)
+        if use_cache and response:
+            llm_cache.put(key, response)
+        return
+    
+    raise last_error
+
+
+async def allm_stream(prompt: str, use_cache: Optional[bool] = None, json_mode: bool = False) -> AsyncIterator[str]:
+    """
+    Async counterpart of llm_stream() built on the providers' async clients.
+    
+    Args:
+        prompt: The prompt to send to the AI
+        use_cache: Read/write the response cache (default: LLM_CACHE_ENABLED)
+        json_mode: Ask the provider for a single JSON object
+        
+    Yields:
+        Response text chunks
+    """
+    route = _route()
+    
+    key = _request_key(route, prompt, json_mode)
+    use_cache = llm_cache.should_use(use_cache)
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            yield cached
+            return
+    
+    last_error = None
+    for provider in llm_router.order(route):
+        parts = []
+        started = time.monotonic()
+        try:
+            async for chunk in _astream_provider(provider, prompt, json_mode):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            llm_router.tracker.record(provider, time.monotonic() - started, ok=False)
+            if parts:
+                raise
+            last_error = e
+            continue
+        llm_router.tracker.record(provider, time.monotonic() - started, ok=True)
+        
+        response = "".join(parts)
+        if use_cache and response:
+            await asyncio.to_thread(llm_cache.put, key, response)
+        return
+    
+    raise last_error
+
+
+def _route() -> List[str]:
+    """
+    Providers for the next call, in preference order.
+    AI_ROUTING=hedged adds AI_FALLBACK_PROVIDER behind AI_PROVIDER.
+    """
     provider = os.getenv("AI_PROVIDER", "openai").lower()
+    if provider not in PROVIDERS:
+        raise ConfigurationError(f"Unsupported AI provider: {provider}")
+    
+    routing = os.getenv("AI_ROUTING", "single").lower()
+    if routing == "single":
+        return [provider]
+    if routing != "hedged":
+        raise ConfigurationError(f"Unsupported AI routing mode: {routing}")
     
-    if provider == "openai":
-        return _call_openai(prompt)
-    elif provider == "groq":
-        return _call_groq(prompt)
-    elif provider == "anthropic":
-        return _call_anthropic(prompt)
-    else:
-        raise ValueError(f"Unsupported AI provider: {provider}")
+    fallback = os.getenv("AI_FALLBACK_PROVIDER", "").lower()
+    if not fallback or fallback == provider:
+        return [provider]
+    if fallback not in PROVIDERS:
+        raise ConfigurationError(f"Unsupported AI provider: {fallback}")
+    return [provider, fallback]
+
+
+def model_signature(route: Optional[List[str]] = None) -> List[List[str]]:
+    """[provider, model] pairs a call may be answered by (default: the current route)."""
+    return [[provider, client_registry.config(provider).model] for provider in route or _route()]
+
+
+def _request_key(route: List[str], prompt: str, json_mode: bool = False) -> str:
+    """Identify a request by everything that shapes its response (cache and coalescing key)."""
+    return llm_cache.make_key(
+        providers=model_signature(route),
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        system=SYSTEM_PROMPT,
+        json_mode=json_mode,
+        prompt=prompt,
+    )
+
+
+def _request_options() -> dict:
+    """Per-request SDK options; the current retry deadline becomes the HTTP timeout."""
+    timeout = remaining_time()
+    return {} if timeout is None else {"timeout": max(timeout, 0.001)}
+
+
+def _json_format(json_mode: bool) -> dict:
+    """Chat completions option constraining output to a JSON object."""
+    return {"response_format": {"type": "json_object"}} if json_mode else {}
+
+
+def _anthropic_messages(prompt: str, json_mode: bool) -> List[dict]:
+    """Anthropic has no JSON mode; prefilling "{" makes the reply continue a JSON object."""
+    messages = [{"role": "user", "content": prompt}]
+    if json_mode:
+        messages.append({"role": "assistant", "content": "{"})
+    return messages
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (1 token ≈ 4 characters)."""
+    return len(text) // 4 + 1
+
+
+def _note_chat_usage(response: Any):
+    """Record token usage reported by a chat completions response."""
+    usage = getattr(response, "usage", None)
+    if usage is not None and usage.prompt_tokens is not None:
+        note_usage(usage.prompt_tokens, usage.completion_tokens or 0)
+
+
+def _note_anthropic_usage(response: Any):
+    """Record token usage reported by an Anthropic messages response."""
+    usage = getattr(response, "usage", None)
+    if usage is not None and usage.input_tokens is not None:
+        note_usage(usage.input_tokens, usage.output_tokens or 0)
+
+
+def _settle_usage(call: CallRecord, prompt: str, response: Optional[str]) -> int:
+    """Fill in estimated usage when the provider reported none; return tokens used."""
+    if call.prompt_tokens is None:
+        call.usage(estimate_tokens(prompt), estimate_tokens(response or ""))
+    return call.prompt_tokens + call.completion_tokens
+
+
+def _call_provider(provider: str, prompt: str, json_mode: bool = False) -> str:
+    """Send a prompt to a provider's API within its rate limits, recording call metrics."""
+    reserved = estimate_tokens(prompt) + MAX_TOKENS
+    with call_metrics.track(provider, client_registry.config(provider).model) as call:
+        with rate_limits.get(provider).acquire(reserved) as limiter:
+            call.admit()
+            if provider == "openai":
+                response = _call_openai(prompt, json_mode)
+            elif provider == "groq":
+                response = _call_groq(prompt, json_mode)
+            elif provider == "stub":
+                response = _call_stub(prompt, json_mode)
+            else:
+                response = _call_anthropic(prompt, json_mode)
+            limiter.settle(reserved, _settle_usage(call, prompt, response))
+            return response
+
+
+async def _acall_provider(provider: str, prompt: str, json_mode: bool = False) -> str:
+    """Send a prompt to a provider's API asynchronously, within its rate limits."""
+    reserved = estimate_tokens(prompt) + MAX_TOKENS
+    with call_metrics.track(provider, client_registry.config(provider).model) as call:
+        async with rate_limits.get(provider).aacquire(reserved) as limiter:
+            call.admit()
+            if provider in ("openai", "groq"):
+                response = await _acall_chat_completions(provider, prompt, json_mode)
+            elif provider == "stub":
+                response = await _acall_stub(prompt, json_mode)
+            else:
+                response = await _acall_anthropic(prompt, json_mode)
+            limiter.settle(reserved, _settle_usage(call, prompt, response))
+            return response
+
+
+def _stream_provider(provider: str, prompt: str, json_mode: bool = False) -> Iterator[str]:
+    """Stream a prompt's response from a provider within its rate limits, recording call metrics."""
+    reserved = estimate_tokens(prompt) + MAX_TOKENS
+    with call_metrics.track(provider, client_registry.config(provider).model) as call:
+        with rate_limits.get(provider).acquire(reserved) as limiter:
+            call.admit()
+            if provider in ("openai", "groq"):
+                stream = _stream_chat_completions(provider, prompt, json_mode)
+            elif provider == "stub":
+                stream = _stream_stub(prompt, json_mode)
+            else:
+                stream = _stream_anthropic(prompt, json_mode)
+            parts = []
+            for chunk in stream:
+                if not parts:
+                    mark_first_byte()
+                parts.append(chunk)
+                yield chunk
+            limiter.settle(reserved, _settle_usage(call, prompt, "".join(parts)))
 
 
-def _call_openai(prompt: str) -> str:
+async def _astream_provider(provider: str, prompt: str, json_mode: bool = False) -> AsyncIterator[str]:
+    """Async counterpart of _stream_provider()."""
+    reserved = estimate_tokens(prompt) + MAX_TOKENS
+    with call_metrics.track(provider, client_registry.config(provider).model) as call:
+        async with rate_limits.get(provider).aacquire(reserved) as limiter:
+            call.admit()
+            if provider in ("openai", "groq"):
+                stream = _astream_chat_completions(provider, prompt, json_mode)
+            elif provider == "stub":
+                stream = _astream_stub(prompt, json_mode)
+            else:
+                stream = _astream_anthropic(prompt, json_mode)
+            parts = []
+            async for chunk in stream:
+                if not parts:
+                    mark_first_byte()
+                parts.append(chunk)
+                yield chunk
+            limiter.settle(reserved, _settle_usage(call, prompt, "".join(parts)))
+
+
+def _call_openai(prompt: str, json_mode: bool = False) -> str:
     """Call OpenAI API."""
     try:
-        from openai import OpenAI
-        
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set")
-        
-        client = OpenAI(api_key=api_key)
-        model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        client = client_registry.get("openai")
+        model = client_registry.config("openai").model
         
         response = client.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that analyzes documents and creates structured outputs. Always respond with valid JSON when requested."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.7,
-            max_tokens=2000
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            **_json_format(json_mode),
+            **_request_options()
         )
         
+        _note_chat_usage(response)
         return response.choices[0].message.content
         
     except ImportError:
-        raise ImportError("OpenAI package not installed. Run: pip install openai")
+        raise
     except Exception as e:
         raise Exception(f"OpenAI API error: {str(e)}")
 
 
-def _call_groq(prompt: str) -> str:
+def _call_groq(prompt: str, json_mode: bool = False) -> str:
     """Call Groq API (fast Llama models)."""
     try:
-        from groq import Groq
-        
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable not set")
-        
-        client = Groq(api_key=api_key)
-        model = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+        client = client_registry.get("groq")
+        model = client_registry.config("groq").model
         
         response = client.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that analyzes documents and creates structured outputs. Always respond with valid JSON when requested."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.7,
-            max_tokens=2000
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            **_json_format(json_mode),
+            **_request_options()
         )
         
+        _note_chat_usage(response)
         return response.choices[0].message.content
         
     except ImportError:
-        raise ImportError("Groq package not installed. Run: pip install groq")
+        raise
     except Exception as e:
         raise Exception(f"Groq API error: {str(e)}")
 
 
-def _call_anthropic(prompt: str) -> str:
+def _call_anthropic(prompt: str, json_mode: bool = False) -> str:
     """Call Anthropic Claude API."""
     try:
-        import anthropic
+        client = client_registry.get("anthropic")
+        model = client_registry.config("anthropic").model
         
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+        response = client.messages.create(
+            model=model,
+            max_tokens=MAX_TOKENS,
+            messages=_anthropic_messages(prompt, json_mode),
+            **_request_options()
+        )
         
-        client = anthropic.Anthropic(api_key=api_key)
-        model = os.getenv("ANTHROPIC_MODEL", "claude-3-sonnet-20240229")
+        _note_anthropic_usage(response)
+        # Restore the prefilled opening brace
+        return ("{" if json_mode else "") + response.content[0].text
         
-        response = client.messages.create(
+    except ImportError:
+        raise
+    except Exception as e:
+        raise Exception(f"Anthropic API error: {str(e)}")
+
+
+async def _acall_chat_completions(provider: str, prompt: str, json_mode: bool = False) -> str:
+    """Call an OpenAI-compatible chat completions API (OpenAI, Groq) asynchronously."""
+    label = "OpenAI" if provider == "openai" else "Groq"
+    try:
+        client = client_registry.get_async(provider)
+        model = client_registry.config(provider).model
+        
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            **_json_format(json_mode),
+            **_request_options()
+        )
+        
+        _note_chat_usage(response)
+        return response.choices[0].message.content
+        
+    except ImportError:
+        raise
+    except Exception as e:
+        raise Exception(f"{label} API error: {str(e)}")
+
+
+async def _acall_anthropic(prompt: str, json_mode: bool = False) -> str:
+    """Call Anthropic Claude API asynchronously."""
+    try:
+        client = client_registry.get_async("anthropic")
+        model = client_registry.config("anthropic").model
+        
+        response = await client.messages.create(
+            model=model,
+            max_tokens=MAX_TOKENS,
+            messages=_anthropic_messages(prompt, json_mode),
+            **_request_options()
+        )
+        
+        _note_anthropic_usage(response)
+        # Restore the prefilled opening brace
+        return ("{" if json_mode else "") + response.content[0].text
+        
+    except ImportError:
+        raise
+    except Exception as e:
+        raise Exception(f"Anthropic API error: {str(e)}")
+
+
+def _call_stub(prompt: str, json_mode: bool = False) -> str:
+    """Call the local stub provider (offline testing and benchmarks)."""
+    try:
+        return stub_provider.complete(prompt, json_mode)
+    except Exception as e:
+        raise Exception(f"Stub API error: {str(e)}")
+
+
+async def _acall_stub(prompt: str, json_mode: bool = False) -> str:
+    """Call the local stub provider asynchronously."""
+    try:
+        return await stub_provider.acomplete(prompt, json_mode)
+    except Exception as e:
+        raise Exception(f"Stub API error: {str(e)}")
+
+
+def _stream_options(provider: str) -> dict:
+    """Ask OpenAI to report token usage at the end of a stream."""
+    return {"stream_options": {"include_usage": True}} if provider == "openai" else {}
+
+
+def _stream_chat_completions(provider: str, prompt: str, json_mode: bool = False) -> Iterator[str]:
+    """Stream from an OpenAI-compatible chat completions API (OpenAI, Groq)."""
+    label = "OpenAI" if provider == "openai" else "Groq"
+    try:
+        client = client_registry.get(provider)
+        model = client_registry.config(provider).model
+        
+        stream = client.chat.completions.create(
             model=model,
-            max_tokens=2000,
             messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            stream=True,
+            **_stream_options(provider),
+            **_json_format(json_mode),
+            **_request_options()
+        )
+        
+        for event in stream:
+            _note_chat_usage(event)
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+        
+    except ImportError:
+        raise
+    except Exception as e:
+        raise Exception(f"{label} API error: {str(e)}")
+
+
+async def _astream_chat_completions(provider: str, prompt: str, json_mode: bool = False) -> AsyncIterator[str]:
+    """Stream from an OpenAI-compatible chat completions API asynchronously."""
+    label = "OpenAI" if provider == "openai" else "Groq"
+    try:
+        client = client_registry.get_async(provider)
+        model = client_registry.config(provider).model
+        
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            stream=True,
+            **_stream_options(provider),
+            **_json_format(json_mode),
+            **_request_options()
+        )
+        
+        async for event in stream:
+            _note_chat_usage(event)
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+        
+    except ImportError:
+        raise
+    except Exception as e:
+        raise Exception(f"{label} API error: {str(e)}")
+
+
+def _anthropic_stream_event(event: Any, usage: dict) -> Optional[str]:
+    """Text carried by an Anthropic stream event; usage is collected as a side effect."""
+    if event.type == "message_start":
+        usage["input"] = event.message.usage.input_tokens
+    elif event.type == "message_delta":
+        note_usage(usage.get("input", 0), event.usage.output_tokens)
+    elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+        return event.delta.text
+    return None
+
+
+def _stream_anthropic(prompt: str, json_mode: bool = False) -> Iterator[str]:
+    """Stream from the Anthropic Claude API."""
+    try:
+        client = client_registry.get("anthropic")
+        model = client_registry.config("anthropic").model
+        
+        stream = client.messages.create(
+            model=model,
+            max_tokens=MAX_TOKENS,
+            messages=_anthropic_messages(prompt, json_mode),
+            stream=True,
+            **_request_options()
+        )
+        
+        # Restore the prefilled opening brace
+        if json_mode:
+            yield "{"
+        usage = {}
+        for event in stream:
+            text = _anthropic_stream_event(event, usage)
+            if text:
+                yield text
+        
+    except ImportError:
+        raise
+    except Exception as e:
+        raise Exception(f"Anthropic API error: {str(e)}")
+
+
+async def _astream_anthropic(prompt: str, json_mode: bool = False) -> AsyncIterator[str]:
+    """Stream from the Anthropic Claude API asynchronously."""
+    try:
+        client = client_registry.get_async("anthropic")
+        model = client_registry.config("anthropic").model
+        
+        stream = await client.messages.create(
+            model=model,
+            max_tokens=MAX_TOKENS,
+            messages=_anthropic_messages(prompt, json_mode),
+            stream=True,
+            **_request_options()
         )
         
-        return response.content[0].text
+        if json_mode:
+            yield "{"
+        usage = {}
+        async for event in stream:
+            text = _anthropic_stream_event(event, usage)
+            if text:
+                yield text
         
     except ImportError:
-        raise ImportError("Anthropic package not installed. Run: pip install anthropic")
+        raise
     except Exception as e:
         raise Exception(f"Anthropic API error: {str(e)}")
 
 
-def retry_on_failure(max_retries: int = 1, timeout: int = 60):
+def _stream_stub(prompt: str, json_mode: bool = False) -> Iterator[str]:
+    """Stream from the local stub provider."""
+    try:
+        yield from stub_provider.stream(prompt, json_mode)
+    except Exception as e:
+        raise Exception(f"Stub API error: {str(e)}")
+
+
+async def _astream_stub(prompt: str, json_mode: bool = False) -> AsyncIterator[str]:
+    """Stream from the local stub provider asynchronously."""
+    try:
+        async for chunk in stub_provider.astream(prompt, json_mode):
+            yield chunk
+    except Exception as e:
+        raise Exception(f"Stub API error: {str(e)}")
+
+
+def retry_on_failure(max_retries: int = 1, timeout: Optional[float] = 60, policy: Optional[RetryPolicy] = None):
     """
     Decorator to retry AI operations on failure.
+    Works on both regular and async functions.
+    
+    Each attempt runs under a deadline that provider calls use as their
+    request timeout; retries back off exponentially with jitter (or per
+    the provider's Retry-After) and stop early on fatal errors or when
+    the overall deadline would be missed.
     
     Args:
         max_retries: Maximum number of retry attempts (default: 1)
         timeout: Timeout in seconds for each attempt (default: 60)
+        policy: Full RetryPolicy; overrides max_retries and timeout
     """
+    if policy is None:
+        # Sampled answers vary, so a badly formatted one is worth retrying
+        policy = RetryPolicy(max_retries=max_retries, attempt_timeout=timeout, retry_invalid_output=TEMPERATURE > 0)
+    
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                started = time.monotonic()
+                last_exception = None
+                attempts = 0
+                
+                for attempt in range(policy.max_retries + 1):
+                    budget = policy.attempt_budget(started)
+                    if budget is not None and budget <= 0:
+                        last_exception = last_exception or TimeoutError("AI request deadline exceeded")
+                        break
+                    attempts += 1
+                    try:
+                        # Retries bypass cached responses, which may be the cause
+                        with deadline_scope(budget), refresh() if attempt else nullcontext():
+                            return await asyncio.wait_for(func(*args, **kwargs), budget)
+                    except Exception as e:
+                        last_exception = e
+                        delay = _retry_delay(policy, attempt, e, started)
+                        if delay is None:
+                            break
+                        print(f"AI operation failed, retrying in {delay:.1f}s... (attempt {attempt + 1}/{policy.max_retries})")
+                        await asyncio.sleep(delay)
+                
+                raise Exception(f"AI operation failed after {attempts} attempts: {str(last_exception)}") from last_exception
+            
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
+            started = time.monotonic()
             last_exception = None
+            attempts = 0
             
-            for attempt in range(max_retries + 1):
+            for attempt in range(policy.max_retries + 1):
+                budget = policy.attempt_budget(started)
+                if budget is not None and budget <= 0:
+                    last_exception = last_exception or TimeoutError("AI request deadline exceeded")
+                    break
+                attempts += 1
                 try:
-                    return func(*args, **kwargs)
+                    # Provider calls read the deadline as their request timeout;
+                    # retries bypass cached responses, which may be the cause
+                    with deadline_scope(budget), refresh() if attempt else nullcontext():
+                        return func(*args, **kwargs)
                 except Exception as e:
                     last_exception = e
-                    if attempt < max_retries:
-                        # Log retry attempt
-                        print(f"AI operation failed, retrying... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(1)  # Brief delay before retry
-                    else:
-                        # Max retries reached
+                    delay = _retry_delay(policy, attempt, e, started)
+                    if delay is None:
                         break
+                    # Log retry attempt
+                    print(f"AI operation failed, retrying in {delay:.1f}s... (attempt {attempt + 1}/{policy.max_retries})")
+                    time.sleep(delay)
             
             # If we get here, all retries failed
-            raise Exception(f"AI operation failed after {max_retries + 1} attempts: {str(last_exception)}")
+            raise Exception(f"AI operation failed after {attempts} attempts: {str(last_exception)}") from last_exception
         
         return wrapper
     return decorator
 
 
+def _retry_delay(policy: RetryPolicy, attempt: int, error: Exception, started: float) -> Optional[float]:
+    """Backoff before the next attempt, or None if the operation should give up."""
+    if attempt >= policy.max_retries or not policy.is_retryable(error):
+        return None
+    delay = policy.backoff(attempt, error)
+    left = policy.time_left(started)
+    if left is not None and delay >= left:
+        # Waiting would leave no time for another attempt
+        return None
+    return delay
+
+
 def validate_json_response(response: str) -> dict:
     """
     Validate and parse JSON response from AI.
@@ -167,10 +768,10 @@ def validate_json_response(response: str) -> dict:
         Parsed JSON as dictionary
         
     Raises:
-        ValueError: If response is not valid JSON
+        InvalidResponseError: If response is not valid JSON (a ValueError)
     """
     if not response or not response.strip():
-        raise ValueError("Empty response from AI")
+        raise InvalidResponseError("Empty response from AI")
     
     # Try to parse as-is first
     try:
@@ -179,37 +780,72 @@ def validate_json_response(response: str) -> dict:
     except json.JSONDecodeError:
         pass
     
-    # Try to extract JSON from markdown code blocks
-    import re
+    # Salvage JSON embedded in prose or markdown code blocks
+    parsed = extract_json(response)
+    if parsed is not None:
+        return parsed
     
-    # Look for JSON in ```json ... ``` blocks
-    json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response, re.DOTALL)
-    if json_match:
-        try:
-            parsed = json.loads(json_match.group(1))
-            return parsed
-        except json.JSONDecodeError:
-            pass
-    
-    # Look for JSON object anywhere in the response
-    json_match = re.search(r'\{.*\}', response, re.DOTALL)
-    if json_match:
-        try:
-            parsed = json.loads(json_match.group(0))
-            return parsed
-        except json.JSONDecodeError:
-            pass
-    
-    # Look for JSON array anywhere in the response
-    array_match = re.search(r'\[.*\]', response, re.DOTALL)
-    if array_match:
-        try:
-            parsed = json.loads(array_match.group(0))
-            return parsed
-        except json.JSONDecodeError:
-            pass
+    raise InvalidResponseError(f"Could not extract valid JSON from AI response. Response preview: {response[:200]}")
+
+
+def extract_json(text: str) -> Any:
+    """
+    Find the JSON value embedded in surrounding text in a single pass.
+    
+    Brackets are matched with a stack that skips string contents, and
+    each balanced top-level span is parsed once, so the cost is linear in
+    the text length. The first object that parses wins; otherwise the
+    first array that parses.
     
-    raise ValueError(f"Could not extract valid JSON from AI response. Response preview: {response[:200]}")
+    Args:
+        text: Text that may contain a JSON object or array
+        
+    Returns:
+        Parsed JSON value, or None if no balanced span parses
+    """
+    closers = {"{": "}", "[": "]"}
+    first_array = None
+    stack = []
+    start = 0
+    in_string = False
+    escaped = False
+    
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        
+        if char in closers:
+            if not stack:
+                start = index
+            stack.append(closers[char])
+        elif not stack:
+            # Quotes and closers in surrounding prose are not JSON
+            continue
+        elif char == '"':
+            in_string = True
+        elif char in "}]":
+            if char != stack.pop():
+                # Mismatched bracket: abandon this span
+                stack = []
+                continue
+            if stack:
+                continue
+            try:
+                parsed = json.loads(text[start:index + 1])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+            if first_array is None:
+                first_array = parsed
+    
+    return first_array
 
 
 def truncate_text(text: str, max_tokens: int = 10000) -> str:
@@ -228,3 +864,33 @@ def truncate_text(text: str, max_tokens: int = 10000) -> str:
     if len(text) <= max_chars:
         return text
     return text[:max_chars]
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into chunks of at most max_chars characters.
+    Chunks break on paragraph or line boundaries where possible.
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum characters per chunk
+        
+    Returns:
+        List of chunks in document order
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + max_chars
+        if end < len(text):
+            # Prefer a paragraph break, then a line break, in the chunk's second half
+            boundary = text.rfind("\n\n", start + max_chars // 2, end)
+            if boundary == -1:
+                boundary = text.rfind("\n", start + max_chars // 2, end)
+            if boundary != -1:
+                end = boundary + 1
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append(chunk)
+        start = end
+    return chunks
@@ -0,0 +1,188 @@
+"""
+Local BM25 retrieval over document passages.
+Lets topic filtering send the AI only the passages relevant to a topic,
+drawn from the whole document instead of its first 40,000 characters.
+"""
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.keyphrases import STOPWORDS
+from utils.text_cache import TEXT_CACHE_ENABLED, text_cache
+
+
+# Target characters per indexed passage
+PASSAGE_CHARS = 800
+
+# Bump whenever tokenization or passage splitting changes
+INDEX_VERSION = "1"
+
+# Recently used indexes kept in memory, so the topics of one document
+# (batch requests, node expansion) share a single index
+MEMORY_INDEXES = 4
+
+_memory_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, drop stopwords and strip plural endings."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_passages(text: str, passage_chars: int = PASSAGE_CHARS) -> List[str]:
+    """
+    Group consecutive lines into passages of roughly passage_chars characters.
+    Passages end on paragraph breaks when one is close enough.
+
+    Args:
+        text: Text to split
+        passage_chars: Target passage size
+
+    Returns:
+        Passages in document order
+    """
+    passages = []
+    current = []
+    size = 0
+    for line in text.split("\n"):
+        stripped = line.strip()
+        paragraph_break = not stripped
+        if stripped:
+            current.append(stripped)
+            size += len(stripped) + 1
+        if current and (size >= passage_chars or (paragraph_break and size >= passage_chars // 2)):
+            passages.append("\n".join(current))
+            current = []
+            size = 0
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a list of passages, stored as postings lists
+    so a query only touches passages containing its terms.
+    """
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.lengths = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for index, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((index, tf))
+
+        self._finalize()
+
+    def _finalize(self):
+        count = len(self.passages)
+        self.avg_length = (sum(self.lengths) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, top_k: int = 8) -> List[Tuple[int, float]]:
+        """
+        Rank passages against a query.
+
+        Args:
+            query: Free-text query (e.g. a topic)
+            top_k: Maximum passages to return
+
+        Returns:
+            (passage_index, score) pairs, best first; only passages sharing
+            at least one query term are returned
+        """
+        scores = Counter()
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.avg_length or 1))
+                scores[index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(top_k)
+
+    def to_dict(self) -> dict:
+        """Serialize the index to JSON-compatible data."""
+        return {
+            "version": INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "passages": self.passages,
+            "lengths": self.lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        """Rebuild an index from to_dict() data without re-tokenizing."""
+        index = cls.__new__(cls)
+        index.passages = data["passages"]
+        index.k1 = data["k1"]
+        index.b = data["b"]
+        index.lengths = data["lengths"]
+        index.postings = {term: [tuple(entry) for entry in postings] for term, postings in data["postings"].items()}
+        index._finalize()
+        return index
+
+
+def get_document_index(text: str, use_cache: Optional[bool] = None) -> BM25Index:
+    """
+    Get the BM25 index for a document's text, building it at most once.
+    Indexes are kept in memory for the most recent documents and persisted
+    in the extracted-text cache directory, keyed by the SHA-256 of the text.
+
+    Args:
+        text: Full document text
+        use_cache: Read/write the persisted index (default: TEXT_CACHE_ENABLED)
+
+    Returns:
+        BM25Index over the document's passages
+    """
+    if use_cache is None:
+        use_cache = TEXT_CACHE_ENABLED
+
+    key = f"bm25-{hashlib.sha256(text.encode('utf-8')).hexdigest()}-v{INDEX_VERSION}"
+    with _memory_lock:
+        index = _memory_indexes.get(key)
+        if index is not None:
+            _memory_indexes.move_to_end(key)
+            return index
+
+    index = None
+    if use_cache:
+        data = text_cache.get_index(key)
+        if data is not None and data.get("version") == INDEX_VERSION:
+            index = BM25Index.from_dict(data)
+
+    if index is None:
+        index = BM25Index(split_passages(text))
+        if use_cache:
+            text_cache.put_index(key, index.to_dict())
+
+    with _memory_lock:
+        _memory_indexes[key] = index
+        while len(_memory_indexes) > MEMORY_INDEXES:
+            _memory_indexes.popitem(last=False)
+    return index
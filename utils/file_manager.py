@@ -1,6 +1,7 @@
 """
 File management utilities for temporary file handling.
 """
+import hashlib
 import os
 import time
 import uuid
@@ -44,6 +45,24 @@ def generate_unique_filename(original_filename: str) -> str:
     return unique_filename
 
 
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's bytes.
+    
+    Args:
+        file_path: Path to the file to hash
+        chunk_size: Bytes read per iteration
+        
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def save_uploaded_file(file_content: bytes, original_filename: str) -> str:
     """
     Save uploaded file to temporary directory.
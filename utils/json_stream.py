@@ -0,0 +1,212 @@
+"""
+Incremental parsing of a streamed JSON object.
+Consumes text chunks as they arrive from a provider and hands back each
+element of one top-level array (e.g. a mind map's "nodes") as soon as it
+is complete, plus the other top-level fields once they close.
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Frame:
+    """An open object or array."""
+
+    def __init__(self, kind: str, target: bool = False):
+        self.kind = kind
+        # Objects: "key", "colon", "value" or "after" (a value was read)
+        self.state = "key" if kind == "{" else "value"
+        # The array whose elements are streamed out
+        self.target = target
+
+
+class StreamingJSONObjectParser:
+    """
+    Single-pass parser for one JSON object delivered in chunks.
+
+    Every character is scanned once and only the text of the value being
+    built is kept, so the cost is linear in the stream length. Text before
+    the opening brace (e.g. a markdown fence) is skipped.
+
+    Example:
+        parser = StreamingJSONObjectParser("nodes")
+        for chunk in stream:
+            for node in parser.feed(chunk):
+                ...
+        parser.fields  # e.g. {"topic": "..."} once the field has closed
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._stack: List[_Frame] = []
+        self._key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._raw_key: List[str] = []
+        self._scalar = False
+        # Text of the captured value and the stack depth it started at
+        self._capture: Optional[List[str]] = None
+        self._capture_depth = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next chunk of text.
+
+        Args:
+            chunk: Text appended to the stream
+
+        Returns:
+            Array elements completed by this chunk, in order
+
+        Raises:
+            json.JSONDecodeError: If a completed value is not valid JSON
+        """
+        items: List[Any] = []
+        for char in chunk:
+            if self.done:
+                break
+            self._step(char, items)
+        return items
+
+    def close(self):
+        """
+        End the stream.
+
+        Raises:
+            ValueError: If the object was never closed (e.g. a truncated response)
+        """
+        if not self.done:
+            raise ValueError("JSON stream ended before the object was closed")
+
+    def _step(self, char: str, items: List[Any]):
+        if self._in_string:
+            self._string_char(char, items)
+            return
+
+        if self._scalar:
+            if char not in _WHITESPACE and char not in ",}]":
+                self._capture.append(char)
+                return
+            self._finish_scalar(items)
+
+        if not self._stack:
+            if char == "{":
+                self._stack.append(_Frame("{"))
+            return
+
+        if self._capture is not None:
+            self._capture.append(char)
+
+        frame = self._stack[-1]
+        if char in _WHITESPACE:
+            return
+
+        if frame.kind == "{" and frame.state == "key":
+            if char == '"':
+                self._in_string = True
+                self._string_is_key = True
+                self._raw_key = []
+            elif char == "}":
+                self._close(items)
+            return
+
+        if frame.kind == "{" and frame.state == "colon":
+            if char == ":":
+                frame.state = "value"
+            return
+
+        if char == ",":
+            if frame.kind == "{":
+                frame.state = "key"
+            return
+
+        if char in "}]":
+            self._close(items)
+            return
+
+        if frame.kind == "{" and frame.state == "after":
+            return
+
+        self._start_value(char, frame)
+
+    def _start_value(self, char: str, frame: _Frame):
+        depth = len(self._stack)
+        if frame.kind == "{":
+            frame.state = "after"
+
+        is_target = depth == 1 and char == "[" and self._key == self.array_key
+        if self._capture is None and not is_target and (depth == 1 or (depth == 2 and frame.target)):
+            self._capture = [char]
+            self._capture_depth = depth
+
+        if char == '"':
+            self._in_string = True
+            self._string_is_key = False
+        elif char in "{[":
+            self._stack.append(_Frame(char, target=is_target))
+        elif self._capture is not None and self._capture_depth == depth:
+            self._scalar = True
+
+    def _string_char(self, char: str, items: List[Any]):
+        if self._capture is not None:
+            self._capture.append(char)
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._string_is_key:
+                if len(self._stack) == 1:
+                    self._key = json.loads('"' + "".join(self._raw_key) + '"')
+                self._stack[-1].state = "colon"
+                return
+            if self._capture is not None and self._capture_depth == len(self._stack):
+                self._finish(items)
+            return
+        if self._string_is_key and len(self._stack) == 1:
+            self._raw_key.append(char)
+
+    def _close(self, items: List[Any]):
+        self._stack.pop()
+        if not self._stack:
+            self.done = True
+        elif self._capture is not None and self._capture_depth == len(self._stack):
+            self._finish(items)
+
+    def _finish_scalar(self, items: List[Any]):
+        self._scalar = False
+        self._finish(items)
+
+    def _finish(self, items: List[Any]):
+        value = json.loads("".join(self._capture))
+        depth = self._capture_depth
+        self._capture = None
+        if depth == 1:
+            self.fields[self._key] = value
+        else:
+            items.append(value)
+
+
+def parse_stream(chunks: Iterable[str], array_key: str) -> Tuple[Dict[str, Any], List[Any]]:
+    """
+    Parse a complete chunked stream at once.
+
+    Args:
+        chunks: Text chunks of one JSON object
+        array_key: Top-level key whose array elements are collected
+
+    Returns:
+        (top-level fields other than array_key, array elements)
+    """
+    parser = StreamingJSONObjectParser(array_key)
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    parser.close()
+    return parser.fields, items
@@ -0,0 +1,175 @@
+"""
+Local keyphrase extraction for topic detection without an AI call.
+Combines RAKE-style phrase scoring with TF-IDF weighting over text segments.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List
+
+
+# Common English words that break candidate phrases
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each either else
+etc even ever every few for from further get gets got had has have having he her here hers
+herself him himself his how however i if in into is it its itself just least less let like
+made make many may me might more most much must my myself neither no nor not now of off
+often on once one only or other others our ours ourselves out over own per perhaps rather
+same shall she should since so some such than that the their theirs them themselves then
+there therefore these they this those though through thus to too under until up upon us
+use used uses using very via was we well were what when where whether which while who whom
+whose why will with within without would yet you your yours yourself yourselves
+chapter section page figure table example examples fig eg ie
+""".split())
+
+# Characters per segment when computing document frequencies
+SEGMENT_CHARS = 2000
+
+# Longest candidate phrase in words
+MAX_PHRASE_WORDS = 3
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z\-']*[A-Za-z]|[A-Za-z]")
+_FRAGMENT_RE = re.compile(r"[^\w\s\-']+|\n{2,}")
+
+
+def _segments(text: str) -> List[str]:
+    """Split text into roughly SEGMENT_CHARS-sized segments on paragraph breaks."""
+    segments = []
+    current = []
+    size = 0
+    for paragraph in text.split("\n"):
+        current.append(paragraph)
+        size += len(paragraph) + 1
+        if size >= SEGMENT_CHARS:
+            segments.append("\n".join(current))
+            current = []
+            size = 0
+    if current:
+        segments.append("\n".join(current))
+    return segments
+
+
+def _word_runs(text: str) -> Iterable[List[str]]:
+    """Yield runs of content words (surface forms) split at stopwords and punctuation."""
+    for fragment in _FRAGMENT_RE.split(text):
+        run = []
+        for word in _WORD_RE.findall(fragment):
+            lower = word.lower()
+            if lower in STOPWORDS or len(lower) < 3:
+                if run:
+                    yield run
+                run = []
+                continue
+            run.append(word)
+        if run:
+            yield run
+
+
+def _display_form(forms: Counter) -> str:
+    """Pick the most common surface form, title-casing all-lowercase phrases."""
+    phrase = forms.most_common(1)[0][0]
+    if phrase.islower():
+        phrase = " ".join(word.capitalize() for word in phrase.split())
+    return phrase
+
+
+def extract_keyphrases(text: str, limit: int = 10) -> List[str]:
+    """
+    Extract the most characteristic phrases of a text.
+
+    Phrases are scored RAKE-style (word degree/frequency), boosted by how
+    often the phrase and its words recur and by each word's inverse segment
+    frequency, so boilerplate spread through every segment ranks below
+    focused terms.
+
+    Args:
+        text: Text to analyze
+        limit: Maximum number of phrases to return
+
+    Returns:
+        Ranked list of phrases, most relevant first
+    """
+    segments = _segments(text)
+    segment_count = len(segments)
+
+    word_freq = Counter()
+    word_degree = Counter()
+    word_df = Counter()
+    phrase_count = Counter()
+    phrase_forms: Dict[tuple, Counter] = defaultdict(Counter)
+
+    for segment in segments:
+        seen_words = set()
+        for run in _word_runs(segment):
+            lowered = [word.lower() for word in run]
+            for word in lowered:
+                word_freq[word] += 1
+                word_degree[word] += min(len(run), MAX_PHRASE_WORDS)
+                seen_words.add(word)
+            # Every short n-gram of the run is a candidate, so a recurring
+            # core phrase outranks the longer runs it appears in
+            for size in range(1, min(len(run), MAX_PHRASE_WORDS) + 1):
+                for start in range(len(run) - size + 1):
+                    key = tuple(lowered[start:start + size])
+                    phrase_count[key] += 1
+                    phrase_forms[key][" ".join(run[start:start + size])] += 1
+        word_df.update(seen_words)
+
+    if not phrase_count:
+        return []
+
+    idf = {
+        word: math.log(1 + segment_count / df) + 1
+        for word, df in word_df.items()
+    }
+
+    scores = {}
+    for key, count in phrase_count.items():
+        # Phrases seen once are noise unless the text is tiny
+        if count < 2 and len(phrase_count) > limit * 5:
+            continue
+        # RAKE word scores, with a damped bonus for longer phrases
+        rake = sum(word_degree[word] / word_freq[word] for word in key) / math.sqrt(len(key))
+        weight = sum(idf[word] for word in key) / len(key)
+        scores[key] = rake * weight * (1 + math.log(count))
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+
+    topics = []
+    chosen = []
+    for key in ranked:
+        words = set(key)
+        # Skip phrases contained in, or sharing two words with, a better-ranked phrase
+        if any(words <= other or other <= words or len(words & other) >= 2 for other in chosen):
+            continue
+        chosen.append(words)
+        topics.append(_display_form(phrase_forms[key]))
+        if len(topics) >= limit:
+            break
+    return topics
+
+
+def topic_agreement(topics: List[str], reference: List[str]) -> float:
+    """
+    Measure how many topics share a content word with a reference list.
+    Used to cross-check AI topics against local keyphrases.
+
+    Args:
+        topics: Topics to check
+        reference: Reference topics (e.g. from extract_keyphrases)
+
+    Returns:
+        Fraction of topics (0.0-1.0) overlapping the reference vocabulary
+    """
+    if not topics:
+        return 0.0
+    vocabulary = {
+        word.lower() for phrase in reference for word in _WORD_RE.findall(phrase)
+        if word.lower() not in STOPWORDS
+    }
+    matched = sum(
+        any(word.lower() in vocabulary for word in _WORD_RE.findall(topic))
+        for topic in topics
+    )
+    return matched / len(topics)
@@ -0,0 +1,192 @@
+"""
+Persistent cache for AI responses.
+Responses are stored in SQLite, keyed by a hash of everything that shapes
+the output (provider, model, sampling settings, prompts), so repeated
+prompts cost a local lookup instead of a provider call.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from utils.file_manager import TEMP_DIR
+
+
+# SQLite database file (in a temp subdirectory by default, which the
+# startup cleanup of old uploads leaves alone)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(TEMP_DIR, "cache", "llm_cache.sqlite3"))
+
+# Entries older than this are treated as misses (7 days)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Maximum total size of cached responses before LRU eviction (64MB)
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Set to "0" to disable the cache entirely
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+# Set while a caller wants fresh responses (e.g. retries after a bad one)
+_refresh = contextvars.ContextVar("llm_cache_refresh", default=False)
+
+
+class LLMCache:
+    """
+    SQLite-backed response store with TTL expiry and LRU size eviction.
+    Safe to share across threads; each operation is a short transaction.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl: int = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        enabled: bool = LLM_CACHE_ENABLED
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def make_key(self, **parts) -> str:
+        """Hash the settings and prompts that determine a response."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def should_use(self, use_cache: Optional[bool] = None) -> bool:
+        """
+        Decide whether a call may read the cache.
+
+        Args:
+            use_cache: Per-call override (default: the cache's enabled flag)
+
+        Returns:
+            True to look up and store responses
+        """
+        return self.enabled if use_cache is None else use_cache
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, refreshing its LRU stamp.
+        Returns None on a miss, an expired entry or inside refresh().
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Cached response text, or None
+        """
+        if _refresh.get():
+            return None
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl > 0 and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """
+        Store a response, replacing any previous entry, then enforce max_bytes.
+
+        Args:
+            key: Key from make_key()
+            response: Response text
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._evict(conn)
+
+    def clear(self):
+        """Remove every entry and reset counters."""
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters and current size.
+
+        Returns:
+            Dictionary with hits, misses, entries and bytes
+        """
+        with self._lock:
+            entries, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def close(self):
+        """Close the database connection (reopened on next use)."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._conn = conn
+        return self._conn
+
+    def _evict(self, conn: sqlite3.Connection):
+        if self.ttl > 0:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+
+@contextmanager
+def refresh() -> Iterator[None]:
+    """
+    Skip cache lookups inside the block; fresh responses still overwrite
+    their entries. Used by retries so a bad cached response is replaced.
+    """
+    token = _refresh.set(True)
+    try:
+        yield
+    finally:
+        _refresh.reset(token)
+
+
+# Shared cache instance
+llm_cache = LLMCache()
@@ -0,0 +1,227 @@
+"""
+Pooled AI provider clients.
+One SDK client (and HTTP connection pool) is created per provider
+configuration and reused across calls and threads, so requests share
+keep-alive connections instead of paying a TLS handshake each time.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, NamedTuple, Optional
+
+from utils.llm_metrics import amark_first_byte, mark_first_byte
+from utils.retry import ConfigurationError
+
+
+# Connection pool limits per provider client
+AI_POOL_MAX_CONNECTIONS = int(os.getenv("AI_POOL_MAX_CONNECTIONS", "20"))
+AI_POOL_MAX_KEEPALIVE = int(os.getenv("AI_POOL_MAX_KEEPALIVE", "10"))
+AI_POOL_KEEPALIVE_EXPIRY = float(os.getenv("AI_POOL_KEEPALIVE_EXPIRY", "30"))
+
+# Environment variables and defaults for each provider
+PROVIDER_SETTINGS = {
+    "openai": {
+        "api_key_env": "OPENAI_API_KEY",
+        "model_env": "OPENAI_MODEL",
+        "default_model": "gpt-3.5-turbo",
+        "base_url_env": "OPENAI_BASE_URL",
+        "package": "openai",
+        "label": "OpenAI",
+    },
+    "groq": {
+        "api_key_env": "GROQ_API_KEY",
+        "model_env": "GROQ_MODEL",
+        "default_model": "llama-3.1-70b-versatile",
+        "base_url_env": "GROQ_BASE_URL",
+        "package": "groq",
+        "label": "Groq",
+    },
+    "anthropic": {
+        "api_key_env": "ANTHROPIC_API_KEY",
+        "model_env": "ANTHROPIC_MODEL",
+        "default_model": "claude-3-sonnet-20240229",
+        "base_url_env": "ANTHROPIC_BASE_URL",
+        "package": "anthropic",
+        "label": "Anthropic",
+    },
+    # Served in-process by utils.stub_provider; never needs a key or SDK client
+    "stub": {
+        "api_key_env": "STUB_API_KEY",
+        "model_env": "STUB_MODEL",
+        "default_model": "stub-1",
+        "base_url_env": "STUB_BASE_URL",
+        "package": None,
+        "label": "Stub",
+    },
+}
+
+
+class ProviderConfig(NamedTuple):
+    """Resolved settings for one provider."""
+    provider: str
+    api_key: Optional[str]
+    model: str
+    base_url: Optional[str]
+
+
+class ClientRegistry:
+    """
+    Thread-safe registry of SDK clients keyed by provider configuration.
+    Environment variables are read once per provider; call reset() after
+    changing them.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = AI_POOL_MAX_CONNECTIONS,
+        max_keepalive: int = AI_POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = AI_POOL_KEEPALIVE_EXPIRY
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self._configs: Dict[str, ProviderConfig] = {}
+        self._clients: Dict[ProviderConfig, Any] = {}
+        # Async clients hold connections bound to one event loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def config(self, provider: str) -> ProviderConfig:
+        """
+        Get a provider's settings, reading the environment on first use.
+
+        Args:
+            provider: Provider name (openai, groq, anthropic)
+
+        Returns:
+            ProviderConfig for the provider
+
+        Raises:
+            ConfigurationError: If the provider is unknown (a ValueError)
+        """
+        config = self._configs.get(provider)
+        if config is not None:
+            return config
+
+        settings = PROVIDER_SETTINGS.get(provider)
+        if settings is None:
+            raise ConfigurationError(f"Unsupported AI provider: {provider}")
+
+        config = ProviderConfig(
+            provider=provider,
+            api_key=os.getenv(settings["api_key_env"]),
+            model=os.getenv(settings["model_env"], settings["default_model"]),
+            base_url=os.getenv(settings["base_url_env"]) or None,
+        )
+        with self._lock:
+            return self._configs.setdefault(provider, config)
+
+    def get(self, provider: str) -> Any:
+        """
+        Get the shared client for a provider, creating it on first use.
+
+        Args:
+            provider: Provider name (openai, groq, anthropic)
+
+        Returns:
+            Provider SDK client
+
+        Raises:
+            ConfigurationError: If the provider's API key is not set (a ValueError)
+            ImportError: If the provider's package is not installed
+        """
+        config = self.config(provider)
+        client = self._clients.get(config)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(config)
+            if client is None:
+                client = self._create(config)
+                self._clients[config] = client
+            return client
+
+    def get_async(self, provider: str) -> Any:
+        """
+        Get the shared async client for a provider on the running event loop.
+
+        Args:
+            provider: Provider name (openai, groq, anthropic)
+
+        Returns:
+            Provider async SDK client
+
+        Raises:
+            ConfigurationError: If the provider's API key is not set (a ValueError)
+            ImportError: If the provider's package is not installed
+        """
+        config = self.config(provider)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(config)
+            if client is None:
+                client = self._create(config, use_async=True)
+                clients[config] = client
+            return client
+
+    def reset(self):
+        """Close every sync client and forget cached settings and async clients."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._configs.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _create(self, config: ProviderConfig, use_async: bool = False) -> Any:
+        settings = PROVIDER_SETTINGS[config.provider]
+        if not config.api_key:
+            raise ConfigurationError(f"{settings['api_key_env']} environment variable not set")
+
+        try:
+            import httpx
+            http_client_class = httpx.AsyncClient if use_async else httpx.Client
+            kwargs = {
+                "api_key": config.api_key,
+                "http_client": http_client_class(
+                    limits=self._limits(),
+                    # Response headers arriving mark the call's time to first byte
+                    event_hooks={"response": [amark_first_byte if use_async else mark_first_byte]},
+                ),
+                # Retries are governed by utils.retry.RetryPolicy, not the SDK
+                "max_retries": 0,
+            }
+            if config.base_url:
+                kwargs["base_url"] = config.base_url
+
+            if config.provider == "openai":
+                from openai import AsyncOpenAI, OpenAI
+                return (AsyncOpenAI if use_async else OpenAI)(**kwargs)
+            if config.provider == "groq":
+                from groq import AsyncGroq, Groq
+                return (AsyncGroq if use_async else Groq)(**kwargs)
+            import anthropic
+            return (anthropic.AsyncAnthropic if use_async else anthropic.Anthropic)(**kwargs)
+        except ImportError:
+            raise ImportError(
+                f"{settings['label']} package not installed. Run: pip install {settings['package']}"
+            )
+
+
+# Shared registry used by utils.ai_helper
+client_registry = ClientRegistry()
@@ -0,0 +1,331 @@
+"""
+Per-call accounting for AI provider requests.
+Every provider call records its provider, model, pipeline stage, token
+usage, queue wait, time to first byte, latency and estimated cost into
+an in-memory aggregator, so expensive stages and slow providers show up
+in one place.
+"""
+import asyncio
+import contextvars
+import inspect
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+# USD per million (input, output) tokens; override with <PROVIDER>_PRICE_PER_MTOK="input,output"
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4": (30.00, 60.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "claude-3-sonnet-20240229": (3.00, 15.00),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-opus-20240229": (15.00, 75.00),
+    "stub-1": (0.0, 0.0),
+}
+
+# Recent calls kept for percentiles and inspection
+METRICS_WINDOW = int(os.getenv("LLM_METRICS_WINDOW", "1000"))
+
+# Pipeline stage of the current call, set with llm_stage()
+_stage: contextvars.ContextVar[str] = contextvars.ContextVar("llm_stage", default="other")
+
+# Provider call in progress in this context, if any
+_current: contextvars.ContextVar[Optional["CallRecord"]] = contextvars.ContextVar("llm_call", default=None)
+
+
+class CallRecord:
+    """Timings and usage of one provider call."""
+
+    def __init__(self, provider: str, model: str, stage: str):
+        self.provider = provider
+        self.model = model
+        self.stage = stage
+        self.started = time.monotonic()
+        self.admitted: Optional[float] = None
+        self.first_byte: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.ok = False
+        self.cancelled = False
+
+    def admit(self):
+        """Mark the end of queueing for rate limits and concurrency slots."""
+        self.admitted = time.monotonic()
+
+    def usage(self, prompt_tokens: int, completion_tokens: int):
+        """Record token usage (reported by the provider or estimated)."""
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @property
+    def queue_wait(self) -> float:
+        return (self.admitted or self.started) - self.started
+
+    @property
+    def latency(self) -> float:
+        """Seconds from admission to the complete response."""
+        return (self.finished or time.monotonic()) - (self.admitted or self.started)
+
+    @property
+    def ttfb(self) -> float:
+        """Seconds from admission to the first response byte."""
+        return (self.first_byte or self.finished or time.monotonic()) - (self.admitted or self.started)
+
+    @property
+    def cost(self) -> float:
+        """Estimated cost in USD."""
+        input_price, output_price = price_for(self.provider, self.model)
+        return ((self.prompt_tokens or 0) * input_price + (self.completion_tokens or 0) * output_price) / 1_000_000
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "stage": self.stage,
+            "ok": self.ok,
+            "cancelled": self.cancelled,
+            "prompt_tokens": self.prompt_tokens or 0,
+            "completion_tokens": self.completion_tokens or 0,
+            "queue_wait": round(self.queue_wait, 4),
+            "ttfb": round(self.ttfb, 4),
+            "latency": round(self.latency, 4),
+            "cost": round(self.cost, 6),
+        }
+
+
+def price_for(provider: str, model: str) -> Tuple[float, float]:
+    """
+    Get the (input, output) USD price per million tokens for a model.
+
+    Args:
+        provider: Provider name
+        model: Model name
+
+    Returns:
+        Prices from <PROVIDER>_PRICE_PER_MTOK, else MODEL_PRICES, else (0, 0)
+    """
+    override = os.getenv(f"{provider.upper()}_PRICE_PER_MTOK")
+    if override:
+        try:
+            input_price, output_price = (float(part) for part in override.split(","))
+            return input_price, output_price
+        except ValueError:
+            pass
+    return MODEL_PRICES.get(model, (0.0, 0.0))
+
+
+class _Totals:
+    """Running sums for one group of calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.queue_wait = 0.0
+        self.latency = 0.0
+
+    def add(self, record: CallRecord):
+        self.calls += 1
+        if record.cancelled:
+            self.cancelled += 1
+        elif not record.ok:
+            self.errors += 1
+        self.prompt_tokens += record.prompt_tokens or 0
+        self.completion_tokens += record.completion_tokens or 0
+        self.cost += record.cost
+        self.queue_wait += record.queue_wait
+        self.latency += record.latency
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return round(values[rank - 1], 4)
+
+
+class LLMMetrics:
+    """
+    Thread-safe aggregator of provider calls.
+    Totals cover every call since start (or reset); latency percentiles
+    cover the most recent `window` calls.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._recent: Deque[CallRecord] = deque(maxlen=window)
+        self._by_provider: Dict[Tuple[str, str], _Totals] = {}
+        self._by_stage: Dict[str, _Totals] = {}
+        self._total = _Totals()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, provider: str, model: str) -> Iterator[CallRecord]:
+        """
+        Record one provider call made inside the block.
+
+        Args:
+            provider: Provider name
+            model: Model name
+
+        Yields:
+            CallRecord to mark admission and usage on; failures are recorded
+            as errors and re-raised
+        """
+        record = CallRecord(provider, model, _stage.get())
+        token = _current.set(record)
+        try:
+            yield record
+            record.ok = True
+        except asyncio.CancelledError:
+            # A cancelled hedge is not a provider error
+            record.cancelled = True
+            raise
+        finally:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # A streaming call's generator was closed from another context
+                pass
+            record.finished = time.monotonic()
+            self.add(record)
+
+    def add(self, record: CallRecord):
+        """Add a finished call to the aggregates."""
+        with self._lock:
+            self._recent.append(record)
+            self._total.add(record)
+            self._by_provider.setdefault((record.provider, record.model), _Totals()).add(record)
+            self._by_stage.setdefault(record.stage, _Totals()).add(record)
+
+    def records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent calls, newest last."""
+        with self._lock:
+            recent = list(self._recent)
+        if limit is not None:
+            recent = recent[-limit:] if limit > 0 else []
+        return [record.as_dict() for record in recent]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get aggregated call metrics.
+
+        Returns:
+            Dictionary with totals, per provider/model and per stage: calls,
+            errors, cancelled hedges, tokens, cost, mean queue wait and p50/p95 latency and TTFB
+        """
+        with self._lock:
+            recent = list(self._recent)
+            total = self._summary(self._total, recent)
+            providers = {
+                f"{provider}/{model}": self._summary(
+                    totals, [r for r in recent if r.provider == provider and r.model == model]
+                )
+                for (provider, model), totals in sorted(self._by_provider.items())
+            }
+            stages = {
+                stage: self._summary(totals, [r for r in recent if r.stage == stage])
+                for stage, totals in sorted(self._by_stage.items())
+            }
+        return {"totals": total, "by_provider": providers, "by_stage": stages}
+
+    def reset(self):
+        """Forget every recorded call."""
+        with self._lock:
+            self._recent.clear()
+            self._by_provider.clear()
+            self._by_stage.clear()
+            self._total = _Totals()
+
+    @staticmethod
+    def _summary(totals: _Totals, recent: List[CallRecord]) -> Dict[str, Any]:
+        ok = [record for record in recent if record.ok]
+        return {
+            "calls": totals.calls,
+            "errors": totals.errors,
+            "cancelled": totals.cancelled,
+            "prompt_tokens": totals.prompt_tokens,
+            "completion_tokens": totals.completion_tokens,
+            "cost": round(totals.cost, 6),
+            "avg_queue_wait": round(totals.queue_wait / totals.calls, 4) if totals.calls else 0.0,
+            "avg_latency": round(totals.latency / totals.calls, 4) if totals.calls else 0.0,
+            "latency_p50": _percentile([record.latency for record in ok], 50),
+            "latency_p95": _percentile([record.latency for record in ok], 95),
+            "ttfb_p50": _percentile([record.ttfb for record in ok], 50),
+            "ttfb_p95": _percentile([record.ttfb for record in ok], 95),
+        }
+
+
+def note_usage(prompt_tokens: int, completion_tokens: int):
+    """Record provider-reported token usage on the call in progress."""
+    record = _current.get()
+    if record is not None:
+        record.usage(prompt_tokens, completion_tokens)
+
+
+def mark_first_byte(response: Any = None):
+    """Stamp the first response byte on the call in progress (an httpx response hook)."""
+    record = _current.get()
+    if record is not None and record.first_byte is None:
+        record.first_byte = time.monotonic()
+
+
+async def amark_first_byte(response: Any = None):
+    """Async counterpart of mark_first_byte() for async HTTP clients."""
+    mark_first_byte(response)
+
+
+class _Stage:
+    def __init__(self, name: str):
+        self.name = name
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_stage.set(self.name))
+        return self
+
+    def __exit__(self, *exc_info):
+        _stage.reset(self._tokens.pop())
+
+    def __call__(self, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _Stage(self.name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Stage(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def llm_stage(name: str) -> _Stage:
+    """
+    Attribute AI calls to a pipeline stage.
+    Use as a context manager or as a decorator on sync or async functions.
+
+    Args:
+        name: Stage name reported in metrics (e.g. "filter_topic_text")
+    """
+    return _Stage(name)
+
+
+# Shared aggregator used by utils.ai_helper
+call_metrics = LLMMetrics()
@@ -0,0 +1,241 @@
+"""
+Compact indexed mind map.
+Nodes are stored in parallel arrays (ids, parent positions, depths) with
+children in one offset-indexed array, built once in O(n). Validation,
+visualization and the UI share this instead of re-indexing node dicts.
+"""
+import json
+from array import array
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Parent position of top-level nodes (parent id 0 in the JSON format)
+ROOT = -1
+
+
+class MindMapError(ValueError):
+    """Mind map structure is invalid (duplicate ids, orphans or cycles)."""
+
+
+class MindMap:
+    """
+    Read-only mind map indexed by node position.
+
+    Positions follow the input node order. For the node at position i:
+    ids[i] is its id, texts[i] its text, parents[i] its parent's position
+    (ROOT for top-level nodes), depths[i] its depth (0 for top-level) and
+    its children are child_index[child_offsets[i]:child_offsets[i + 1]].
+
+    Example:
+        mindmap = MindMap.from_dict({"topic": "T", "nodes": [...]})
+        for position, depth in mindmap.walk():
+            print("  " * depth + mindmap.texts[position])
+    """
+
+    __slots__ = (
+        "topic", "ids", "texts", "parents", "depths", "roots",
+        "child_offsets", "child_index", "problems", "_positions",
+    )
+
+    def __init__(self, topic: str, nodes: List[Dict[str, Any]], strict: bool = True):
+        """
+        Index a list of {"id", "parent", "text"} nodes.
+
+        Args:
+            topic: Mind map topic
+            nodes: Node dictionaries; parent 0 marks a top-level node
+            strict: Raise on structural problems. Otherwise orphans and
+                    nodes caught in cycles become top-level nodes and the
+                    problems are listed in self.problems.
+
+        Raises:
+            MindMapError: On an id outside the 64-bit range, and in strict
+                          mode on a duplicate id, an unknown parent or a
+                          parent cycle
+        """
+        self.topic = topic
+        self.problems: List[str] = []
+        count = len(nodes)
+        try:
+            self.ids = array("q", (node["id"] for node in nodes))
+        except OverflowError:
+            raise MindMapError("Node ids must fit in 64 bits") from None
+        self.texts = [node["text"] for node in nodes]
+
+        self._positions: Dict[int, int] = {}
+        for position, node_id in enumerate(self.ids):
+            if node_id in self._positions:
+                self._problem(strict, f"Duplicate node id: {node_id}")
+                continue
+            self._positions[node_id] = position
+
+        self.parents = array("l", [ROOT]) * count
+        for position, node in enumerate(nodes):
+            parent = node["parent"]
+            if parent == 0:
+                continue
+            parent_position = self._positions.get(parent)
+            if parent_position is None:
+                self._problem(strict, f"Node {node['id']} has invalid parent reference: {parent}")
+                continue
+            self.parents[position] = parent_position
+
+        self._index_children()
+        self.depths = array("l", [-1]) * count
+        unreached = self._assign_depths()
+        if unreached:
+            self._problem(strict, f"Mind map contains a cycle through node {self.ids[unreached[0]]}")
+            # Break each cycle by promoting one of its nodes to the top level
+            while unreached:
+                self.parents[unreached[0]] = ROOT
+                self._index_children()
+                unreached = self._assign_depths()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], strict: bool = True) -> "MindMap":
+        """
+        Build from the {"topic", "nodes"} format produced by generate_mindmap.
+
+        Raises:
+            MindMapError: In strict mode, if the structure is invalid
+        """
+        return cls(data.get("topic", ""), data.get("nodes", []), strict=strict)
+
+    @classmethod
+    def from_json(cls, text: str, strict: bool = True) -> "MindMap":
+        """Build from a JSON string in the {"topic", "nodes"} format."""
+        return cls.from_dict(json.loads(text), strict=strict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to the {"topic", "nodes"} format, in the original node order."""
+        ids = self.ids
+        parents = self.parents
+        return {
+            "topic": self.topic,
+            "nodes": [
+                {"id": ids[i], "parent": 0 if parents[i] == ROOT else ids[parents[i]], "text": self.texts[i]}
+                for i in range(len(ids))
+            ],
+        }
+
+    def to_json(self, **kwargs) -> str:
+        """Serialize to a JSON string (kwargs are passed to json.dumps)."""
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, node_id: int) -> Optional[int]:
+        """Position of a node id, or None if absent."""
+        return self._positions.get(node_id)
+
+    def node(self, position: int) -> Dict[str, Any]:
+        """Node at a position as an {"id", "parent", "text"} dict."""
+        parent = self.parents[position]
+        return {
+            "id": self.ids[position],
+            "parent": 0 if parent == ROOT else self.ids[parent],
+            "text": self.texts[position],
+        }
+
+    def children(self, position: int) -> array:
+        """Positions of a node's children, in input order (ROOT for top-level nodes)."""
+        if position == ROOT:
+            return self.roots
+        return self.child_index[self.child_offsets[position]:self.child_offsets[position + 1]]
+
+    def path(self, position: int) -> List[int]:
+        """Positions from the node's top-level ancestor down to the node itself."""
+        path = []
+        while position != ROOT:
+            path.append(position)
+            position = self.parents[position]
+        path.reverse()
+        return path
+
+    @property
+    def max_depth(self) -> int:
+        """Deepest level (0 when every node is top-level, -1 when empty)."""
+        return max(self.depths, default=-1)
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """(parent position, child position) pairs, excluding top-level nodes."""
+        for position, parent in enumerate(self.parents):
+            if parent != ROOT:
+                yield parent, position
+
+    def walk(self, max_depth: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Depth-first, pre-order traversal without recursion.
+
+        Args:
+            max_depth: Skip nodes deeper than this
+
+        Yields:
+            (position, depth) with each node before its children
+        """
+        stack = [(position, 0) for position in reversed(self.roots)]
+        while stack:
+            position, depth = stack.pop()
+            yield position, depth
+            if max_depth is None or depth < max_depth:
+                for child in reversed(self.children(position)):
+                    stack.append((child, depth + 1))
+
+    def levels(self) -> List[List[int]]:
+        """Node positions grouped by depth, breadth-first within each level."""
+        levels: List[List[int]] = []
+        queue = deque(self.roots)
+        while queue:
+            position = queue.popleft()
+            depth = self.depths[position]
+            if depth == len(levels):
+                levels.append([])
+            levels[depth].append(position)
+            queue.extend(self.children(position))
+        return levels
+
+    def _problem(self, strict: bool, message: str):
+        if strict:
+            raise MindMapError(message)
+        self.problems.append(message)
+
+    def _index_children(self):
+        """Counting sort of positions by parent into child_offsets/child_index."""
+        count = len(self.ids)
+        counts = array("l", [0]) * (count + 1)
+        roots = array("l")
+        for position, parent in enumerate(self.parents):
+            if parent == ROOT:
+                roots.append(position)
+            else:
+                counts[parent + 1] += 1
+        for i in range(count):
+            counts[i + 1] += counts[i]
+
+        child_index = array("l", [0]) * (counts[count] if count else 0)
+        fill = array("l", counts)
+        for position, parent in enumerate(self.parents):
+            if parent != ROOT:
+                child_index[fill[parent]] = position
+                fill[parent] += 1
+
+        self.roots = roots
+        self.child_offsets = counts
+        self.child_index = child_index
+
+    def _assign_depths(self) -> List[int]:
+        """Breadth-first depths from the top level; returns positions never reached (cycles)."""
+        depths = self.depths
+        for i in range(len(depths)):
+            depths[i] = -1
+        queue = deque(self.roots)
+        for position in self.roots:
+            depths[position] = 0
+        while queue:
+            position = queue.popleft()
+            for child in self.children(position):
+                depths[child] = depths[position] + 1
+                queue.append(child)
+        return [position for position, depth in enumerate(depths) if depth == -1]
@@ -0,0 +1,61 @@
+"""
+Persistent cache for generated mind maps.
+Whole pipeline results are stored in SQLite, keyed by the PDF's SHA-256,
+the normalized topic, the provider models and the prompt version, so a
+popular document and topic is served without extraction or AI calls.
+The database file is shared by every API worker on the host.
+"""
+import os
+from typing import Any
+
+from utils.ai_helper import model_signature
+from utils.file_manager import TEMP_DIR
+from utils.llm_cache import LLMCache
+
+
+# SQLite database file (next to the AI response cache, in a temp
+# subdirectory the startup cleanup of old uploads leaves alone)
+MINDMAP_CACHE_PATH = os.getenv("MINDMAP_CACHE_PATH", os.path.join(TEMP_DIR, "cache", "mindmap_cache.sqlite3"))
+
+# Entries older than this are treated as misses (7 days)
+MINDMAP_CACHE_TTL = int(os.getenv("MINDMAP_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Maximum total size of cached mind maps before LRU eviction (64MB)
+MINDMAP_CACHE_MAX_BYTES = int(os.getenv("MINDMAP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Set to "0" to disable the cache entirely
+MINDMAP_CACHE_ENABLED = os.getenv("MINDMAP_CACHE_ENABLED", "1") != "0"
+
+
+def normalize_topic(topic: str) -> str:
+    """Fold case and collapse whitespace so equivalent topics share an entry."""
+    return " ".join(topic.casefold().split())
+
+
+def mindmap_key(document_sha256: str, topic: str, **settings: Any) -> str:
+    """
+    Build the cache key for one document and topic.
+
+    Args:
+        document_sha256: SHA-256 of the PDF bytes
+        topic: Topic as requested (normalized here)
+        **settings: Anything else that shapes the result (prompt version, levels, ...)
+
+    Returns:
+        Key for mindmap_cache
+    """
+    return mindmap_cache.make_key(
+        document=document_sha256,
+        topic=normalize_topic(topic),
+        providers=model_signature(),
+        **settings
+    )
+
+
+# Shared cache instance
+mindmap_cache = LLMCache(
+    path=MINDMAP_CACHE_PATH,
+    ttl=MINDMAP_CACHE_TTL,
+    max_bytes=MINDMAP_CACHE_MAX_BYTES,
+    enabled=MINDMAP_CACHE_ENABLED
+)
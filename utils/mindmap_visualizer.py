@@ -3,8 +3,8 @@ Mind Map Visualization utilities.
 Creates beautiful, interactive mind map visualizations.
 """
 import plotly.graph_objects as go
-import networkx as nx
 import math
+from utils.mindmap import MindMap
 
 
 def create_mindmap_visualization(mindmap_data: dict) -> go.Figure:
@@ -17,27 +17,12 @@ def create_mindmap_visualization(mindmap_data: dict) -> go.Figure:
     Returns:
         Plotly Figure object
     """
-    # Create a directed graph
-    G = nx.DiGraph()
-    
-    # Add nodes
+    # Index the nodes once; orphans and cycles are shown as top-level nodes
     topic = mindmap_data.get("topic", "Mind Map")
-    nodes = mindmap_data.get("nodes", [])
-    
-    # Build node mapping
-    node_map = {}
-    for node in nodes:
-        node_id = node["id"]
-        node_map[node_id] = node
-        G.add_node(node_id, text=node["text"], parent=node["parent"])
-    
-    # Add edges
-    for node in nodes:
-        if node["parent"] != 0:
-            G.add_edge(node["parent"], node["id"])
+    mindmap = MindMap.from_dict(mindmap_data, strict=False)
     
     # Calculate positions using hierarchical layout
-    pos = _hierarchical_layout(G, nodes)
+    pos = _hierarchical_layout(mindmap)
     
     # Define colors for different levels
     colors = [
@@ -48,14 +33,11 @@ def create_mindmap_visualization(mindmap_data: dict) -> go.Figure:
         '#FF6B6B',  # Red - Level 5+
     ]
     
-    # Calculate node levels
-    node_levels = _calculate_node_levels(nodes)
-    
     # Create edge traces
     edge_traces = []
-    for edge in G.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
+    for parent, child in mindmap.edges():
+        x0, y0 = pos[parent]
+        x1, y1 = pos[child]
         
         edge_trace = go.Scatter(
             x=[x0, x1, None],
@@ -69,17 +51,18 @@ def create_mindmap_visualization(mindmap_data: dict) -> go.Figure:
     
     # Create node traces by level
     node_traces = []
-    for level in range(5):
+    for level in range(len(colors)):
         node_x = []
         node_y = []
         node_text = []
         node_hover = []
         
-        for node_id, (x, y) in pos.items():
-            if node_levels.get(node_id, 0) == level:
+        # The last color covers every deeper level
+        for position, (x, y) in enumerate(pos):
+            if min(mindmap.depths[position], len(colors) - 1) == level:
                 node_x.append(x)
                 node_y.append(y)
-                text = node_map[node_id]["text"]
+                text = mindmap.texts[position]
                 node_text.append(text[:30] + "..." if len(text) > 30 else text)
                 node_hover.append(text)
         
@@ -99,7 +82,7 @@ def create_mindmap_visualization(mindmap_data: dict) -> go.Figure:
                     line=dict(width=2, color='white'),
                     symbol='hexagon'
                 ),
-                name=f'Level {level + 1}',
+                name=f'Level {level + 1}+' if level == len(colors) - 1 else f'Level {level + 1}',
                 showlegend=True
             )
             node_traces.append(node_trace)
@@ -132,59 +115,27 @@ def create_mindmap_visualization(mindmap_data: dict) -> go.Figure:
     return fig
 
 
-def _calculate_node_levels(nodes: list) -> dict:
-    """Calculate the level of each node in the hierarchy."""
-    node_levels = {}
-    node_map = {node["id"]: node for node in nodes}
-    
-    def get_level(node_id):
-        if node_id in node_levels:
-            return node_levels[node_id]
-        
-        node = node_map.get(node_id)
-        if not node or node["parent"] == 0:
-            node_levels[node_id] = 0
-            return 0
-        
-        level = get_level(node["parent"]) + 1
-        node_levels[node_id] = level
-        return level
-    
-    for node in nodes:
-        get_level(node["id"])
-    
-    return node_levels
-
-
-def _hierarchical_layout(G: nx.DiGraph, nodes: list) -> dict:
+def _hierarchical_layout(mindmap: MindMap) -> list:
     """
     Create a hierarchical layout for the mind map.
     Positions nodes in a radial/circular pattern around the center.
-    """
-    pos = {}
-    node_levels = _calculate_node_levels(nodes)
     
-    # Group nodes by level
-    levels = {}
-    for node in nodes:
-        level = node_levels[node["id"]]
-        if level not in levels:
-            levels[level] = []
-        levels[level].append(node["id"])
+    Returns:
+        (x, y) for each node position
+    """
+    pos = [(0.0, 0.0)] * len(mindmap)
     
     # Position nodes level by level
-    max_level = max(levels.keys()) if levels else 0
-    
-    for level, node_ids in levels.items():
-        num_nodes = len(node_ids)
+    for level, positions in enumerate(mindmap.levels()):
+        num_nodes = len(positions)
         radius = (level + 1) * 2  # Increase radius for each level
         
         # Distribute nodes evenly in a circle
-        for i, node_id in enumerate(node_ids):
+        for i, position in enumerate(positions):
             angle = 2 * math.pi * i / num_nodes if num_nodes > 1 else 0
             x = radius * math.cos(angle)
             y = radius * math.sin(angle)
-            pos[node_id] = (x, y)
+            pos[position] = (x, y)
     
     return pos
 
@@ -200,37 +151,15 @@ def create_simple_tree_visualization(mindmap_data: dict) -> str:
     Returns:
         HTML string with tree visualization
     """
-    nodes = mindmap_data.get("nodes", [])
-    node_map = {node["id"]: node for node in nodes}
-    
-    # Build tree structure
-    children = {}
-    for node in nodes:
-        parent = node["parent"]
-        if parent not in children:
-            children[parent] = []
-        children[parent].append(node["id"])
+    mindmap = MindMap.from_dict(mindmap_data, strict=False)
     
     # Generate HTML
     html = '<div style="font-family: monospace; color: white;">'
     
-    def render_node(node_id, indent=0):
-        nonlocal html
-        node = node_map.get(node_id)
-        if not node:
-            return
-        
+    # Depth-first from the top-level nodes, without recursion
+    for position, indent in mindmap.walk():
         prefix = "  " * indent + ("└─ " if indent > 0 else "")
-        html += f'<div style="margin-left: {indent * 20}px;">{prefix}{node["text"]}</div>'
-        
-        if node_id in children:
-            for child_id in children[node_id]:
-                render_node(child_id, indent + 1)
-    
-    # Start from root nodes (parent = 0)
-    if 0 in children:
-        for root_id in children[0]:
-            render_node(root_id, 0)
+        html += f'<div style="margin-left: {indent * 20}px;">{prefix}{mindmap.texts[position]}</div>'
     
     html += '</div>'
     return html
@@ -0,0 +1,272 @@
+"""
+Client-side rate limiting for AI providers.
+Each provider gets token buckets for requests/min and tokens/min plus a
+bounded number of concurrent calls. Callers are admitted first come,
+first served, so throughput sits just under the provider's limits
+instead of bursting into 429 errors.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from utils.llm_clients import AI_POOL_MAX_CONNECTIONS
+from utils.retry import remaining_time
+
+
+class RateLimitTimeout(TimeoutError):
+    """Waiting for a rate limit slot would overrun the request deadline."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute.
+    Reservations are granted in call order and may drive the balance
+    negative; each caller then waits until its share has refilled.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take amount tokens and return how long to wait before using them.
+        Not thread-safe; callers hold the limiter's lock.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        """Return unused tokens (e.g. an over-estimated reservation)."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class FairSemaphore:
+    """
+    Counting semaphore that admits waiters strictly in arrival order,
+    shared by threads and coroutines.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self.in_use = 0
+        self._waiters: Deque = deque()
+        # Async waiters handed a slot whose wake-up has not run yet
+        self._granted = set()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a slot is free; False if timeout expires first."""
+        with self._lock:
+            if self.in_use < self.value and not self._waiters:
+                self.in_use += 1
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            if event.is_set():
+                # Handed a slot just as the wait timed out
+                return True
+            self._waiters.remove(event)
+            return False
+
+    async def aacquire(self):
+        """Wait on the event loop until a slot is free."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_use < self.value and not self._waiters:
+                self.in_use += 1
+                return
+            future = loop.create_future()
+            self._waiters.append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    raise
+                # Handed over, whether or not the wake-up already ran
+                granted = future in self._granted or (future.done() and not future.cancelled())
+                self._granted.discard(future)
+            if granted:
+                # The slot was handed over as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        """Free a slot, handing it directly to the longest waiter."""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                if not waiter.done():
+                    self._granted.add(waiter)
+                    waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+                    return
+            self.in_use -= 1
+
+    def _wake(self, future: asyncio.Future):
+        # A waiter cancelled after the hand-off releases the slot itself
+        if not future.cancelled():
+            with self._lock:
+                self._granted.discard(future)
+            future.set_result(None)
+
+
+class ProviderLimiter:
+    """
+    Requests/min, tokens/min and concurrency limits for one provider.
+    A limit of 0 disables that check.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_concurrency: int = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.slots = FairSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self.calls = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, tokens: int) -> Iterator["ProviderLimiter"]:
+        """
+        Hold a concurrency slot and rate budget for one call.
+
+        Args:
+            tokens: Estimated tokens the call will use (prompt + output)
+
+        Raises:
+            RateLimitTimeout: If the wait would exceed the current deadline
+        """
+        started = time.monotonic()
+        if self.slots is not None and not self.slots.acquire(remaining_time()):
+            raise RateLimitTimeout("Timed out waiting for a provider concurrency slot")
+        try:
+            delay = self._reserve(tokens)
+            if delay:
+                time.sleep(delay)
+            self._record_wait(time.monotonic() - started)
+            yield self
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+    @asynccontextmanager
+    async def aacquire(self, tokens: int) -> AsyncIterator["ProviderLimiter"]:
+        """Async counterpart of acquire()."""
+        started = time.monotonic()
+        if self.slots is not None:
+            try:
+                await asyncio.wait_for(self.slots.aacquire(), remaining_time())
+            except asyncio.TimeoutError:
+                raise RateLimitTimeout("Timed out waiting for a provider concurrency slot")
+        try:
+            delay = self._reserve(tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            self._record_wait(time.monotonic() - started)
+            yield self
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+    def settle(self, reserved: int, used: int):
+        """Refund tokens reserved for a call but not used by it."""
+        if self.tokens is not None and used < reserved:
+            with self._lock:
+                self.tokens.refund(reserved - used)
+
+    def stats(self) -> Dict[str, float]:
+        """Get counters and current queue state."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "in_flight": self.slots.in_use if self.slots else None,
+                "queued": self.slots.waiting if self.slots else 0,
+            }
+
+    def _reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            delay = 0.0
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(tokens, now))
+            remaining = remaining_time()
+            if remaining is not None and delay > remaining:
+                if self.requests is not None:
+                    self.requests.refund(1)
+                if self.tokens is not None:
+                    self.tokens.refund(tokens)
+                raise RateLimitTimeout(f"Rate limit wait of {delay:.1f}s exceeds the request deadline")
+            return delay
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self.calls += 1
+            self.wait_seconds += waited
+            if waited >= 0.001:
+                self.throttled += 1
+
+
+class RateLimiters:
+    """
+    Per-provider limiters configured from <PROVIDER>_RPM, <PROVIDER>_TPM
+    and <PROVIDER>_MAX_CONCURRENCY (e.g. GROQ_RPM=30).
+    """
+
+    def __init__(self):
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderLimiter:
+        """Get the limiter for a provider, reading its limits on first use."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            prefix = provider.upper()
+            limiter = ProviderLimiter(
+                requests_per_minute=float(os.getenv(f"{prefix}_RPM", "0")),
+                tokens_per_minute=float(os.getenv(f"{prefix}_TPM", "0")),
+                max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(AI_POOL_MAX_CONNECTIONS))),
+            )
+            with self._lock:
+                limiter = self._limiters.setdefault(provider, limiter)
+        return limiter
+
+    def reset(self):
+        """Forget limiters so limits are re-read from the environment."""
+        with self._lock:
+            self._limiters.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get stats for every provider used so far."""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {provider: limiter.stats() for provider, limiter in sorted(limiters.items())}
+
+
+# Shared limiters used by utils.ai_helper
+rate_limits = RateLimiters()
@@ -0,0 +1,229 @@
+"""
+Retry policy for AI calls.
+Bounds each attempt and the whole request with deadlines, backs off
+exponentially with jitter (honoring provider Retry-After hints) and
+gives up immediately on errors a retry cannot fix.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import email.utils
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# Overall time budget for one retried AI operation, across all attempts
+AI_RETRY_DEADLINE = float(os.getenv("AI_RETRY_DEADLINE", "120"))
+
+# Backoff before retry n is drawn from [d/2, d] with d = base * 2**n, capped
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "8"))
+
+# HTTP statuses worth retrying; every other 4xx is fatal
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429})
+
+# Absolute time.monotonic() by which the current AI call must finish
+_deadline = contextvars.ContextVar("ai_deadline", default=None)
+
+
+class ConfigurationError(ValueError):
+    """Setup problem (missing API key, unknown provider) that no retry can fix."""
+
+
+class InvalidResponseError(ValueError):
+    """The AI answered, but not in the expected format."""
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Seconds left before the current deadline.
+
+    Returns:
+        Remaining seconds (never negative), or None when no deadline is set
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Set a deadline for AI calls inside the block.
+    An enclosing, earlier deadline always wins.
+
+    Args:
+        seconds: Time budget from now, or None to keep the current deadline
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        if current is not None:
+            deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _exception_chain(error: BaseException) -> Iterator[BaseException]:
+    """Yield an exception and the causes it was raised from."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Read a provider's Retry-After hint from an exception chain.
+
+    Args:
+        error: Exception raised by an AI call
+
+    Returns:
+        Seconds to wait, or None when the provider gave no hint
+    """
+    for cause in _exception_chain(error):
+        headers = getattr(getattr(cause, "response", None), "headers", None)
+        if not headers:
+            continue
+        value = headers.get("retry-after-ms")
+        if value:
+            try:
+                return max(0.0, float(value) / 1000)
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                parsed = email.utils.parsedate_to_datetime(value)
+                if parsed is not None:
+                    return max(0.0, parsed.timestamp() - time.time())
+    return None
+
+
+class RetryPolicy:
+    """
+    How an AI operation is retried.
+
+    Args:
+        max_retries: Retries after the first attempt
+        attempt_timeout: Seconds allowed per attempt (None = no limit)
+        deadline: Seconds allowed for all attempts and waits (None = no limit)
+        base_delay: Backoff before the first retry
+        max_delay: Cap on any single backoff
+        retry_invalid_output: Retry when the AI answers in the wrong format
+                              (useful when sampling makes answers vary)
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 1,
+        attempt_timeout: Optional[float] = 60,
+        deadline: Optional[float] = AI_RETRY_DEADLINE,
+        base_delay: float = AI_RETRY_BASE_DELAY,
+        max_delay: float = AI_RETRY_MAX_DELAY,
+        retry_invalid_output: bool = True
+    ):
+        self.max_retries = max_retries
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_invalid_output = retry_invalid_output
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """
+        Classify an error as transient (retry) or fatal (give up now).
+
+        Args:
+            error: Exception raised by an attempt
+
+        Returns:
+            True if another attempt could succeed
+        """
+        for cause in _exception_chain(error):
+            if isinstance(cause, (ConfigurationError, ImportError)):
+                return False
+            if isinstance(cause, InvalidResponseError):
+                return self.retry_invalid_output
+            status = _status_code(cause)
+            if status is not None:
+                return status >= 500 or status in RETRYABLE_STATUS_CODES
+            if isinstance(cause, (TimeoutError, asyncio.TimeoutError, concurrent.futures.TimeoutError, ConnectionError)):
+                return True
+        # Input validation errors are deterministic
+        if isinstance(error, ValueError):
+            return False
+        # Unknown failures (network, SDK internals) are assumed transient
+        return True
+
+    def backoff(self, retry: int, error: Optional[BaseException] = None) -> float:
+        """
+        Seconds to wait before a retry.
+
+        Args:
+            retry: 0 for the first retry, 1 for the second, ...
+            error: The failure being retried, checked for Retry-After
+
+        Returns:
+            Jittered exponential delay, or the provider's Retry-After if longer
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** retry))
+        delay = random.uniform(delay / 2, delay)
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            delay = max(delay, hint)
+        return delay
+
+    def time_left(self, started: float) -> Optional[float]:
+        """
+        Seconds left in the overall budget (this policy's deadline and any
+        enclosing deadline_scope).
+
+        Args:
+            started: time.monotonic() at the first attempt
+
+        Returns:
+            Remaining seconds (never negative), or None when unbounded
+        """
+        budgets = []
+        if self.deadline is not None:
+            budgets.append(self.deadline - (time.monotonic() - started))
+        outer = remaining_time()
+        if outer is not None:
+            budgets.append(outer)
+        return max(0.0, min(budgets)) if budgets else None
+
+    def attempt_budget(self, started: float) -> Optional[float]:
+        """
+        Seconds the next attempt may take: the per-attempt timeout clipped
+        to the time left overall.
+
+        Args:
+            started: time.monotonic() at the first attempt
+
+        Returns:
+            Attempt time limit, or None when unbounded
+        """
+        left = self.time_left(started)
+        if self.attempt_timeout is None:
+            return left
+        return self.attempt_timeout if left is None else min(self.attempt_timeout, left)
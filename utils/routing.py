@@ -0,0 +1,355 @@
+"""
+Latency-aware routing across AI providers.
+Sends each request to a primary provider and, when it is slower than its
+recent latency percentile, hedges to the next provider and keeps whichever
+answers first. Providers whose error rate spikes are skipped for a cooldown.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+
+# Hedge after the primary exceeds this percentile of its recent latencies
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+
+# Hedge delay bounds, and the delay used until enough latencies are recorded (seconds)
+AI_HEDGE_MIN_DELAY = float(os.getenv("AI_HEDGE_MIN_DELAY", "1"))
+AI_HEDGE_DEFAULT_DELAY = float(os.getenv("AI_HEDGE_DEFAULT_DELAY", "10"))
+
+# Skip a provider for AI_FAILOVER_COOLDOWN seconds once this fraction of its
+# recent calls failed (with at least AI_FAILOVER_MIN_SAMPLES calls recorded)
+AI_FAILOVER_ERROR_RATE = float(os.getenv("AI_FAILOVER_ERROR_RATE", "0.5"))
+AI_FAILOVER_MIN_SAMPLES = int(os.getenv("AI_FAILOVER_MIN_SAMPLES", "5"))
+AI_FAILOVER_COOLDOWN = float(os.getenv("AI_FAILOVER_COOLDOWN", "30"))
+
+# Recent calls remembered per provider
+LATENCY_WINDOW = 100
+
+# Latency samples needed before the percentile replaces the default delay
+MIN_LATENCY_SAMPLES = 10
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call outcomes per provider.
+    Latencies are kept for successful calls only.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._outcomes: Dict[str, Deque[bool]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, latency: float, ok: bool):
+        """
+        Record one finished call.
+
+        Args:
+            provider: Provider name
+            latency: Seconds the call took
+            ok: Whether it succeeded
+        """
+        with self._lock:
+            outcomes = self._outcomes.setdefault(provider, deque(maxlen=self.window))
+            outcomes.append(ok)
+            if ok:
+                self._latencies.setdefault(provider, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, provider: str, percent: float) -> Optional[float]:
+        """
+        Get a latency percentile (nearest rank) over recent successful calls.
+
+        Returns:
+            Seconds, or None if fewer than MIN_LATENCY_SAMPLES are recorded
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(provider, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        rank = max(1, math.ceil(percent / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def error_rate(self, provider: str) -> Tuple[float, int]:
+        """
+        Get the failure fraction over recent calls.
+
+        Returns:
+            (error_rate, number_of_calls)
+        """
+        with self._lock:
+            outcomes = list(self._outcomes.get(provider, ()))
+        if not outcomes:
+            return 0.0, 0
+        return outcomes.count(False) / len(outcomes), len(outcomes)
+
+    def providers(self) -> List[str]:
+        """Providers with recorded calls."""
+        with self._lock:
+            return sorted(self._outcomes)
+
+    def reset(self, provider: Optional[str] = None):
+        """Forget one provider's history, or everyone's."""
+        with self._lock:
+            if provider is None:
+                self._latencies.clear()
+                self._outcomes.clear()
+            else:
+                self._latencies.pop(provider, None)
+                self._outcomes.pop(provider, None)
+
+
+class HedgedRouter:
+    """
+    Route a call across an ordered list of providers.
+
+    The first healthy provider gets the request. If it has not answered
+    within its hedge delay, the next provider is called too and the first
+    successful answer wins; the other call is cancelled (async) or its
+    result discarded (threads). A failed call immediately falls over to
+    the next provider.
+    """
+
+    def __init__(
+        self,
+        tracker: Optional[LatencyTracker] = None,
+        hedge_percentile: float = AI_HEDGE_PERCENTILE,
+        min_delay: float = AI_HEDGE_MIN_DELAY,
+        default_delay: float = AI_HEDGE_DEFAULT_DELAY,
+        error_rate: float = AI_FAILOVER_ERROR_RATE,
+        min_samples: int = AI_FAILOVER_MIN_SAMPLES,
+        cooldown: float = AI_FAILOVER_COOLDOWN,
+        max_workers: int = 32
+    ):
+        self.tracker = tracker or LatencyTracker()
+        self.hedge_percentile = hedge_percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.error_rate = error_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.max_workers = max_workers
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._tripped: Dict[str, float] = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait on a provider before hedging."""
+        latency = self.tracker.percentile(provider, self.hedge_percentile)
+        if latency is None:
+            return self.default_delay
+        return max(self.min_delay, latency)
+
+    def is_healthy(self, provider: str) -> bool:
+        """
+        Check a provider's circuit. A provider whose error rate reached the
+        threshold is skipped until its cooldown ends, then gets a fresh window.
+        """
+        now = time.monotonic()
+        with self._lock:
+            until = self._tripped.get(provider)
+            if until is not None:
+                if now < until:
+                    return False
+                del self._tripped[provider]
+                self.tracker.reset(provider)
+                return True
+
+            rate, count = self.tracker.error_rate(provider)
+            if count >= self.min_samples and rate >= self.error_rate:
+                self._tripped[provider] = now + self.cooldown
+                return False
+            return True
+
+    def order(self, providers: Sequence[str]) -> List[str]:
+        """Healthy providers first, keeping their configured order."""
+        healthy = [provider for provider in providers if self.is_healthy(provider)]
+        return healthy + [provider for provider in providers if provider not in healthy]
+
+    def call(self, func: Callable[[str, Any], Any], request: Any, providers: Sequence[str]) -> Any:
+        """
+        Run func(provider, request) with hedging and failover.
+
+        Args:
+            func: Sends a request to one provider and returns its answer
+            request: Request passed to func (e.g. the prompt)
+            providers: Providers in preference order
+
+        Returns:
+            The first successful answer
+
+        Raises:
+            Exception: The last provider error when every provider failed
+        """
+        order = self.order(providers)
+        if len(order) == 1:
+            return self._timed(func, order[0], request)
+
+        executor = self._get_executor()
+        pending: Dict[Future, str] = {}
+        queue = list(order)
+        last_error = None
+
+        def launch(hedge: bool):
+            provider = queue.pop(0)
+            if hedge:
+                with self._lock:
+                    self.hedges += 1
+            # Each call inherits the caller's deadline and cache settings
+            future = executor.submit(contextvars.copy_context().run, self._timed, func, provider, request)
+            pending[future] = provider
+
+        launch(hedge=False)
+        try:
+            while pending:
+                timeout = self.hedge_delay(order[0]) if queue else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    launch(hedge=True)
+                    continue
+                for future in done:
+                    provider = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    self._count_win(provider, order[0])
+                    return result
+                # Every finished call failed: fall over to the next provider
+                if queue and not pending:
+                    with self._lock:
+                        self.failovers += 1
+                    launch(hedge=False)
+        finally:
+            for future in pending:
+                future.cancel()
+
+        raise last_error
+
+    async def acall(self, func: Callable[[str, Any], Awaitable[Any]], request: Any, providers: Sequence[str]) -> Any:
+        """
+        Async counterpart of call(); the losing call is cancelled.
+
+        Args:
+            func: Coroutine function sending a request to one provider
+            request: Request passed to func (e.g. the prompt)
+            providers: Providers in preference order
+
+        Returns:
+            The first successful answer
+
+        Raises:
+            Exception: The last provider error when every provider failed
+        """
+        order = self.order(providers)
+        if len(order) == 1:
+            return await self._atimed(func, order[0], request)
+
+        pending: Dict[asyncio.Task, str] = {}
+        queue = list(order)
+        last_error = None
+
+        def launch(hedge: bool):
+            provider = queue.pop(0)
+            if hedge:
+                with self._lock:
+                    self.hedges += 1
+            pending[asyncio.ensure_future(self._atimed(func, provider, request))] = provider
+
+        launch(hedge=False)
+        try:
+            while pending:
+                timeout = self.hedge_delay(order[0]) if queue else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(hedge=True)
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    self._count_win(provider, order[0])
+                    return result
+                if queue and not pending:
+                    with self._lock:
+                        self.failovers += 1
+                    launch(hedge=False)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get routing counters and per-provider health.
+
+        Returns:
+            Dictionary with hedges, hedge_wins, failovers and, per provider,
+            p50/p95 latency, error rate, call count and circuit state
+        """
+        providers = {}
+        for provider in self.tracker.providers():
+            rate, count = self.tracker.error_rate(provider)
+            providers[provider] = {
+                "p50": self.tracker.percentile(provider, 50),
+                "p95": self.tracker.percentile(provider, 95),
+                "error_rate": round(rate, 3),
+                "calls": count,
+                "tripped": provider in self._tripped,
+            }
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "failovers": self.failovers,
+                "providers": providers,
+            }
+
+    def _count_win(self, provider: str, primary: str):
+        if provider != primary:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def _timed(self, func: Callable, provider: str, request: Any) -> Any:
+        started = time.monotonic()
+        try:
+            result = func(provider, request)
+        except Exception:
+            self.tracker.record(provider, time.monotonic() - started, ok=False)
+            raise
+        self.tracker.record(provider, time.monotonic() - started, ok=True)
+        return result
+
+    async def _atimed(self, func: Callable, provider: str, request: Any) -> Any:
+        started = time.monotonic()
+        try:
+            result = await func(provider, request)
+        except asyncio.CancelledError:
+            # A cancelled hedge says nothing about the provider's health
+            raise
+        except Exception:
+            self.tracker.record(provider, time.monotonic() - started, ok=False)
+            raise
+        self.tracker.record(provider, time.monotonic() - started, ok=True)
+        return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ai_router")
+        return self._executor
@@ -0,0 +1,134 @@
+"""
+Request coalescing for identical in-flight calls.
+While a call for a key is running, later callers with the same key wait
+for it and share its result instead of starting their own.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    """One in-flight synchronous call and its outcome."""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+    Works for threads (do) and for coroutines on an event loop (ado);
+    the two paths are tracked separately.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self._calls: Dict[str, _Call] = {}
+        # Futures are bound to one event loop
+        self._async_calls = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run func once for all threads calling with the same key concurrently.
+
+        Args:
+            key: Identity of the call (e.g. a hash of the request)
+            func: Zero-argument callable doing the work
+
+        Returns:
+            func's result, shared by every waiter
+
+        Raises:
+            Exception: func's exception, re-raised in every waiter
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.collapsed += 1
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def ado(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await func() once for all coroutines calling with the same key concurrently.
+        A waiter being cancelled does not cancel the shared call.
+
+        Args:
+            key: Identity of the call (e.g. a hash of the request)
+            func: Zero-argument coroutine function doing the work
+
+        Returns:
+            func's result, shared by every waiter
+
+        Raises:
+            Exception: func's exception, re-raised in every waiter
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.calls += 1
+            calls = self._async_calls.setdefault(loop, {})
+            future = calls.get(key)
+            if future is None:
+                future = calls[key] = loop.create_task(self._run(calls, key, func))
+                self.executions += 1
+            else:
+                self.collapsed += 1
+        return await asyncio.shield(future)
+
+    async def _run(self, calls: Dict[str, asyncio.Task], key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await func()
+        finally:
+            with self._lock:
+                calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters.
+
+        Returns:
+            Dictionary with calls (requested), executions (actually run),
+            collapsed (served by another caller's execution) and in_flight
+        """
+        with self._lock:
+            in_flight = len(self._calls) + sum(len(calls) for calls in self._async_calls.values())
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": in_flight,
+            }
+
+    def reset_stats(self):
+        """Zero the counters."""
+        with self._lock:
+            self.calls = 0
+            self.executions = 0
+            self.collapsed = 0
@@ -0,0 +1,426 @@
+"""
+Deterministic local stand-in for an AI provider.
+Answers the app's prompts (topics, topic filtering, mind maps and node
+expansion) with schema-valid output derived from the prompt text, with
+configurable latency, error rate and response size. Use it in-process
+with AI_PROVIDER=stub, or run it as an OpenAI-compatible HTTP server:
+
+    python -m utils.stub_provider --port 8787
+    AI_PROVIDER=openai OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8787/v1
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from utils.keyphrases import extract_keyphrases
+
+
+# Median latency per call, and its distribution: fixed, uniform, exponential or lognormal
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+STUB_LATENCY_DIST = os.getenv("STUB_LATENCY_DIST", "lognormal")
+
+# Spread: +/- fraction for uniform, sigma for lognormal
+STUB_LATENCY_SPREAD = float(os.getenv("STUB_LATENCY_SPREAD", "0.5"))
+
+# Fraction of calls that fail, and the HTTP status they fail with (429 adds Retry-After)
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_ERROR_STATUS = int(os.getenv("STUB_ERROR_STATUS", "503"))
+
+# Response size: topics returned, mind map nodes, and minimum characters per node
+STUB_TOPICS = int(os.getenv("STUB_TOPICS", "10"))
+STUB_NODES = int(os.getenv("STUB_NODES", "12"))
+STUB_NODE_CHARS = int(os.getenv("STUB_NODE_CHARS", "0"))
+
+# Characters per streamed chunk; a stream spreads the call's latency evenly over its chunks
+STUB_STREAM_CHUNK_CHARS = int(os.getenv("STUB_STREAM_CHUNK_CHARS", "16"))
+
+# Seed for latency and error draws; content depends only on the prompt
+STUB_SEED = int(os.getenv("STUB_SEED", "0"))
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"\w+")
+_TOPIC_RE = re.compile(r'related to the topic: "(.*?)"\.')
+
+
+class StubProviderError(Exception):
+    """Injected provider failure carrying an HTTP-style status and headers."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Stub provider error {status_code}")
+        self.status_code = status_code
+        self.response = _StubResponse(status_code)
+
+
+class _StubResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {"retry-after": "1"} if status_code == 429 else {}
+
+
+def _section(prompt: str, start: str, end: Optional[str] = None) -> str:
+    """Text between a start marker and an optional end marker."""
+    index = prompt.find(start)
+    if index == -1:
+        return prompt
+    text = prompt[index + len(start):]
+    if end:
+        stop = text.rfind(end)
+        if stop != -1:
+            text = text[:stop]
+    return text.strip()
+
+
+class StubProvider:
+    """
+    In-process fake provider. Responses depend only on the prompt, so
+    they are reproducible; latency and failures are drawn from a seeded
+    random sequence, so a run with the same call order is reproducible too.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = STUB_LATENCY_MS,
+        latency_dist: str = STUB_LATENCY_DIST,
+        latency_spread: float = STUB_LATENCY_SPREAD,
+        error_rate: float = STUB_ERROR_RATE,
+        error_status: int = STUB_ERROR_STATUS,
+        topics: int = STUB_TOPICS,
+        nodes: int = STUB_NODES,
+        node_chars: int = STUB_NODE_CHARS,
+        chunk_chars: int = STUB_STREAM_CHUNK_CHARS,
+        seed: int = STUB_SEED
+    ):
+        if latency_dist not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown stub latency distribution: {latency_dist}")
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.topics = topics
+        self.nodes = nodes
+        self.node_chars = node_chars
+        self.chunk_chars = max(1, chunk_chars)
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def complete(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Answer a prompt after the configured latency.
+
+        Args:
+            prompt: Prompt built by one of the blocks
+            json_mode: Whether a JSON object was requested
+
+        Returns:
+            Response text
+
+        Raises:
+            StubProviderError: For injected failures
+        """
+        latency, fail = self._draw()
+        if latency:
+            time.sleep(latency)
+        if fail:
+            raise StubProviderError(self.error_status)
+        return self.respond(prompt, json_mode)
+
+    async def acomplete(self, prompt: str, json_mode: bool = False) -> str:
+        """Async counterpart of complete()."""
+        latency, fail = self._draw()
+        if latency:
+            await asyncio.sleep(latency)
+        if fail:
+            raise StubProviderError(self.error_status)
+        return self.respond(prompt, json_mode)
+
+    def stream(self, prompt: str, json_mode: bool = False) -> Iterator[str]:
+        """
+        Answer a prompt in chunks, spreading the configured latency over them.
+
+        Raises:
+            StubProviderError: For injected failures, before the first chunk
+        """
+        latency, fail = self._draw()
+        if fail:
+            raise StubProviderError(self.error_status)
+        chunks = self._chunks(self.respond(prompt, json_mode))
+        for chunk in chunks:
+            if latency:
+                time.sleep(latency / len(chunks))
+            yield chunk
+
+    async def astream(self, prompt: str, json_mode: bool = False) -> AsyncIterator[str]:
+        """Async counterpart of stream()."""
+        latency, fail = self._draw()
+        if fail:
+            raise StubProviderError(self.error_status)
+        chunks = self._chunks(self.respond(prompt, json_mode))
+        for chunk in chunks:
+            if latency:
+                await asyncio.sleep(latency / len(chunks))
+            yield chunk
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+
+    def respond(self, prompt: str, json_mode: bool = False) -> str:
+        """Build the response for a prompt, without latency or failures."""
+        if "Extract the main topics" in prompt:
+            topics = self._topics(_section(prompt, "Text to analyze:", "Return only"))
+            return json.dumps({"topics": topics} if json_mode or "JSON object" in prompt else topics)
+        if "Create a mind map" in prompt:
+            return json.dumps(self._mindmap(_section(prompt, "Text to analyze:", "Return only")))
+        if "Expand one node of a mind map" in prompt:
+            return json.dumps({"nodes": self._mindmap(_section(prompt, "Text to analyze:", "Return only"))["nodes"]})
+        if "extract ONLY the content related to the topic" in prompt:
+            return self._filter(prompt)
+        if json_mode:
+            return json.dumps({"response": self._digest(prompt)})
+        return f"Stub response {self._digest(prompt)}"
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+            median = self.latency_ms / 1000
+            if median <= 0 or self.latency_dist == "fixed":
+                return max(0.0, median), fail
+            if self.latency_dist == "uniform":
+                spread = median * self.latency_spread
+                return max(0.0, self._random.uniform(median - spread, median + spread)), fail
+            if self.latency_dist == "exponential":
+                # Exponential with the given median
+                return self._random.expovariate(math.log(2) / median), fail
+            return self._random.lognormvariate(math.log(median), self.latency_spread), fail
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+    def _topics(self, text: str) -> List[str]:
+        topics = extract_keyphrases(text, limit=self.topics)
+        seen = {topic.lower() for topic in topics}
+        for index in range(1, self.topics + 1):
+            if len(topics) >= self.topics:
+                break
+            filler = f"Section {index}"
+            if filler.lower() not in seen:
+                topics.append(filler)
+        return topics[:self.topics]
+
+    def _mindmap(self, text: str) -> Dict[str, object]:
+        phrases = extract_keyphrases(text, limit=self.nodes + 1)
+        topic = phrases[0] if phrases else "Document"
+        labels = phrases[1:]
+        sentences = [sentence.strip() for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+
+        nodes = []
+        for node_id in range(1, max(1, self.nodes) + 1):
+            # Three top-level branches, then two children per node: four levels by 12 nodes
+            parent = 0 if node_id <= 3 else (node_id - 4) // 2 + 1
+            if node_id - 1 < len(labels):
+                label = labels[node_id - 1]
+            elif sentences:
+                label = sentences[(node_id - 1) % len(sentences)][:80]
+            else:
+                label = f"Point {node_id}"
+            if len(label) < self.node_chars:
+                label = (label + " - " + " ".join(sentences or [topic]))[:self.node_chars]
+            nodes.append({"id": node_id, "parent": parent, "text": label})
+        return {"topic": topic, "nodes": nodes}
+
+    def _filter(self, prompt: str) -> str:
+        match = _TOPIC_RE.search(prompt)
+        topic = match.group(1) if match else ""
+        chunk_reply = "reply with exactly:" in prompt
+        text = _section(prompt, "Text:", "If the text contains nothing" if chunk_reply else None)
+
+        words = {word.lower() for word in _WORD_RE.findall(topic) if len(word) > 2}
+        sentences = [sentence.strip() for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+        keep = set()
+        for index, sentence in enumerate(sentences):
+            if words & {word.lower() for word in _WORD_RE.findall(sentence)}:
+                # Keep the matching sentence and the one after it for context
+                keep.update((index, index + 1))
+        selected = [sentences[index] for index in sorted(keep) if index < len(sentences)]
+        if not selected:
+            return "NONE" if chunk_reply else ""
+        return " ".join(selected)
+
+
+def _prompt_and_mode(body: dict):
+    messages = body.get("messages") or []
+    prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    return prompt, json_mode
+
+
+def _usage(prompt: str, content: str) -> dict:
+    prompt_tokens = len(prompt) // 4 + 1
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def chat_completion_chunks(stub: StubProvider, body: dict) -> Iterator[dict]:
+    """
+    Answer a streaming OpenAI chat completions request as chunk objects.
+
+    Raises:
+        StubProviderError: For injected failures, before the first chunk
+    """
+    prompt, json_mode = _prompt_and_mode(body)
+    stream = stub.stream(prompt, json_mode)
+    base = {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "stub-1"),
+    }
+
+    content = []
+    for chunk in stream:
+        delta = {"content": chunk}
+        if not content:
+            delta["role"] = "assistant"
+        content.append(chunk)
+        yield {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield {**base, "choices": [], "usage": _usage(prompt, "".join(content))}
+
+
+def _chain(first: dict, rest: Iterator[dict]) -> Iterator[dict]:
+    yield first
+    yield from rest
+
+
+def chat_completion(stub: StubProvider, body: dict) -> dict:
+    """
+    Answer an OpenAI chat completions request body.
+
+    Raises:
+        StubProviderError: For injected failures
+    """
+    prompt, json_mode = _prompt_and_mode(body)
+    content = stub.complete(prompt, json_mode)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub-1"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(prompt, content),
+    }
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8787, stub: Optional[StubProvider] = None) -> ThreadingHTTPServer:
+    """
+    Build an HTTP server speaking the OpenAI chat completions format.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        stub: Provider answering requests (default: configured from STUB_* variables)
+
+    Returns:
+        Server; call serve_forever() to run it
+    """
+    stub = stub or StubProvider()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+                return
+            try:
+                if body.get("stream"):
+                    self._send_stream(chat_completion_chunks(stub, body))
+                else:
+                    self._send(200, chat_completion(stub, body))
+            except StubProviderError as e:
+                self._send(e.status_code, {"error": {"message": str(e), "type": "server_error"}}, e.response.headers)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send(200, {"object": "list", "data": [{"id": "stub-1", "object": "model", "owned_by": "stub"}]})
+            else:
+                self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, chunks: Iterator[dict]):
+            first = next(chunks)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in _chain(first, chunks):
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+# Shared instance used by utils.ai_helper when AI_PROVIDER=stub
+stub_provider = StubProvider()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stub AI provider as an OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"Stub provider listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,215 @@
+"""
+Persistent cache for extracted PDF text.
+Entries are keyed by the SHA-256 of the PDF bytes plus the extractor version,
+so a document is parsed once no matter how often it is uploaded.
+"""
+import json
+import os
+import threading
+import uuid
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from utils.file_manager import TEMP_DIR
+
+
+# Cache directory (inside the temp directory by default)
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", os.path.join(TEMP_DIR, "text_cache"))
+
+# Maximum total size of cached text before LRU eviction (512MB)
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Set to "0" to disable the cache entirely
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "1") != "0"
+
+ENTRY_SUFFIX = ".pages.jsonl"
+INDEX_SUFFIX = ".index.json"
+CACHE_SUFFIXES = (ENTRY_SUFFIX, INDEX_SUFFIX)
+
+
+class TextCache:
+    """
+    On-disk store of per-page text, one JSON-lines file per document,
+    plus JSON search indexes derived from that text.
+    File modification time doubles as the LRU recency stamp.
+    """
+
+    def __init__(self, cache_dir: str = TEXT_CACHE_DIR, max_bytes: int = TEXT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, digest: str, version: str) -> str:
+        """Build a cache key from a document digest and extractor version."""
+        return f"{digest}-v{version}"
+
+    def path_for(self, key: str) -> str:
+        """Return the file path for a cache key."""
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def contains(self, key: str) -> bool:
+        """Check whether a key is cached, without touching counters."""
+        return os.path.exists(self.path_for(key))
+
+    def iter_pages(self, key: str) -> Optional[Iterator[Tuple[int, str]]]:
+        """
+        Look up a document and stream its cached pages.
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            Iterator of (page_number, text), or None on a miss
+        """
+        path = self.path_for(key)
+        try:
+            handle = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        try:
+            # Mark as most recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return self._read_pages(handle)
+
+    def write_pages(self, key: str, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """
+        Pass pages through while writing them to the cache.
+        The entry is only committed if the iterator is fully consumed,
+        so a partially read document is never cached.
+
+        Args:
+            key: Cache key from make_key()
+            pages: Iterator of (page_number, text)
+
+        Yields:
+            The same (page_number, text) tuples
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex[:8]}.tmp")
+        committed = False
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for page_number, text in pages:
+                    f.write(json.dumps(text) + "\n")
+                    yield page_number, text
+            os.replace(tmp_path, self.path_for(key))
+            committed = True
+        finally:
+            if not committed and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        self.evict()
+
+    def get_index(self, key: str) -> Optional[dict]:
+        """
+        Load a persisted search index.
+
+        Args:
+            key: Index key (e.g. a hash of the indexed text)
+
+        Returns:
+            The stored index data, or None if absent or unreadable
+        """
+        path = os.path.join(self.cache_dir, key + INDEX_SUFFIX)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put_index(self, key: str, data: dict):
+        """
+        Persist a search index atomically, then enforce the size limit.
+
+        Args:
+            key: Index key
+            data: JSON-serializable index data
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, os.path.join(self.cache_dir, key + INDEX_SUFFIX))
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        try:
+            entries = []
+            for filename in os.listdir(self.cache_dir):
+                if not filename.endswith(CACHE_SUFFIXES):
+                    continue
+                path = os.path.join(self.cache_dir, filename)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except FileNotFoundError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every cached entry and index and reset counters."""
+        if os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(CACHE_SUFFIXES):
+                    os.unlink(os.path.join(self.cache_dir, filename))
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters and current size.
+
+        Returns:
+            Dictionary with hits, misses, entries and bytes
+        """
+        entries = 0
+        total = 0
+        if os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(ENTRY_SUFFIX):
+                    entries += 1
+                    total += os.path.getsize(os.path.join(self.cache_dir, filename))
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _read_pages(handle) -> Iterator[Tuple[int, str]]:
+        with handle:
+            for index, line in enumerate(handle):
+                yield index + 1, json.loads(line)
+
+
+# Shared cache instance
+text_cache = TextCache()
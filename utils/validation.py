@@ -1,8 +1,11 @@
 """
 Input validation utilities for PDF Mind Map Generator.
 """
+import json
 import os
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from blocks.generate_mindmap import check_node
+from utils.mindmap import MindMap
 
 
 # Maximum file size: 80MB
@@ -11,6 +14,12 @@ MAX_FILE_SIZE = 80 * 1024 * 1024
 # Maximum topic length
 MAX_TOPIC_LENGTH = 200
 
+# Maximum mind map levels generated in one request
+MAX_MINDMAP_LEVELS = 6
+
+# Maximum topics in one batch request
+MAX_BATCH_TOPICS = 10
+
 
 def validate_pdf_file(file_path: str) -> Tuple[bool, str]:
     """
@@ -64,6 +73,38 @@ def validate_topic(topic: str) -> Tuple[bool, str, str]:
     return True, processed_topic, ""
 
 
+def validate_topics(topics: List[str]) -> Tuple[bool, List[str], str]:
+    """
+    Validate and process the topics of a batch request.
+    
+    Args:
+        topics: Topic strings to validate
+        
+    Returns:
+        Tuple of (is_valid, processed_topics, error_message); topics that
+        differ only in case or whitespace are kept once, in request order
+    """
+    processed_topics = []
+    seen = set()
+    for topic in topics:
+        is_valid, processed_topic, error_message = validate_topic(topic)
+        if not is_valid:
+            return False, [], error_message
+        
+        key = " ".join(processed_topic.lower().split())
+        if key not in seen:
+            seen.add(key)
+            processed_topics.append(processed_topic)
+    
+    if not processed_topics:
+        return False, [], "At least one topic is required"
+    
+    if len(processed_topics) > MAX_BATCH_TOPICS:
+        return False, [], f"At most {MAX_BATCH_TOPICS} topics can be requested at once"
+    
+    return True, processed_topics, ""
+
+
 def validate_file_upload(file_path: str, file_size: int) -> Tuple[bool, str]:
     """
     Validate file upload parameters.
@@ -88,3 +129,58 @@ def validate_file_upload(file_path: str, file_size: int) -> Tuple[bool, str]:
         return False, "File type not supported. Please upload a PDF file."
     
     return True, ""
+
+
+def validate_levels(levels: Optional[int]) -> Tuple[bool, str]:
+    """
+    Validate a requested number of mind map levels.
+    
+    Args:
+        levels: Levels to generate, or None for the default
+        
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if levels is None:
+        return True, ""
+    
+    if levels < 1 or levels > MAX_MINDMAP_LEVELS:
+        return False, f"Levels must be between 1 and {MAX_MINDMAP_LEVELS}"
+    
+    return True, ""
+
+
+def validate_mindmap(mindmap_json: str, node_id: int) -> Tuple[bool, Dict[str, Any], str]:
+    """
+    Validate a client-supplied mind map and the node to expand in it.
+    
+    Args:
+        mindmap_json: Mind map as a JSON string ({"topic", "nodes"})
+        node_id: Id of a node that must exist in the mind map
+        
+    Returns:
+        Tuple of (is_valid, mindmap, error_message)
+    """
+    try:
+        mindmap = json.loads(mindmap_json)
+    except json.JSONDecodeError:
+        return False, {}, "Mind map must be valid JSON"
+    
+    if not isinstance(mindmap, dict) or not isinstance(mindmap.get("nodes"), list):
+        return False, {}, "Mind map must be an object with a 'nodes' list"
+    
+    if not isinstance(mindmap.get("topic", ""), str):
+        return False, {}, "Mind map topic must be a string"
+    
+    try:
+        for node in mindmap["nodes"]:
+            check_node(node)
+        structure = MindMap.from_dict(mindmap)
+    except ValueError as e:
+        # check_node errors and MindMapError (duplicates, orphans, cycles)
+        return False, {}, str(e)
+    
+    if structure.position(node_id) is None:
+        return False, {}, f"Node {node_id} not found in mind map"
+    
+    return True, mindmap, ""